@@ -0,0 +1,66 @@
+"""
+Assessment latency with sequential per-domain requests against the concurrent fetch layer.
+
+The stand-in dataset server sleeps for --delay seconds on every request. Run from the
+repository root:
+    python -m benchmarks.async_fetch --delay 0.3 --repeats 3
+"""
+import argparse
+import time
+
+import meteo_query
+import weather_cache
+from benchmarks.stand_in_server import StandInServer, dataset_handler
+
+ASSESSMENTS = {
+    "nitrogen": ["precipitation", "soil_moisture"],
+    "phosphorus": ["precipitation", "soil_moisture", "ph"],
+    "yield": ["precipitation", "ph", "max_temp", "min_temp"],
+    "historical": ["max_temp", "min_temp", "mean_temp", "cumulative_precipitation", "evaporation", "soil_moisture"],
+}
+LOCATION = [7.57327, 47.558399, 279]
+TIMESTAMP_RANGE = "2024-03-01T+00:00/2024-09-30T+00:00"
+
+
+def sequential(names):
+    result = {}
+    for domain, time_resolution, group in meteo_query.plan_queries(names):
+        result.update(meteo_query.fetch_query(domain, time_resolution, group, LOCATION, "Basel", TIMESTAMP_RANGE))
+    return result
+
+
+def concurrent(names):
+    return meteo_query.fetch_variables(LOCATION, "Basel", TIMESTAMP_RANGE, names)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=0.3, help="Injected latency per request (s)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    weather_cache.ENABLED = False
+    with StandInServer(dataset_handler, delay=args.delay) as server:
+        meteo_query.BASE_URL = server.url + "/dataset/query"
+        print(f"{'assessment':12s} {'sequential ms':>14s} {'concurrent ms':>14s}")
+        for assessment, names in ASSESSMENTS.items():
+            timings = []
+            for strategy in (sequential, concurrent):
+                start = time.perf_counter()
+                for _ in range(args.repeats):
+                    result = strategy(names)
+                timings.append((time.perf_counter() - start) / args.repeats * 1000)
+                assert all(result[name] is not None for name in names)
+            print(f"{assessment:12s} {timings[0]:14.0f} {timings[1]:14.0f}")
+
+        # A request slower than the timeout is abandoned instead of blocking the assessment
+        server.delay = 1.0
+        start = time.perf_counter()
+        result = meteo_query.fetch_variables(LOCATION, "Basel", TIMESTAMP_RANGE, ASSESSMENTS["yield"], timeout=0.2)
+        elapsed = time.perf_counter() - start
+        assert all(value is None for value in result.values()), "timed out requests returned data"
+        print(f"timeout 0.2 s against a 1.0 s server: gave up after {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Throughput of predict_images against the per-image predict_image path.
+
+Run from the repository root:
+    python -m benchmarks.batched_inference --images 256 --batch-size 32
+"""
+import argparse
+import time
+
+import tensorflow as tf
+
+from disease_detection import predict_image, predict_images
+
+SAMPLE_IMAGES = ["model/Healthy.jpg", "model/Powdery.jpg", "model/Rusty.jpg"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="model/best_model.keras")
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    model = tf.keras.models.load_model(args.model)
+    paths = [SAMPLE_IMAGES[i % len(SAMPLE_IMAGES)] for i in range(args.images)]
+
+    # Warm up both paths so graph tracing is not timed
+    predict_image(paths[0], model)
+    predict_images(paths[:args.batch_size], model, batch_size=args.batch_size)
+
+    start = time.perf_counter()
+    single = [predict_image(path, model) for path in paths]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = predict_images(paths, model, batch_size=args.batch_size, num_workers=args.workers)
+    batched_time = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, (b, _) in zip(single, batched))
+    print(f"per-image: {args.images / single_time:8.1f} img/s ({single_time:.2f}s)")
+    print(f"batched:   {args.images / batched_time:8.1f} img/s ({batched_time:.2f}s)")
+    print(f"speedup:   {single_time / batched_time:8.2f}x, label mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
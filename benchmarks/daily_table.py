@@ -0,0 +1,107 @@
+"""
+Memory of parsed forecast responses: entry dicts and dict-of-dicts against DailyTable.
+
+Generates CE Hub style JSON responses for many fields over several years with every measure
+weather.py and stress_buster.py use, parses them the previous ways (the dict of dicts of
+parse_weather_response, the defaultdict(list) of entries of print_daily_risks) and into
+DailyTable in float64 and float32, and reports the memory each keeps alive, the peak
+while parsing, and the parse time. Run from the repository root:
+    python -m benchmarks.daily_table --fields 20 --years 5
+"""
+import argparse
+import datetime
+import gc
+import json
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+
+from daily_table import DailyTable
+from forecast_cache import MEASURE_LABELS
+
+
+def synthetic_response(days, rng, lat, lon):
+    first_day = datetime.date(2020, 1, 1)
+    entries = []
+    for i in range(days):
+        date = f"{first_day + datetime.timedelta(days=i)} 00:00:00"
+        entries.extend({"date": date, "measureLabel": label, "dailyValue": round(rng.uniform(0, 100), 2),
+                        "latitude": lat, "longitude": lon} for label in MEASURE_LABELS)
+    return json.dumps(entries)
+
+
+def entry_list(text):
+    return json.loads(text)
+
+
+def dict_of_dicts(text):
+    """What parse_weather_response used to build."""
+    result = {}
+    for entry in json.loads(text):
+        result.setdefault(entry['date'], {})[entry['measureLabel']] = entry['dailyValue']
+    return result
+
+
+def entries_by_date(text):
+    """What print_daily_risks used to build."""
+    data_by_date = defaultdict(list)
+    for entry in json.loads(text):
+        data_by_date[entry['date']].append(entry)
+    return data_by_date
+
+
+def measure(parse, responses):
+    """Parses every response, returns (results, bytes kept alive, peak bytes, seconds)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = [parse(text) for text in responses]
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fields", type=int, default=20)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    days = 365 * args.years
+    responses = [synthetic_response(days, rng, rng.uniform(35, 55), rng.uniform(-10, 30)) for _ in range(args.fields)]
+    entries = args.fields * days * len(MEASURE_LABELS)
+    print(f"{args.fields} fields x {days} days x {len(MEASURE_LABELS)} measures = {entries:,} entries, "
+          f"{sum(map(len, responses)) / 2**20:.1f} MiB of JSON")
+
+    parsers = {
+        "entry dicts": entry_list,
+        "dict of dicts": dict_of_dicts,
+        "defaultdict(list)": entries_by_date,
+        "DailyTable float64": lambda text: DailyTable.from_entries(json.loads(text), MEASURE_LABELS),
+        "DailyTable float32": lambda text: DailyTable.from_entries(json.loads(text), MEASURE_LABELS, np.float32),
+    }
+    print(f"{'representation':20s} {'kept MiB':>9s} {'bytes/value':>12s} {'peak MiB':>9s} {'parse s':>8s}")
+    results = {}
+    for name, parse in parsers.items():
+        parsed, current, peak, elapsed = measure(parse, responses)
+        print(f"{name:20s} {current / 2**20:9.2f} {current / entries:12.1f} {peak / 2**20:9.1f} {elapsed:8.2f}")
+        if name in ("dict of dicts", "DailyTable float64"):
+            results[name] = parsed
+        del parsed  # Free it before measuring the next representation
+
+    # Same values as the dict of dicts
+    for legacy, table in zip(results["dict of dicts"], results["DailyTable float64"]):
+        assert list(legacy) == table.dates
+        for label in MEASURE_LABELS:
+            assert np.array_equal(table[label], [legacy[date][label] for date in table.dates])
+    print("values match the dict of dicts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Write throughput, concurrency safety and query latency of the feedback store.
+
+The old approach rewrote the whole JSON file on every submission. It is compared with the
+append-only store committing every submission on its own and committing in batches, with
+threads and with several processes writing to the same file. Query latency is measured on
+the resulting table and the WAL is compacted at the end. Run from the repository root:
+    python -m benchmarks.feedback_store --submissions 20000 --threads 8 --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from collect_user_feedback import predict_agriculture_risk
+from feedback_store import FeedbackStore
+
+DAY = 24 * 3600
+
+
+def submissions(count, seed=0):
+    rng = random.Random(seed)
+    random.seed(seed)
+    start = time.time() - 365 * DAY
+    rows = []
+    for i in range(count):
+        weather, risk, suggestion = predict_agriculture_risk()
+        rows.append((f"{weather} -> {risk}", rng.random() < 0.7, weather, risk, suggestion, start + i * 365 * DAY / count))
+    return rows
+
+
+def legacy(path, rows):
+    """Every submission rewrites the file holding all of them."""
+    feedback = []
+    for prediction_id, effective, weather, risk, suggestion, created_at in rows:
+        feedback.append({"prediction_id": prediction_id, "effective": effective, "created_at": created_at})
+        with open(path, "w") as file:
+            json.dump(feedback, file, indent=4)
+
+
+def write_process(path, rows):
+    store = FeedbackStore(path)
+    for row in rows:
+        store.add(*row)
+    store.close()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--submissions", type=int, default=20000)
+    parser.add_argument("--legacy", type=int, default=2000, help="Submissions for the JSON rewrite, which is quadratic")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    rows = submissions(args.submissions)
+    with tempfile.TemporaryDirectory() as directory:
+        seconds = timed(legacy, os.path.join(directory, "feedback.json"), rows[:args.legacy])
+        print(f"{'JSON rewrite':34s} {args.legacy:6d} submissions {seconds:7.2f} s {args.legacy / seconds:9.0f} /s")
+
+        count = min(args.legacy, len(rows))
+        store = FeedbackStore(os.path.join(directory, "single.sqlite"))
+
+        def one_by_one():
+            for row in rows[:count]:
+                store.flush(store.add(*row))
+        seconds = timed(one_by_one)
+        store.close()
+        print(f"{'commit per submission':34s} {count:6d} submissions {seconds:7.2f} s {count / seconds:9.0f} /s")
+
+        path = os.path.join(directory, "batched.sqlite")
+        store = FeedbackStore(path)
+
+        def threaded():
+            with ThreadPoolExecutor(args.threads) as executor:
+                list(executor.map(lambda row: store.add(*row), rows))
+            store.flush()
+        seconds = timed(threaded)
+        stats = store.stats()
+        print(f"{f'batched, {args.threads} threads':34s} {len(rows):6d} submissions {seconds:7.2f} s "
+              f"{len(rows) / seconds:9.0f} /s  ({stats['batches']} transactions)")
+
+        shared = os.path.join(directory, "shared.sqlite")
+        FeedbackStore(shared).close()  # Create the schema once
+        share = -(-len(rows) // args.processes)
+        start = time.perf_counter()
+        workers = [multiprocessing.Process(target=write_process, args=(shared, rows[i:i + share]))
+                   for i in range(0, len(rows), share)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - start
+        stored = sqlite3.connect(shared).execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+        assert stored == len(rows), f"{stored} of {len(rows)} submissions stored"
+        print(f"{f'batched, {len(workers)} processes':34s} {len(rows):6d} submissions {seconds:7.2f} s "
+              f"{len(rows) / seconds:9.0f} /s  (all {stored} stored)")
+
+        now = time.time()
+        queries = {
+            "by prediction id": lambda: store.query(prediction_id="Frost -> Crop damage"),
+            "by weather, last 30 days": lambda: store.query(weather="Drought", since=now - 30 * DAY),
+            "last week": lambda: store.query(since=now - 7 * DAY),
+            "effectiveness by weather": lambda: store.effectiveness(weather="Heatwave"),
+            "latest 20": lambda: store.query(limit=20),
+        }
+        print()
+        for name, query in queries.items():
+            result = query()
+            latencies = sorted(timed(query) for _ in range(20))
+            size = len(result) if isinstance(result, list) else result
+            print(f"  {name:28s} p50 {latencies[10] * 1000:7.2f} ms  -> {size}")
+
+        wal = path + "-wal"
+        before = os.path.getsize(wal) if os.path.exists(wal) else 0
+        store.compact()
+        after = os.path.getsize(wal) if os.path.exists(wal) else 0
+        print(f"\n  compaction: WAL {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB, "
+              f"database {os.path.getsize(path) / 1e6:.1f} MB")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
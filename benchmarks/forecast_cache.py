@@ -0,0 +1,96 @@
+"""
+API calls saved by the shared forecast cache.
+
+Fields are scattered around a few farms, so several fall into the same forecast grid cell.
+For every field both the weather outlook (weather.py) and the stress indices (stress_buster.py)
+ask for the forecast, concurrently as the portfolio engine does. The stand-in CE Hub server
+counts the requests with the cache disabled and enabled, then a fresh cache instance shows
+the persistent tier and a short update interval shows expiry. Run from the repository root:
+    python -m benchmarks.forecast_cache --fields 500 --farms 40 --delay 0.05
+"""
+import argparse
+import random
+import tempfile
+import time
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import forecast_cache
+import weather
+from benchmarks.stand_in_server import StandInServer, forecast_handler
+from data_visualization import stress_buster
+
+
+def synthetic_coordinates(count, farms, seed=0):
+    rng = random.Random(seed)
+    sites = [(rng.uniform(35, 55), rng.uniform(-10, 30)) for _ in range(farms)]
+    # Fields within ~2 km of their farm centre
+    return [(round(lat + rng.uniform(-0.02, 0.02), 5), round(lon + rng.uniform(-0.02, 0.02), 5))
+            for lat, lon in (sites[i % farms] for i in range(count))]
+
+
+def assess(coordinates, concurrency):
+    """Fetches both forecasts for every field, returns the responses and the elapsed time."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        outlook = list(executor.map(lambda c: weather.fetch_daily_weather(*c), coordinates))
+        stress = list(executor.map(lambda c: stress_buster.fetch_daily_temperatures(*c), coordinates))
+    return outlook, stress, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fields", type=int, default=500)
+    parser.add_argument("--farms", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--delay", type=float, default=0.05, help="Injected latency per request (s)")
+    args = parser.parse_args()
+
+    coordinates = synthetic_coordinates(args.fields, args.farms)
+    with tempfile.TemporaryDirectory() as directory, StandInServer(forecast_handler, delay=args.delay) as server:
+        weather.FORECAST_URL = stress_buster.FORECAST_URL = server.url + "/api/Forecast/ShortRangeForecastDaily"
+        path = os.path.join(directory, "forecast.sqlite")
+
+        forecast_cache.ENABLED = False
+        outlook, stress, uncached_time = assess(coordinates, args.concurrency)
+        uncached_requests = server.requests
+
+        forecast_cache.ENABLED = True
+        forecast_cache._cache = forecast_cache.ForecastCache(path)
+        cached_outlook, cached_stress, cached_time = assess(coordinates, args.concurrency)
+        cached_requests = server.requests - uncached_requests
+        stats = forecast_cache._cache.stats()
+
+        # Each module still gets exactly its own labels
+        for before, after in ((outlook, cached_outlook), (stress, cached_stress)):
+            assert all({e["measureLabel"] for e in a} == {e["measureLabel"] for e in b} for a, b in zip(before, after))
+        cells = len({forecast_cache._cache.cell(*c) for c in coordinates})
+
+        print(f"fields: {args.fields}, grid cells: {cells}, forecast lookups: {2 * args.fields}")
+        print(f"no cache: {uncached_requests:5d} API calls, {uncached_time:.2f} s")
+        print(f"cache:    {cached_requests:5d} API calls, {cached_time:.2f} s, hit rate {stats['hit_rate']:.1%} "
+              f"({stats['memory_hits']} memory, {stats['disk_hits']} disk), saved calls: {stats['saved_calls']}")
+        forecast_cache._cache.close()
+
+        # A new process finds the entries on disk
+        forecast_cache._cache = forecast_cache.ForecastCache(path)
+        before = server.requests
+        assess(coordinates, args.concurrency)
+        stats = forecast_cache._cache.stats()
+        print(f"restart:  {server.requests - before:5d} API calls, hit rate {stats['hit_rate']:.1%} "
+              f"({stats['disk_hits']} disk, {stats['memory_hits']} memory)")
+        forecast_cache._cache.close()
+
+        # Entries expire at the next model update
+        forecast_cache._cache = forecast_cache.ForecastCache(os.path.join(directory, "short.sqlite"), update_hours=1 / 3600)
+        stress_buster.fetch_daily_temperatures(*coordinates[0])
+        time.sleep(1.1)
+        stress_buster.fetch_daily_temperatures(*coordinates[0])
+        assert forecast_cache._cache.stats()["misses"] == 2
+        print("expiry:   entry refetched after the model update")
+        forecast_cache._cache.close()
+        forecast_cache._cache = None
+
+
+if __name__ == "__main__":
+    main()
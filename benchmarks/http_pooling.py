@@ -0,0 +1,65 @@
+"""
+Latency and connection reuse of the shared http_client against bare requests calls.
+
+Everything runs against a local stand-in server, so no API keys are needed. Besides the
+timings, the script checks retries on injected 503s and the per-host concurrency cap.
+Run from the repository root:
+    python -m benchmarks.http_pooling --requests 200
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_client
+from benchmarks.stand_in_server import StandInServer
+
+
+def ok_handler(method, path, query, body):
+    return 200, [{"codes": [{"dataPerTimeInterval": [{"data": [[1.0] * 30]}]}]}]
+
+
+def timed(function, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with StandInServer(ok_handler) as server:
+        bare = timed(lambda: requests.post(server.url + "/dataset/query", json={}), args.requests)
+        bare_connections = server.connections
+
+    with StandInServer(ok_handler) as server:
+        http_client.reset_stats()
+        pooled = timed(lambda: http_client.post(server.url + "/dataset/query", json={}), args.requests)
+        pooled_connections = server.connections
+        host_stats = http_client.stats()[server.url.split("//")[1]]
+
+    print(f"bare requests: {bare * 1000:6.2f} ms/request, {bare_connections} connections")
+    print(f"http_client:   {pooled * 1000:6.2f} ms/request, {pooled_connections} connections, "
+          f"reuse {host_stats['connection_reuse']:.1%}, p50 {host_stats['latency_p50_ms']:.2f} ms, "
+          f"p99 {host_stats['latency_p99_ms']:.2f} ms")
+
+    # Two injected 503s are retried away with backoff
+    with StandInServer(ok_handler, fail_first=2) as server:
+        response = http_client.post(server.url + "/dataset/query", json={})
+        assert response.status_code == 200 and server.requests == 3, "503s were not retried"
+    print("retry on 503: ok")
+
+    # More client threads than the per-host limit never exceed it on the server
+    with StandInServer(ok_handler, delay=0.02) as server:
+        with ThreadPoolExecutor(max_workers=http_client.MAX_PER_HOST * 3) as executor:
+            list(executor.map(lambda _: http_client.get(server.url + "/forecast"), range(100)))
+        assert server.max_in_flight <= http_client.MAX_PER_HOST, "per-host limit exceeded"
+    print(f"per-host limit: ok ({server.max_in_flight} concurrent, limit {http_client.MAX_PER_HOST})")
+
+
+if __name__ == "__main__":
+    main()
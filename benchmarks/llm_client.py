@@ -0,0 +1,124 @@
+"""
+Time to first token and cache hit rate of the LLM client.
+
+A stand-in TGI server generates a fixed number of tokens at a fixed rate. The old client,
+a new InferenceClient per question waiting for the whole generation, is compared with the
+pooled streaming client on a cold question, on a cached question, and on a session of
+questions drawn from a small set of common ones, asked concurrently as several users would.
+Run from the repository root:
+    python -m benchmarks.llm_client --questions 200 --token-delay 0.01
+"""
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from huggingface_hub import InferenceClient
+
+import knowledge_index
+import llm
+from benchmarks.stand_in_server import StandInServer, text_generation_handler
+
+COMMON_QUESTIONS = [
+    "How can I handle the hot soil problem?",
+    "When should I irrigate corn?",
+    "How do I improve soil organic matter?",
+    "What cover crops suit sandy soil?",
+    "How can I reduce evaporation losses?",
+]
+
+
+def legacy_call(url, question):
+    """The previous call_llm: a new client per question and a blocking, non-streamed generation."""
+    client = InferenceClient(model=url, timeout=120, token=llm.access_token)
+    prompt = llm.build_prompt(question)
+    response = client.post(json={"inputs": prompt, "parameters": {"max_new_tokens": llm.MAX_NEW_TOKENS},
+                                 "task": "text-generation"})
+    return json.loads(response.decode())[0]["generated_text"].split(prompt)[1]
+
+
+def first_token(question):
+    """Seconds to the first text piece and to the whole answer, and the answer."""
+    start = time.perf_counter()
+    pieces = []
+    ttft = None
+    for piece in llm.stream_llm(question):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        pieces.append(piece)
+    return ttft, time.perf_counter() - start, "".join(pieces)
+
+
+def session_questions(count, seed=0):
+    """Mostly common questions with varying case and punctuation, some unique ones."""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        if rng.random() < 0.8:
+            question = rng.choice(COMMON_QUESTIONS)
+            question = rng.choice([question, question.lower(), question.rstrip("?"), "  " + question.upper()])
+        else:
+            question = f"What about field {i}?"
+        questions.append(question)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds per generated token")
+    parser.add_argument("--tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    handler = text_generation_handler(args.token_delay, args.tokens)
+    with StandInServer(handler) as server:
+        llm.LLM_URL = server.url
+        knowledge_index.TOP_K = 0  # The old prompt, without retrieved notes
+        question = "How can I handle the hot soil problem?"
+
+        start = time.perf_counter()
+        expected = legacy_call(server.url, question)
+        legacy_time = time.perf_counter() - start
+
+        cold_ttft, cold_total, answer = first_token(question)
+        assert answer == expected, "Streamed answer differs from the blocking one"
+        cached_ttft, _, answer = first_token("how can i handle the HOT soil problem")
+        assert answer == expected
+
+        print(f"{args.tokens} tokens at {args.token_delay * 1000:g} ms/token")
+        print(f"  old client, time to first text:     {legacy_time * 1000:8.1f} ms")
+        print(f"  streaming, time to first token:     {cold_ttft * 1000:8.1f} ms  (whole answer {cold_total * 1000:.1f} ms)")
+        print(f"  cached, time to answer:             {cached_ttft * 1000:8.3f} ms")
+
+        # Identical questions asked at the same time share one generation
+        llm._cache.clear()
+        requests_before = server.requests
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            answers = list(executor.map(llm.call_llm, [question] * args.concurrency))
+        assert all(a == expected for a in answers)
+        print(f"\n{args.concurrency} concurrent identical questions: {server.requests - requests_before} generation(s), "
+              f"{llm.stats()['deduplicated']} joined a running one")
+
+        llm._cache.clear()
+        questions = session_questions(args.questions)
+        requests_before = server.requests
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            timings = list(executor.map(first_token, questions))
+        elapsed = time.perf_counter() - start
+        stats = llm.stats()
+        ttfts = sorted(t[0] for t in timings)
+        print(f"\nSession of {args.questions} questions, {args.concurrency} users: {elapsed:.2f} s, "
+              f"{server.requests - requests_before} generations")
+        print(f"  cache hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses), "
+              f"{stats['deduplicated']} deduplicated in total")
+        print(f"  time to first token: median {ttfts[len(ttfts) // 2] * 1000:.1f} ms, "
+              f"p95 {ttfts[int(len(ttfts) * 0.95)] * 1000:.1f} ms")
+        print(f"  old client would take ~{args.questions * legacy_time / args.concurrency:.2f} s "
+              f"({args.questions} generations of {legacy_time * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Rate-limit errors, interactive latency and throughput with and without the LLM scheduler.
+
+A stand-in endpoint enforces provider limits: a few running generations and a number of
+requests per second, answering 429 beyond them. A report queues many batch questions at
+once while users keep asking interactive ones. Without scheduling every question is sent
+right away, as call_llm used to do; with it a bounded worker pool and a token bucket stay
+within the limits, interactive questions jump the queue and batch questions share requests.
+Run from the repository root:
+    python -m benchmarks.llm_scheduler --batch-questions 60 --interactive 10
+"""
+import argparse
+import threading
+import time
+
+import knowledge_index
+import llm
+from benchmarks.stand_in_server import StandInServer, text_generation_handler
+from llm_scheduler import BATCH, INTERACTIVE
+
+
+def run(args, concurrency, rate, max_batch, lanes):
+    """Asks the batch and interactive questions, returns the errors (all 429s here), interactive first-token times and elapsed time."""
+    llm._scheduler = None
+    llm._cache.clear()
+    llm.CONCURRENCY, llm.RATE, llm.BURST, llm.MAX_BATCH = concurrency, rate, args.burst, max_batch
+    errors = []
+    ttfts = []
+    lock = threading.Lock()
+
+    def ask(question, priority, measure):
+        start = time.perf_counter()
+        try:
+            for _ in llm.stream_llm(question, priority if lanes else INTERACTIVE):
+                if measure:
+                    with lock:
+                        ttfts.append(time.perf_counter() - start)
+                    measure = False
+        except Exception as e:
+            with lock:
+                errors.append(type(e).__name__)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=ask, args=(f"Report question {i}: nitrogen plan for field {i}", BATCH, False))
+               for i in range(args.batch_questions)]
+    for thread in threads:
+        thread.start()
+    for i in range(args.interactive):
+        time.sleep(args.interactive_gap)
+        thread = threading.Thread(target=ask, args=(f"User question {i}: is it too hot to spray today?", INTERACTIVE, True))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return errors, sorted(ttfts), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-questions", type=int, default=60)
+    parser.add_argument("--interactive", type=int, default=10)
+    parser.add_argument("--interactive-gap", type=float, default=0.2, help="Seconds between interactive questions")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--provider-concurrency", type=int, default=4)
+    parser.add_argument("--provider-rate", type=int, default=10, help="Requests per second the provider accepts")
+    parser.add_argument("--burst", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=8)
+    args = parser.parse_args()
+
+    handler = text_generation_handler(args.token_delay, args.tokens, args.provider_concurrency, args.provider_rate)
+    with StandInServer(handler) as server:
+        llm.LLM_URL = server.url
+        llm._backend = None
+        knowledge_index.TOP_K = 0
+
+        print(f"Provider limits: {args.provider_concurrency} running, {args.provider_rate} requests/s; "
+              f"{args.batch_questions} batch and {args.interactive} interactive questions")
+        print(f"{'':28s} {'requests':>8s} {'429s':>5s} {'time s':>7s} {'answers/s':>9s} "
+              f"{'TTFT p50 ms':>11s} {'TTFT max ms':>11s}")
+        setups = [
+            ("unscheduled", 1000, 0.0, 1, False),
+            # A bucket lets burst + rate requests through in any second
+            ("pool + token bucket", args.provider_concurrency, args.provider_rate - args.burst, 1, True),
+            ("+ batching", args.provider_concurrency, args.provider_rate - args.burst, args.max_batch, True),
+        ]
+        for name, concurrency, rate, max_batch, lanes in setups:
+            requests_before = server.requests
+            errors, ttfts, elapsed = run(args, concurrency, rate, max_batch, lanes)
+            requests = server.requests - requests_before
+            answered = args.batch_questions + args.interactive - len(errors)
+            stats = llm.stats()["scheduler"]
+            p50 = f"{ttfts[len(ttfts) // 2] * 1000:.0f}" if ttfts else "-"
+            worst = f"{ttfts[-1] * 1000:.0f}" if ttfts else "-"
+            print(f"{name:28s} {requests:8d} {len(errors):5d} "
+                  f"{elapsed:7.2f} {answered / elapsed:9.1f} {p50:>11s} {worst:>11s}")
+            waits = ", ".join(f"{lane} {wait:.0f}" for lane, wait in stats["wait_p95_ms"].items() if wait is not None)
+            print(f"  queue wait p95 ms: {waits}; batch sizes {stats['batch_sizes']}, "
+                  f"throttled {stats['throttled_s']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Tokens per second and memory footprint of the local LLM backend.
+
+Loads the gpt4all model once, as the assistant does, then measures time to first token and
+generation speed for single questions and for several users asking at once, where questions
+wait in the backend queue. The model file must be present, or pass --download once.
+Run from the repository root:
+    python -m benchmarks.local_llm --model Phi-3-mini-4k-instruct.Q4_0.gguf --questions 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+import llm
+
+QUESTIONS = [
+    "How can I handle the hot soil problem?",
+    "When should I irrigate corn during a heat wave?",
+    "How do I improve soil organic matter?",
+    "What cover crops suit sandy soil?",
+]
+
+
+def generate(backend, question, max_new_tokens):
+    """Seconds to the first token and to the end, and the number of tokens."""
+    start = time.perf_counter()
+    ttft = None
+    tokens = 0
+    for _ in backend.stream(llm.build_prompt(question), max_new_tokens):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        tokens += 1
+    return ttft, time.perf_counter() - start, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=llm.LOCAL_MODEL)
+    parser.add_argument("--model-dir", default=llm.LOCAL_MODEL_DIR)
+    parser.add_argument("--context", type=int, default=llm.CONTEXT_TOKENS)
+    parser.add_argument("--threads", type=int, default=llm.LOCAL_THREADS)
+    parser.add_argument("--max-tokens", type=int, default=llm.MAX_NEW_TOKENS)
+    parser.add_argument("--questions", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--download", action="store_true", help="Download the model file if missing")
+    args = parser.parse_args()
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start = time.perf_counter()
+    backend = llm.LocalBackend(args.model, args.model_dir, args.context, args.threads,
+                               queue_size=max(args.questions, 1), allow_download=args.download)
+    load_time = time.perf_counter() - start
+    rss_loaded = process.memory_info().rss
+
+    # Warm-up, the first generation also allocates the KV cache
+    generate(backend, QUESTIONS[0], 8)
+
+    runs = [generate(backend, question, args.max_tokens) for question in QUESTIONS[:2]]
+    tokens = sum(run[2] for run in runs)
+    seconds = sum(run[1] for run in runs)
+    print(f"{args.model}, context {args.context}, threads {args.threads or 'all'}")
+    print(f"  load {load_time:.2f} s, RSS +{(rss_loaded - rss_before) / 1e6:.0f} MB after load, "
+          f"+{(process.memory_info().rss - rss_before) / 1e6:.0f} MB after generating")
+    print(f"  single question: first token {min(run[0] for run in runs) * 1000:.0f} ms, "
+          f"{tokens / seconds:.1f} tokens/s")
+
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.questions)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        runs = list(executor.map(lambda question: generate(backend, question, args.max_tokens), questions))
+    elapsed = time.perf_counter() - start
+    ttfts = sorted(run[0] for run in runs)
+    print(f"  {args.questions} questions from {args.concurrency} users: {sum(run[2] for run in runs) / elapsed:.1f} tokens/s, "
+          f"first token median {ttfts[len(ttfts) // 2]:.2f} s, max {ttfts[-1]:.2f} s (queued)")
+    print(f"  peak RSS {process.memory_info().rss / 1e6:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
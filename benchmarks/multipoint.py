@@ -0,0 +1,58 @@
+"""
+Request count and time for many locations, one request per location against MultiPoint packing.
+
+The stand-in answers like the API, one series per location inside each code's data, so the
+script also checks that the series split back out of a MultiPoint response match the
+single-location ones exactly.
+Run from the repository root:
+    python -m benchmarks.multipoint --locations 500 --chunk-size 50 --delay 0.05
+"""
+import argparse
+import random
+import time
+
+import meteo_query
+import weather_cache
+from benchmarks.stand_in_server import StandInServer, dataset_handler
+
+NAMES = ["precipitation", "soil_moisture", "ph", "max_temp", "min_temp"]
+TIMESTAMP_RANGE = "2024-03-01T+00:00/2024-09-30T+00:00"
+
+
+def as_lists(results):
+    """Series as plain lists, so results compare with ==."""
+    return [{name: None if series is None else series.tolist() for name, series in result.items()} for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.05, help="Injected latency per request (s)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    locations = [
+        ([round(rng.uniform(-10, 30), 3), round(rng.uniform(35, 55), 3), rng.randint(0, 800)], f"field {i}")
+        for i in range(args.locations)
+    ]
+
+    weather_cache.ENABLED = False
+    with StandInServer(dataset_handler, delay=args.delay) as server:
+        meteo_query.BASE_URL = server.url + "/dataset/query"
+
+        start = time.perf_counter()
+        single = [meteo_query.fetch_variables(coords, name, TIMESTAMP_RANGE, NAMES) for coords, name in locations]
+        single_time, single_requests = time.perf_counter() - start, server.requests
+
+        start = time.perf_counter()
+        packed = meteo_query.fetch_variables_multi(locations, TIMESTAMP_RANGE, NAMES, chunk_size=args.chunk_size)
+        packed_time, packed_requests = time.perf_counter() - start, server.requests - single_requests
+
+    assert as_lists(packed) == as_lists(single), "MultiPoint results were not split back to the right locations"
+    print(f"one request per location: {single_requests:5d} requests, {single_time:6.2f} s")
+    print(f"MultiPoint, chunk {args.chunk_size:4d}:  {packed_requests:5d} requests, {packed_time:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
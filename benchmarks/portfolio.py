@@ -0,0 +1,71 @@
+"""
+Throughput of the batch portfolio engine in fields per second.
+
+Generates a synthetic portfolio where several fields share a location and start date
+(as neighbouring plots of one farm do), serves both APIs from the local stand-in
+and reports fields/s and the number of deduplicated queries. Run from the repository root:
+    python -m benchmarks.portfolio --fields 2000 --farms 200 --delay 0.05
+"""
+import argparse
+import random
+
+import forecast_cache
+import meteo_query
+import portfolio
+import weather_cache
+from benchmarks.stand_in_server import StandInServer, api_handler
+from data_visualization import stress_buster
+
+CROPS = ["Soybean", "Corn", "Cotton", "Rice", "Wheat"]
+
+
+def synthetic_fields(count, farms, seed=0):
+    rng = random.Random(seed)
+    farm_sites = [
+        ([round(rng.uniform(-10, 30), 3), round(rng.uniform(35, 55), 3), rng.randint(0, 800)],
+         f"2024-0{rng.randint(3, 5)}-0{rng.randint(1, 9)}")
+        for _ in range(farms)
+    ]
+    fields = []
+    for i in range(count):
+        location, start_date = farm_sites[i % farms]
+        fields.append({
+            "field_id": f"F{i:06d}",
+            "crop": rng.choice(CROPS),
+            "location": location,
+            "start_date": start_date,
+            "yield_kg_ha": rng.uniform(2000, 9000),
+            "nitrogen_kg_ha": rng.uniform(50, 250),
+            "phosphorus_kg_ha": rng.uniform(20, 90),
+            "nitrogen_index": rng.uniform(0, 0.2),
+        })
+    return fields
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fields", type=int, default=2000)
+    parser.add_argument("--farms", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--delay", type=float, default=0.05, help="Injected latency per request (s)")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Locations per MultiPoint request")
+    args = parser.parse_args()
+
+    weather_cache.ENABLED = False
+    forecast_cache.ENABLED = False
+    fields = synthetic_fields(args.fields, args.farms)
+    with StandInServer(api_handler, delay=args.delay) as server:
+        meteo_query.BASE_URL = server.url + "/dataset/query"
+        stress_buster.FORECAST_URL = server.url + "/api/Forecast/ShortRangeForecastDaily"
+        results, stats = portfolio.run_portfolio(fields, concurrency=args.concurrency, chunk_size=args.chunk_size)
+
+    errors = sum(1 for result in results if result.get("error"))
+    print(f"fields: {stats['fields']}, weather locations: {stats['weather_locations']} "
+          f"in {stats['weather_batches']} batches, "
+          f"forecast queries: {stats['forecast_queries']}, HTTP requests: {server.requests}")
+    print(f"fetch: {stats['fetch_seconds']:.2f} s, total: {stats['total_seconds']:.2f} s, "
+          f"throughput: {stats['fields_per_second']:.1f} fields/s, errors: {errors}")
+
+
+if __name__ == "__main__":
+    main()
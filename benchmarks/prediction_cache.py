@@ -0,0 +1,82 @@
+"""
+Repeated-upload workload with and without the prediction cache.
+
+Uploads are drawn from the sample images, a share of them re-encoded at a different
+JPEG quality to act as near duplicates. Run from the repository root:
+    python -m benchmarks.prediction_cache --uploads 300 --near-duplicates
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image
+
+from disease_detection import load_model, predict_image
+from prediction_cache import PredictionCache
+
+SAMPLE_IMAGES = ["model/Healthy.jpg", "model/Powdery.jpg", "model/Rusty.jpg"]
+
+
+def make_uploads(directory, uploads, unique, near_share, seed=0):
+    """Writes `unique` distinct photos plus re-encoded copies, and returns the upload sequence."""
+    rng = random.Random(seed)
+    originals = []
+    for i in range(unique):
+        img = Image.open(SAMPLE_IMAGES[i % len(SAMPLE_IMAGES)]).convert("RGB")
+        # Crop a slightly different window so each original has its own bytes and content
+        img = img.crop((i % 7, i % 5, img.width - i % 3, img.height - i % 4))
+        path = os.path.join(directory, f"original_{i}.jpg")
+        img.save(path, quality=90)
+        originals.append(path)
+
+    sequence = []
+    for j in range(uploads):
+        path = rng.choice(originals)
+        if rng.random() < near_share:
+            copy = os.path.join(directory, f"reupload_{j}.jpg")
+            buffer = io.BytesIO()
+            Image.open(path).save(buffer, format="JPEG", quality=rng.choice([70, 80, 85]))
+            with open(copy, "wb") as file:
+                file.write(buffer.getvalue())
+            path = copy
+        sequence.append(path)
+    return sequence
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="model/best_model.keras")
+    parser.add_argument("--uploads", type=int, default=300)
+    parser.add_argument("--unique", type=int, default=30)
+    parser.add_argument("--near-share", type=float, default=0.3)
+    parser.add_argument("--near-duplicates", action="store_true")
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    with tempfile.TemporaryDirectory() as directory:
+        sequence = make_uploads(directory, args.uploads, args.unique, args.near_share)
+        predict_image(sequence[0], model)  # Warm up
+
+        start = time.perf_counter()
+        uncached = [predict_image(path, model) for path in sequence]
+        uncached_time = time.perf_counter() - start
+
+        cache = PredictionCache(args.model, cache_dir=os.path.join(directory, "cache"),
+                                near_duplicates=args.near_duplicates)
+        start = time.perf_counter()
+        cached = [predict_image(path, model, cache=cache) for path in sequence]
+        cached_time = time.perf_counter() - start
+
+    stats = cache.stats()
+    mismatches = sum(a != b for a, b in zip(uncached, cached))
+    print(f"uncached: {len(sequence) / uncached_time:8.1f} uploads/s")
+    print(f"cached:   {len(sequence) / cached_time:8.1f} uploads/s ({uncached_time / cached_time:.1f}x)")
+    print(f"hits: {stats['hits']}, near hits: {stats['near_hits']}, misses: {stats['misses']}, "
+          f"hit rate: {stats['hit_rate']:.1%}, label mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
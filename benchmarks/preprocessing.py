@@ -0,0 +1,70 @@
+"""
+Time and allocations of the letterbox preprocessing against the original PIL path.
+
+The original path ran thumbnail, pasted into a fresh white image, converted to a NumPy
+array, added a batch axis and divided by 255.0 in float64. The check asserts the new
+float32 inputs equal what the model received before. Run from the repository root:
+    python -m benchmarks.preprocessing --iterations 200
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from disease_detection import IMAGE_SIZE, load_padded_image, normalize
+
+SAMPLE_IMAGES = ["model/Healthy.jpg", "model/Powdery.jpg", "model/Rusty.jpg"]
+
+
+def legacy_preprocess(image_path):
+    img = Image.open(image_path)
+    img.thumbnail((256, 256))
+    new_img = Image.new("RGB", (256, 256), (255, 255, 255))
+    new_img.paste(img, ((256 - img.width) // 2, (256 - img.height) // 2))
+    img_array = np.array(new_img)
+    img_array = np.expand_dims(img_array, axis=0)
+    return img_array / 255.0
+
+
+def letterbox_preprocess(image_path, pixels, batch):
+    load_padded_image(image_path, out=pixels[0])
+    return normalize(pixels, out=batch)
+
+
+def measure(function, iterations):
+    """Returns (seconds per image, peak traced bytes per image)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(iterations):
+        function(SAMPLE_IMAGES[i % len(SAMPLE_IMAGES)])
+        peak = tracemalloc.get_traced_memory()[1]
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return elapsed / iterations, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    pixels = np.empty((1, IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8)
+    batch = np.empty((1, IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+
+    # The model sees float32, so the legacy float64 array is compared after the same cast
+    for path in SAMPLE_IMAGES:
+        expected = legacy_preprocess(path).astype(np.float32)
+        actual = letterbox_preprocess(path, pixels, batch)
+        assert np.array_equal(expected, actual), f"Model inputs differ for {path}"
+    print("model inputs are bit-identical on all sample images")
+
+    legacy_time, legacy_peak = measure(legacy_preprocess, args.iterations)
+    new_time, new_peak = measure(lambda path: letterbox_preprocess(path, pixels, batch), args.iterations)
+    print(f"legacy:    {legacy_time * 1000:7.2f} ms/image, peak NumPy allocations {legacy_peak / 1e6:6.2f} MB")
+    print(f"letterbox: {new_time * 1000:7.2f} ms/image, peak NumPy allocations {new_peak / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Round trips and wall-clock time per assessment, per-variable queries against the planner.
+
+The stand-in dataset server adds a fixed latency to every request, standing in for the
+network round trip to meteoblue. Run from the repository root:
+    python -m benchmarks.query_planner --delay 0.15 --repeats 5
+"""
+import argparse
+import time
+
+import meteo_query
+import weather_cache
+from benchmarks.stand_in_server import StandInServer, dataset_handler
+
+ASSESSMENTS = {
+    "nitrogen": ["precipitation", "soil_moisture"],
+    "phosphorus": ["precipitation", "soil_moisture", "ph"],
+    "yield": ["precipitation", "ph", "max_temp", "min_temp"],
+}
+LOCATION = [7.57327, 47.558399, 279]
+TIMESTAMP_RANGE = "2024-03-01T+00:00/2024-09-30T+00:00"
+
+
+def per_variable(names):
+    # What the risk modules did before: one request per fetch function
+    groups = [["max_temp", "min_temp"]] if "max_temp" in names else []
+    groups += [[name] for name in names if name not in ("max_temp", "min_temp")]
+    for group in groups:
+        meteo_query.fetch_variables(LOCATION, "Basel", TIMESTAMP_RANGE, group)
+
+
+def planned(names):
+    meteo_query.fetch_variables(LOCATION, "Basel", TIMESTAMP_RANGE, names)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=0.15, help="Injected latency per request (s)")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    # Measure the round trips themselves, not the local weather cache
+    weather_cache.ENABLED = False
+
+    print(f"{'assessment':12s} {'before':>18s} {'planned':>18s}")
+    with StandInServer(dataset_handler, delay=args.delay) as server:
+        meteo_query.BASE_URL = server.url + "/dataset/query"
+        for assessment, names in ASSESSMENTS.items():
+            row = []
+            for strategy in (per_variable, planned):
+                before = server.requests
+                start = time.perf_counter()
+                for _ in range(args.repeats):
+                    strategy(names)
+                elapsed = (time.perf_counter() - start) / args.repeats
+                trips = (server.requests - before) / args.repeats
+                row.append(f"{trips:.0f} trips {elapsed * 1000:6.0f} ms")
+            print(f"{assessment:12s} {row[0]:>18s} {row[1]:>18s}")
+
+
+if __name__ == "__main__":
+    main()
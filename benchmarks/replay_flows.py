@@ -0,0 +1,145 @@
+"""
+End-to-end timing of the risk flows on replayed API responses.
+
+Runs nitrogen(), phosphorus(), yield_(), stress() and predict_weather() with scripted answers
+to their prompts, against fixtures replayed by http_replay, and reports per flow the time
+spent fetching, the time spent computing and printing, and the requests served. The date
+is frozen so the flows send the same requests on every run.
+
+Fixtures are recorded on first use from the local stand-in server; pass --live to record
+them from the real APIs instead (needs the keys in .env). Run from the repository root:
+    python -m benchmarks.replay_flows --latency 0.05 --repeats 5
+"""
+import argparse
+import builtins
+import contextlib
+import datetime
+import io
+import os
+import time
+import types
+
+import forecast_cache
+import http_client
+import http_replay
+import meteo_query
+import weather
+import weather_cache
+from benchmarks.stand_in_server import StandInServer, api_handler
+from data_visualization import nitrogen_risk, phosphorus_risk, stress_buster, yield_risk
+
+FIXTURES = os.path.join("benchmarks", "fixtures", "flows.json.gz")
+TODAY = datetime.datetime(2025, 6, 30)
+
+# Flow -> (function, scripted answers to its prompts, (owner, name) of the fetch it times)
+FLOWS = {
+    "nitrogen": (nitrogen_risk.nitrogen, ["Corn", "8000", "150", "7.57", "47.56", "279", "2025-03-01"],
+                 (nitrogen_risk.NitrogenStressRisk, "fetch_weather")),
+    "phosphorus": (phosphorus_risk.phosphorus, ["Corn", "8", "60", "7.57", "47.56", "279", "2025-03-01"],
+                   (phosphorus_risk.PhosphorusStress, "fetch_conditions")),
+    "yield": (yield_risk.yield_, ["7.57", "47.56", "279", "Corn", "2025-03-01", "0.1"],
+              (yield_risk, "fetch_inputs")),
+    "stress": (stress_buster.stress, ["47.56", "7.57", "Corn"], (stress_buster, "fetch_daily_temperatures")),
+    "predict_weather": (lambda: weather.predict_weather(47.56, 7.57), [], (weather, "fetch_daily_weather")),
+}
+
+
+class FrozenDatetime(datetime.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return TODAY
+
+
+# Stands in for the datetime module inside the flow modules
+FROZEN_DATETIME_MODULE = types.SimpleNamespace(datetime=FrozenDatetime, date=datetime.date,
+                                               timedelta=datetime.timedelta)
+
+
+def run_flow(function, answers, fetch_owner, fetch_name):
+    """Runs one flow with scripted input, returns (total s, fetch s, printed output)."""
+    fetch_time = 0.0
+    original = getattr(fetch_owner, fetch_name)
+    unwrapped = original.__func__ if isinstance(fetch_owner, type) and hasattr(original, "__func__") else original
+
+    def timed_fetch(*args, **kwargs):
+        nonlocal fetch_time
+        start = time.perf_counter()
+        try:
+            return unwrapped(*args, **kwargs)
+        finally:
+            fetch_time += time.perf_counter() - start
+
+    setattr(fetch_owner, fetch_name, staticmethod(timed_fetch) if isinstance(fetch_owner, type) else timed_fetch)
+    prompts = iter(answers)
+    original_input = builtins.input
+    builtins.input = lambda prompt="": next(prompts)
+    output = io.StringIO()
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            function()
+        total = time.perf_counter() - start
+    finally:
+        builtins.input = original_input
+        setattr(fetch_owner, fetch_name, staticmethod(unwrapped) if isinstance(fetch_owner, type) else unwrapped)
+    return total, fetch_time, output.getvalue()
+
+
+def run_all():
+    for function, answers, (owner, name) in FLOWS.values():
+        run_flow(function, answers, owner, name)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--latency", type=float, default=0.05, help="Artificial latency per replayed response (s)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--record", action="store_true", help="Record the fixtures again")
+    parser.add_argument("--live", action="store_true", help="Record from the real APIs instead of the stand-in")
+    args = parser.parse_args()
+
+    weather_cache.ENABLED = False
+    forecast_cache.ENABLED = False
+    for module in (nitrogen_risk, phosphorus_risk, yield_risk):
+        module.datetime = FROZEN_DATETIME_MODULE
+
+    if args.record or not os.path.exists(args.fixtures):
+        if os.path.exists(args.fixtures):
+            os.remove(args.fixtures)
+        http_client.use_replay("record", args.fixtures)
+        if args.live:
+            run_all()
+        else:
+            urls = meteo_query.BASE_URL, weather.FORECAST_URL, stress_buster.FORECAST_URL
+            with StandInServer(api_handler) as server:
+                meteo_query.BASE_URL = server.url + "/dataset/query"
+                weather.FORECAST_URL = stress_buster.FORECAST_URL = server.url + "/api/Forecast/ShortRangeForecastDaily"
+                run_all()
+            # Replay answers the production URLs, the host is not part of the match
+            meteo_query.BASE_URL, weather.FORECAST_URL, stress_buster.FORECAST_URL = urls
+        store = http_replay.get_store(args.fixtures)
+        store.save()
+        print(f"recorded {len(store.responses)} responses to {args.fixtures} "
+              f"({os.path.getsize(args.fixtures) / 1024:.1f} KiB)")
+
+    http_client.use_replay("replay", args.fixtures, args.latency)
+    adapter = http_client.get_session().get_adapter("https://")
+    print(f"replaying {args.fixtures} with {args.latency * 1000:.0f} ms latency, best of {args.repeats}")
+    print(f"{'flow':16s} {'total ms':>9s} {'fetch ms':>9s} {'compute ms':>11s} {'requests':>9s}")
+    for flow, (function, answers, (owner, name)) in FLOWS.items():
+        best = None
+        for _ in range(args.repeats):
+            hits = adapter.hits
+            total, fetch, output = run_flow(function, answers, owner, name)
+            requests = adapter.hits - hits
+            if best is None or total < best[0]:
+                best = (total, fetch, requests)
+        total, fetch, requests = best
+        print(f"{flow:16s} {total * 1000:9.1f} {fetch * 1000:9.1f} {(total - fetch) * 1000:11.1f} {requests:9d}")
+    assert adapter.misses == 0, f"{adapter.misses} requests had no recorded response, record the fixtures again"
+    http_client.use_replay("")
+
+
+if __name__ == "__main__":
+    main()
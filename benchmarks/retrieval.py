@@ -0,0 +1,95 @@
+"""
+Build, incremental update and search latency of the knowledge index.
+
+The built-in recommendation texts are indexed together with synthetic field notes, then a
+few notes are edited, added and removed to show that only the changed snippets are
+embedded again. Search latency is measured on the memory-mapped index for a batch of
+questions. Run from the repository root:
+    python -m benchmarks.retrieval --documents 2000 --queries 500
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import knowledge_index
+
+TOPICS = ["irrigation", "heat stress", "frost", "nitrogen", "phosphorus", "soil moisture", "drought",
+          "biostimulant", "cover crops", "mulching", "sowing date", "pH correction", "yield", "fungal disease"]
+WORDS = ["apply", "early", "morning", "field", "crop", "leaves", "roots", "water", "evening", "before",
+         "after", "rain", "forecast", "monitor", "reduce", "increase", "organic", "matter", "dose", "hectare"]
+
+
+def synthetic_notes(count, seed=0):
+    rng = random.Random(seed)
+    notes = {}
+    for i in range(count):
+        paragraphs = []
+        for _ in range(rng.randint(3, 7)):
+            topic = rng.choice(TOPICS)
+            paragraphs.append(f"{topic.capitalize()}: " + " ".join(rng.choice(WORDS + topic.split()) for _ in range(rng.randint(20, 60))) + ".")
+        notes[f"notes/field_{i:05d}.md"] = "\n\n".join(paragraphs)
+    return notes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--changed", type=int, default=20, help="Documents edited, added and removed each")
+    parser.add_argument("--embedder", default=knowledge_index.EMBEDDER, help="Model name or \"hashing\"")
+    args = parser.parse_args()
+
+    embedder = knowledge_index.make_embedder(args.embedder)
+    documents = {**knowledge_index.builtin_documents(), **synthetic_notes(args.documents)}
+    with tempfile.TemporaryDirectory() as directory:
+        index = knowledge_index.KnowledgeIndex(directory, embedder)
+        start = time.perf_counter()
+        counts = index.update(documents)
+        build_time = time.perf_counter() - start
+        print(f"{embedder.name}: {len(index)} snippets from {len(documents)} documents, "
+              f"{index.matrix.nbytes / 1e6:.1f} MB matrix")
+        print(f"  full build       {build_time:7.2f} s  ({counts['embedded'] / build_time:.0f} snippets/s)")
+
+        start = time.perf_counter()
+        counts = index.update(documents)
+        print(f"  unchanged update {time.perf_counter() - start:7.3f} s  {counts}")
+
+        rng = random.Random(1)
+        names = sorted(name for name in documents if name.startswith("notes/"))
+        for name in rng.sample(names, args.changed):
+            documents[name] += "\n\nFrost: cover seedlings with fleece before a cold night."
+        for name in rng.sample(names, args.changed):
+            documents.pop(name, None)
+        documents.update({name.replace("notes/", "notes/new_"): text
+                          for name, text in synthetic_notes(args.changed, seed=2).items()})
+        start = time.perf_counter()
+        counts = index.update(documents)
+        print(f"  edit {args.changed}, remove {args.changed}, add {args.changed} documents: "
+              f"{time.perf_counter() - start:.3f} s  {counts}")
+
+        start = time.perf_counter()
+        index = knowledge_index.KnowledgeIndex(directory, embedder)
+        print(f"  reopen (memory-mapped) {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        questions = [f"How do I handle {rng.choice(TOPICS)} with {rng.choice(WORDS)} {rng.choice(WORDS)}?"
+                     for _ in range(args.queries)]
+        latencies = []
+        for question in questions:
+            start = time.perf_counter()
+            index.search(question, 3)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"  search top-3: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms over {len(index)} snippets")
+
+        for question in ["My nitrogen use efficiency is low, what should I do?",
+                         "A frost is forecast tonight", "Phosphorus solubilization for low PUE"]:
+            hits = index.search(question, 3, min_score=0)
+            print(f"\n  {question}")
+            for score, source, text in hits:
+                print(f"    {score:.2f} {source}: {text[:70]}")
+
+
+if __name__ == "__main__":
+    main()
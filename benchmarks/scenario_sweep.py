@@ -0,0 +1,115 @@
+"""
+Scenario sweep: one weather fetch and vectorized grids against rerunning the scalar formulas.
+
+Serves the dataset API from the local stand-in, fetches the season once, sweeps NUE, PUE and
+yield risk over rate x weather grids, and checks every surface against compute_nue,
+calculate_PUE / recommend_biosimulants and compute_yield_risk. Run from the repository root:
+    python -m benchmarks.scenario_sweep --rates 200 --scales 25
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+
+import meteo_query
+import scenario_sweep
+import weather_cache
+from benchmarks.stand_in_server import StandInServer, dataset_handler
+from data_visualization.nitrogen_risk import NUE_CATEGORIES, NitrogenStressRisk
+from data_visualization.phosphorus_risk import PUE_CATEGORIES, PhosphorusStress
+from data_visualization.yield_risk import YIELD_RISK_LEVELS, compute_gdd, compute_yield_risk, yield_risk_level
+
+CROP = "Corn"
+CROP_YIELD = 8000
+LOCATION = [7.57327, 47.558399, 279]
+
+
+def nue_category(recommendation):
+    return ["Low", "Moderate", "High"].index(recommendation.split()[1])
+
+
+def pue_category(recommendation):
+    for index, word in enumerate(["Low", "Moderate", "Good", "Excellent"]):
+        if f"{word} PUE" in recommendation:
+            return index
+
+
+def scalar_sweep(weather, nitrogen_rates, phosphorus_rates, nitrogen_indices, rainfall_scales, soil_moisture_scales,
+                 temperature_offsets):
+    """The same grids with the interactive flows' scalar functions, one scenario at a time."""
+    nue = np.empty((len(rainfall_scales), len(soil_moisture_scales), len(nitrogen_rates)))
+    nue_tiers = np.empty(nue.shape, dtype=int)
+    pue = np.empty((len(rainfall_scales), len(soil_moisture_scales), len(phosphorus_rates)))
+    pue_tiers = np.empty(pue.shape, dtype=int)
+    risk = np.empty((len(rainfall_scales), len(temperature_offsets), len(nitrogen_indices)))
+    risk_tiers = np.empty(risk.shape, dtype=int)
+    for i, rainfall_scale in enumerate(rainfall_scales):
+        rainfall = weather["rainfall"] * rainfall_scale
+        for j, soil_moisture_scale in enumerate(soil_moisture_scales):
+            soil_moisture = weather["soil_moisture"] * soil_moisture_scale
+            for k, rate in enumerate(nitrogen_rates):
+                result = NitrogenStressRisk.compute_nue(CROP, CROP_YIELD, rate, rainfall, soil_moisture)
+                nue[i, j, k], nue_tiers[i, j, k] = result["NUE"], nue_category(result["Recommendation"])
+            for k, rate in enumerate(phosphorus_rates):
+                crop = PhosphorusStress(CROP, CROP_YIELD / 1000, rate, rainfall, soil_moisture, weather["pH"])
+                pue[i, j, k], pue_tiers[i, j, k] = crop.calculate_PUE(), pue_category(crop.recommend_biosimulants())
+        for j, offset in enumerate(temperature_offsets):
+            gdd = compute_gdd((weather["max_temp"] + offset).tolist(), (weather["min_temp"] + offset).tolist())
+            for k, nitrogen_index in enumerate(nitrogen_indices):
+                risk[i, j, k] = compute_yield_risk(gdd, rainfall, weather["pH"], nitrogen_index, CROP)
+                risk_tiers[i, j, k] = list(YIELD_RISK_LEVELS).index(yield_risk_level(risk[i, j, k]))
+    return nue, nue_tiers, pue, pue_tiers, risk, risk_tiers
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=int, default=200, help="Application rates per nutrient")
+    parser.add_argument("--scales", type=int, default=25, help="Values per weather perturbation axis")
+    parser.add_argument("--delay", type=float, default=0.1, help="Injected latency per request (s)")
+    args = parser.parse_args()
+
+    weather_cache.ENABLED = False
+    with StandInServer(dataset_handler, delay=args.delay) as server:
+        meteo_query.BASE_URL = server.url + "/dataset/query"
+        start = time.perf_counter()
+        weather = scenario_sweep.fetch_weather(LOCATION, datetime.date(2024, 4, 1), datetime.date(2024, 9, 30))
+        fetch_time = time.perf_counter() - start
+    assert weather is not None
+
+    grid = {
+        "nitrogen_rates": np.linspace(10, 400, args.rates),
+        "phosphorus_rates": np.linspace(5, 200, args.rates),
+        "nitrogen_indices": np.linspace(0, 1, args.rates),
+        "rainfall_scales": np.linspace(0.25, 2.5, args.scales),
+        "soil_moisture_scales": np.linspace(0.5, 1.5, args.scales),
+        "temperature_offsets": np.linspace(-3, 3, args.scales),
+    }
+    scenarios = 3 * args.rates * args.scales ** 2
+
+    start = time.perf_counter()
+    result = scenario_sweep.sweep(CROP, weather, CROP_YIELD, **grid)
+    vector_time = time.perf_counter() - start
+    start = time.perf_counter()
+    nue, nue_tiers, pue, pue_tiers, risk, risk_tiers = scalar_sweep(weather, **grid)
+    scalar_time = time.perf_counter() - start
+
+    assert np.allclose(result["nitrogen"]["NUE"], nue) and (result["nitrogen"]["Category"] == nue_tiers).all()
+    assert np.allclose(result["phosphorus"]["PUE"], pue) and (result["phosphorus"]["Category"] == pue_tiers).all()
+    assert np.allclose(result["yield"]["risk"], risk) and (result["yield"]["Category"] == risk_tiers).all()
+
+    print(f"weather fetch: {server.requests} requests, {fetch_time * 1000:.0f} ms (once for all scenarios)")
+    print(f"scenarios:     {scenarios:,}")
+    print(f"scalar:        {scalar_time * 1000:9.1f} ms ({scenarios / scalar_time:12,.0f} scenarios/s)")
+    print(f"vectorized:    {vector_time * 1000:9.1f} ms ({scenarios / vector_time:12,.0f} scenarios/s)")
+
+    middle = args.scales // 2
+    for name, key, labels in (("nitrogen", "maximum_rate", NUE_CATEGORIES), ("phosphorus", "maximum_rate", PUE_CATEGORIES),
+                              ("yield", "minimum_rate", YIELD_RISK_LEVELS)):
+        rates = {label: result[name][key][label][middle, middle] for label in labels}
+        print(f"{name:10s} {key.replace('_', ' ')} per tier at the middle scenario: "
+              + ", ".join(f"{label} {rate:.3g}" for label, rate in rates.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Local stand-in for the meteoblue and CE Hub endpoints used by the benchmarks.
+
+The server speaks HTTP/1.1 with keep-alive, counts connections and concurrent requests,
+and can inject latency and transient failures. Handlers are plain callables mapping
+(method, path, query, body) to (status, JSON-serializable body). A body given as an
+iterator of bytes is sent as a chunked server-sent event stream, piece by piece.
+"""
+import datetime
+import json
+import math
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StandInServer:
+    def __init__(self, handler, delay=0.0, fail_first=0, fail_status=503):
+        """
+        Args:
+            handler: Callable (method, path, query, body) -> (status, body)
+            delay (float): Seconds slept before answering each request
+            fail_first (int): Number of initial requests answered with fail_status
+            fail_status (int): Status used for the injected failures
+        """
+        self.handler = handler
+        self.delay = delay
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _make_handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stand_in.lock:
+                    stand_in.connections += 1
+
+            def _answer(self, method):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                with stand_in.lock:
+                    stand_in.requests += 1
+                    stand_in.in_flight += 1
+                    stand_in.max_in_flight = max(stand_in.max_in_flight, stand_in.in_flight)
+                    failing = stand_in.requests <= stand_in.fail_first
+                try:
+                    if stand_in.delay:
+                        time.sleep(stand_in.delay)
+                    if failing:
+                        status, payload = stand_in.fail_status, {"error": "injected failure"}
+                    else:
+                        url = urlsplit(self.path)
+                        status, payload = stand_in.handler(method, url.path, parse_qs(url.query), body)
+                finally:
+                    with stand_in.lock:
+                        stand_in.in_flight -= 1
+                if not isinstance(payload, (bytes, dict, list)):
+                    self._stream(status, payload)
+                    return
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, status, pieces):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for piece in pieces:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                self._answer("GET")
+
+            def do_POST(self):
+                self._answer("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def synthetic_series(code, coords, days, start):
+    """Deterministic, plausible daily values for a dataset code at a location."""
+    lon, lat = coords[0], coords[1]
+    spec = (code["code"], code.get("aggregation"))
+    values = []
+    for ordinal in range(start.toordinal(), start.toordinal() + days):
+        season = math.sin(2 * math.pi * ordinal / 365.25)
+        if spec[0] == 11:
+            offset = {"max": 6, "min": -6}.get(spec[1], 0)
+            values.append(round(14 + 10 * season + offset - abs(lat) / 10, 2))
+        elif spec[0] in (61, 180):
+            values.append(round(2 + 2 * math.sin(ordinal * 1.7 + lon), 2) if (ordinal + int(lat)) % 3 else 0.0)
+        elif spec[0] == 144:
+            values.append(round(0.3 + 0.05 * season, 3))
+        elif spec[0] == 261:
+            values.append(round(-1.5 - season, 2))
+        else:
+            values.append(6.4)
+    return values
+
+
+def dataset_handler(method, path, query, body):
+    """
+    Answers meteoblue dataset queries like the API: one item per query, codes in request order,
+    and in every dataPerTimeInterval a data list holding one series per location.
+    """
+    payload = json.loads(body)
+    intervals = []
+    for time_interval in payload["timeIntervals"]:
+        start_text, end_text = time_interval.split("/")
+        start = datetime.date.fromisoformat(start_text[:10])
+        intervals.append((start, (datetime.date.fromisoformat(end_text[:10]) - start).days + 1))
+
+    geometry = payload["geometry"]
+    items = []
+    for dataset_query in payload["queries"]:
+        static = dataset_query["timeResolution"] == "static"
+        items.append({
+            "geometry": geometry,
+            "domain": dataset_query["domain"],
+            "codes": [{
+                "code": code["code"],
+                "level": code["level"],
+                "aggregation": code.get("aggregation", "none"),
+                "dataPerTimeInterval": [
+                    {"data": [synthetic_series(code, coords, 1 if static else days, start)
+                              for coords in geometry["coordinates"]]}
+                    for start, days in intervals
+                ],
+            } for code in dataset_query["codes"]],
+            "timeIntervals": [
+                [(start + datetime.timedelta(days=i)).strftime("%Y%m%dT0000") for i in range(1 if static else days)]
+                for start, days in intervals
+            ],
+        })
+    return 200, items
+
+
+def forecast_handler(method, path, query, body):
+    """Answers CE Hub ShortRangeForecastDaily queries with one entry per day (top days) and measure label."""
+    labels = [label.strip() for label in query["measureLabel"][0].split(";")]
+    lat, lon = float(query["latitude"][0]), float(query["longitude"][0])
+    top = int(query.get("top", ["30"])[0])
+    first_day = datetime.date(2025, 6, 1)
+    entries = []
+    for i in range(top):
+        day = first_day + datetime.timedelta(days=i)
+        season = math.sin(2 * math.pi * day.toordinal() / 365.25 + lon)
+        values = {
+            "TempAir_DailyMax (C)": 28 + 8 * season - abs(lat) / 10,
+            "TempAir_DailyMin (C)": 14 + 6 * season - abs(lat) / 10,
+            "TempAir_DailyAvg (C)": 21 + 7 * season - abs(lat) / 10,
+            "Precip_DailySum (mm)": max(0.0, 4 * math.sin(day.toordinal() * 1.3 + lat)),
+            "Referenceevapotranspiration_DailySum (mm)": 4 + season,
+            "Soilmoisture_0to10cm_DailyAvg (vol%)": 25 + 5 * season,
+        }
+        for label in labels:
+            value = values.get(label, 50 + 50 * math.sin(day.toordinal() + len(label)))
+            entries.append({
+                "date": f"{day.isoformat()} 00:00:00",
+                "measureLabel": label,
+                "dailyValue": round(value, 2),
+                "latitude": lat,
+                "longitude": lon,
+            })
+    return 200, entries
+
+
+def api_handler(method, path, query, body):
+    """Serves both the meteoblue dataset and the CE Hub forecast endpoints."""
+    if path.endswith("/dataset/query"):
+        return dataset_handler(method, path, query, body)
+    if path.endswith("/ShortRangeForecastDaily"):
+        return forecast_handler(method, path, query, body)
+    return 404, {"error": "Not found"}
+
+
+def text_generation_handler(token_delay=0.02, tokens=60, max_concurrent=0, max_per_second=0):
+    """
+    Returns a handler answering text-generation requests like a TGI endpoint.
+
+    The answer is `tokens` deterministic words derived from the prompt, produced every
+    token_delay seconds. Streamed requests get them as server-sent events as they are
+    produced; the others get [{"generated_text": ...}] once all are done, one per prompt when
+    "inputs" is a list. Like a provider's rate limits, requests beyond max_concurrent running
+    generations or max_per_second started in the last second get a 429 (0 for no limit).
+    """
+    lock = threading.Lock()
+    running = [0]
+    started = deque()
+
+    def answer_words(prompt):
+        seed = sum(prompt.encode())
+        vocabulary = ["soil", "water", "mulch", "shade", "irrigate", "early", "morning", "cover", "crops",
+                      "organic", "matter", "reduce", "evaporation", "temperature", "roots", "moisture"]
+        return [" " + vocabulary[(seed + i * 7) % len(vocabulary)] for i in range(tokens)]
+
+    def admit():
+        now = time.monotonic()
+        with lock:
+            while started and started[0] <= now - 1:
+                started.popleft()
+            if (max_concurrent and running[0] >= max_concurrent) or (max_per_second and len(started) >= max_per_second):
+                return False
+            running[0] += 1
+            started.append(now)
+            return True
+
+    def release():
+        with lock:
+            running[0] -= 1
+
+    def handler(method, path, query, body):
+        payload = json.loads(body)
+        if not admit():
+            return 429, {"error": "Rate limit reached"}
+        parameters = payload.get("parameters", {})
+        prefix = "" if parameters.get("return_full_text", True) is False else None
+        if not payload.get("stream"):
+            try:
+                time.sleep(token_delay * tokens)
+            finally:
+                release()
+            answers = [(prompt if prefix is None else prefix) + "".join(answer_words(prompt))
+                       for prompt in (payload["inputs"] if isinstance(payload["inputs"], list) else [payload["inputs"]])]
+            if isinstance(payload["inputs"], list):
+                return 200, [[{"generated_text": answer}] for answer in answers]
+            return 200, [{"generated_text": answers[0]}]
+
+        words = answer_words(payload["inputs"])
+
+        def events():
+            released = False
+            try:
+                for i, word in enumerate(words):
+                    time.sleep(token_delay)
+                    last = i == len(words) - 1
+                    event = {"index": i + 1, "token": {"id": i, "text": word, "logprob": 0.0, "special": False},
+                             "generated_text": "".join(words) if last else None, "details": None}
+                    if last:
+                        release()  # Done generating before the client sees the end
+                        released = True
+                    yield b"data:" + json.dumps(event).encode() + b"\n\n"
+            finally:
+                if not released:
+                    release()
+        return 200, events()
+
+    return handler
@@ -0,0 +1,91 @@
+"""
+Startup cost of main.py and of each module its menu handlers import.
+
+Every import is timed in a fresh interpreter so earlier imports do not hide the cost.
+With --check the script exits non-zero if a menu path that does not need the disease
+model pulls in tensorflow.
+
+Run from the repository root:
+    python -m benchmarks.startup [--check]
+"""
+import argparse
+import subprocess
+import sys
+
+MODULES = [
+    "main",
+    "llm",
+    "weather",
+    "collect_user_feedback",
+    "disease_detection",
+    "data_visualization.nitrogen_risk",
+    "data_visualization.phosphorus_risk",
+    "data_visualization.yield_risk",
+    "data_visualization.stress_buster",
+    "matplotlib.pyplot",
+    "PIL.Image",
+    "tensorflow",
+]
+
+# Modules imported by menu paths that must stay free of tensorflow
+TENSORFLOW_FREE_PATHS = {
+    "Ask a Question": ["main", "llm"],
+    "Weather Prediction": ["main", "weather"],
+    "Risk Analysis (Nitrogen)": ["main", "data_visualization.nitrogen_risk"],
+    "Risk Analysis (Phosphorus)": ["main", "data_visualization.phosphorus_risk"],
+    "Risk Analysis (Yield)": ["main", "data_visualization.yield_risk"],
+    "Risk Analysis (Stress)": ["main", "data_visualization.stress_buster"],
+    "User Feedback Collection": ["main", "collect_user_feedback"],
+}
+
+
+def run_python(code):
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+
+def import_time(module):
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    result = run_python(code)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def imports_tensorflow(modules):
+    code = "import sys\n" + "".join(f"import {m}\n" for m in modules) + "print('tensorflow' in sys.modules)\n"
+    result = run_python(code)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return result.stdout.strip().splitlines()[-1] == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true", help="Only run the tensorflow import check")
+    args = parser.parse_args()
+
+    if not args.check:
+        print(f"{'module':40s} import time")
+        for module in MODULES:
+            seconds = import_time(module)
+            timing = f"{seconds * 1000:8.1f} ms" if seconds is not None else "  failed"
+            print(f"{module:40s} {timing}")
+        print()
+
+    failures = []
+    for path, modules in TENSORFLOW_FREE_PATHS.items():
+        if imports_tensorflow(modules):
+            failures.append(path)
+        print(f"{path:40s} {'imports tensorflow' if path in failures else 'ok'}")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Peak memory of decoding a large dataset response: response.json() against the streaming parser.
+
+Builds a synthetic meteoblue response for --points locations over --years of daily data,
+serves it from the local stand-in, and fetches it in a fresh child process per approach so
+each peak RSS is measured on its own:
+    legacy   response.json(), then the per-code lists, as post_query used to do
+    stream   meteo_query.post_query, parsing the body into NumPy arrays as it arrives
+Run from the repository root:
+    python -m benchmarks.streaming_json --points 1000 --years 10
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+NAMES = ["precipitation", "max_temp", "min_temp"]
+
+
+def write_payload(path, points, days, seed=0):
+    """Writes the response text one series at a time, without building it in memory."""
+    rng = np.random.default_rng(seed)
+    first_day = datetime.date(2015, 1, 1)
+    timestamps = json.dumps([(first_day + datetime.timedelta(days=i)).strftime("%Y%m%dT0000") for i in range(days)])
+    coordinates = json.dumps([[point / 100, 45.0, 100] for point in range(points)])
+    names = json.dumps([f"p{point}" for point in range(points)])
+    with open(path, "w") as file:
+        # One item for the query, data holds one series per location
+        file.write(f'[{{"geometry": {{"type": "MultiPoint", "coordinates": {coordinates}, "locationNames": {names}}}, '
+                   f'"domain": "ERA5T", "codes": [')
+        for code in range(len(NAMES)):
+            file.write(("," if code else "") + f'{{"code": {code}, "level": "sfc", "unit": "", '
+                       f'"dataPerTimeInterval": [{{"data": [')
+            for point in range(points):
+                values = ",".join(map(str, np.round(rng.uniform(-10, 35, days), 2).tolist()))
+                file.write(("," if point else "") + f"[{values}]")
+            file.write('], "gapFillRatio": 0}]}')
+        file.write(f'], "timeIntervals": [{timestamps}]}}]')
+
+
+def reset_peak_rss():
+    """Resets the peak RSS on Linux, so the import-time peak does not hide the fetch."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mib():
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def rss_mib():
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return peak_rss_mib()
+
+
+def client(mode, url, points, days):
+    """Runs in the child process, prints one JSON line with the measurements."""
+    import http_client
+    import meteo_query
+
+    locations = [([point / 100, 45.0, 100], f"p{point}") for point in range(points)]
+    time_range = meteo_query.format_range(datetime.date(2015, 1, 1),
+                                          datetime.date(2015, 1, 1) + datetime.timedelta(days=days - 1))
+    reset_peak_rss()
+    baseline = rss_mib()
+    start = time.perf_counter()
+    if mode == "legacy":
+        payload = meteo_query.build_payload("ERA5T", "daily", NAMES, locations, [time_range])
+        items = http_client.post(url, json=payload).json()
+        series = [
+            {name: [interval['data'][i] for interval in res['dataPerTimeInterval']] for name, res in zip(NAMES, items[0]['codes'])}
+            for i in range(points)
+        ]
+        kept = sum(8 * 4 * len(values[0]) for result in series for values in result.values())  # list slot + float
+        check = sum(sum(values[0]) for result in series for values in result.values())
+    else:
+        meteo_query.BASE_URL = url
+        series = meteo_query.post_query("ERA5T", "daily", NAMES, locations, [time_range])
+        kept = sum(values[0].nbytes for result in series for values in result.values())
+        check = float(sum(values[0].sum() for result in series for values in result.values()))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"peak": peak_rss_mib() - baseline, "kept": kept / 2**20, "seconds": elapsed, "check": check}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--client", choices=["legacy", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    days = round(365.25 * args.years)
+
+    if args.client:
+        client(args.client, args.url, args.points, days)
+        return
+
+    from benchmarks.stand_in_server import StandInServer
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "response.json")
+        write_payload(path, args.points, days)
+        size = os.path.getsize(path)
+        with open(path, "rb") as file:
+            body = file.read()
+        print(f"{args.points} points x {days} days x {len(NAMES)} codes = {args.points * days * len(NAMES):,} values, "
+              f"{size / 2**20:.0f} MiB of JSON")
+
+        results = {}
+        with StandInServer(lambda method, path, query, request_body: (200, body)) as server:
+            for mode in ("legacy", "stream"):
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.streaming_json", "--client", mode, "--url", server.url + "/dataset/query",
+                     "--points", str(args.points), "--years", str(args.years)],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'approach':10s} {'peak RSS MiB':>13s} {'series MiB':>11s} {'seconds':>8s}")
+    for mode, result in results.items():
+        print(f"{mode:10s} {result['peak']:13.0f} {result['kept']:11.0f} {result['seconds']:8.2f}")
+    assert abs(results["legacy"]["check"] - results["stream"]["check"]) < 1e-6 * abs(results["legacy"]["check"])
+    print("values match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Vectorized stress indices against the original per-day loop of print_daily_risks.
+
+Builds CE Hub style entry lists for many fields over several years, then times the
+original dict grouping + get_value_for_measure + scalar loop, the per-field pivot, and
+one call over all fields stacked. Run from the repository root:
+    python -m benchmarks.stress_indices --fields 50 --years 3
+"""
+import argparse
+import datetime
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from data_visualization.stress_buster import (
+    MEASURES, compute_daily_risks, compute_diurnal_heat_stress, compute_drought_risk, compute_frost_stress,
+    compute_nighttime_heat_stress, compute_stress_indices, get_value_for_measure, stack_fields,
+)
+
+CROPS = ["Soybean", "Corn", "Cotton", "Rice", "Wheat"]
+
+
+def synthetic_entries(days, rng):
+    entries = []
+    first_day = datetime.date(2020, 1, 1)
+    for i in range(days):
+        date = f"{first_day + datetime.timedelta(days=i)} 00:00:00"
+        tavg = round(rng.uniform(-8, 38), 2) or 0.1  # The scalar drought index divides by it
+        values = [tavg + rng.uniform(3, 9), tavg - rng.uniform(3, 9), tavg,
+                  rng.uniform(0, 12), rng.uniform(1, 7), rng.uniform(10, 40)]
+        entries.extend({"date": date, "measureLabel": label, "dailyValue": round(value, 2)}
+                       for label, value in zip(MEASURES, values))
+    return entries
+
+
+def legacy_daily_risks(daily_data, crop):
+    """The computation print_daily_risks used to do, without the printing."""
+    data_by_date = defaultdict(list)
+    for entry in daily_data:
+        data_by_date[entry['date']].append(entry)
+
+    rows = []
+    for date, data in data_by_date.items():
+        tmax, tmin, avg_temp, rainfall, evapotranspiration, soil_moisture = (
+            get_value_for_measure(data, label) for label in MEASURES)
+        rows.append((
+            compute_diurnal_heat_stress(tmax, crop),
+            compute_nighttime_heat_stress(tmin, crop),
+            compute_frost_stress(tmin, crop),
+            compute_drought_risk(rainfall, evapotranspiration, soil_moisture, avg_temp),
+        ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fields", type=int, default=50)
+    parser.add_argument("--years", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    days = 365 * args.years
+    fields = [synthetic_entries(days, rng) for _ in range(args.fields)]
+    crops = [CROPS[i % len(CROPS)] for i in range(args.fields)]
+
+    start = time.perf_counter()
+    legacy = [legacy_daily_risks(entries, crop) for entries, crop in zip(fields, crops)]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_field = [compute_daily_risks(entries, crop)[1] for entries, crop in zip(fields, crops)]
+    per_field_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, values = stack_fields(fields)
+    pivot_time = time.perf_counter() - start
+    start = time.perf_counter()
+    stacked = compute_stress_indices(values, crops)
+    compute_time = time.perf_counter() - start
+
+    for field, rows in enumerate(legacy):
+        expected = np.array([row[:3] for row in rows], dtype=float)
+        for risks in (per_field[field], {key: value[field] for key, value in stacked.items()}):
+            actual = np.stack([risks["diurnal_heat_stress"], risks["nighttime_heat_stress"], risks["frost_stress"]], axis=1)
+            assert np.array_equal(expected, actual), "stress indices differ"
+            levels = ["No risk", "Medium risk", "High risk"]
+            assert [levels[i] for i in risks["drought_risk"]] == [row[3] for row in rows], "drought risk differs"
+
+    evaluations = args.fields * days
+    print(f"{args.fields} fields x {days} days, results identical")
+    print(f"legacy loop:       {legacy_time:7.3f} s ({evaluations / legacy_time:12,.0f} field-days/s)")
+    print(f"pivot per field:   {per_field_time:7.3f} s ({evaluations / per_field_time:12,.0f} field-days/s)")
+    print(f"stacked pivot:     {pivot_time:7.3f} s")
+    print(f"stacked compute:   {compute_time:7.3f} s ({evaluations / compute_time:12,.0f} field-days/s)")
+
+
+if __name__ == "__main__":
+    main()
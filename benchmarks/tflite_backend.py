@@ -0,0 +1,125 @@
+"""
+Accuracy parity, latency and memory of TFLite exports against the Keras model.
+
+Export the models first with model_export.py, then run from the repository root:
+    python -m benchmarks.tflite_backend model/best_model.tflite model/best_model_int8.tflite
+
+Each backend is measured in its own interpreter so resident memory is not shared.
+
+The sample images are also the int8 calibration images, so agreement on them flatters the
+quantized model. Pass a folder of images the export has not seen to measure parity there:
+    python -m benchmarks.tflite_backend model/best_model_int8.tflite --images data/held_out
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SAMPLE_IMAGES = ["model/Healthy.jpg", "model/Powdery.jpg", "model/Rusty.jpg"]
+
+
+def sample_batch():
+    from disease_detection import load_padded_image, normalize
+
+    arrays = []
+    for path in SAMPLE_IMAGES:
+        img_array = load_padded_image(path)
+        # Flipped and rotated variants give a few more inputs to compare on
+        arrays.extend([img_array, img_array[:, ::-1], img_array[::-1, :], np.rot90(img_array)])
+    return normalize(np.stack(arrays))
+
+
+def held_out_probs(model, folder, batch_size=32):
+    """Probabilities for every image under folder, in path order, predicted in batches."""
+    from disease_detection import predict_images
+    from scan_folder import iter_image_paths
+
+    paths = [os.path.join(folder, path) for path in iter_image_paths(folder)]
+    return [np.asarray(probs).tolist() for _, probs in predict_images(paths, model, batch_size=batch_size)]
+
+
+def measure(model_path, runs, images=None):
+    """Runs inside a child interpreter and prints a JSON line with the measurements."""
+    import psutil
+    from disease_detection import load_model
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start = time.perf_counter()
+    model = load_model(model_path)
+    load_time = time.perf_counter() - start
+
+    img_batch = sample_batch()
+    probs = np.asarray(model.predict(img_batch, verbose=0))
+
+    latencies = []
+    for i in range(runs):
+        single = img_batch[i % len(img_batch)][np.newaxis]
+        start = time.perf_counter()
+        model.predict(single, verbose=0)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    print(json.dumps({
+        "load_s": load_time,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(int(0.99 * len(latencies)), len(latencies) - 1)] * 1000,
+        "rss_mb": (process.memory_info().rss - rss_before) / 1e6,
+        "probs": probs.tolist(),
+        "held_out_probs": held_out_probs(model, images) if images else None,
+    }))
+
+
+def run_child(model_path, runs, images=None):
+    command = [sys.executable, "-m", "benchmarks.tflite_backend", "--measure", model_path, "--runs", str(runs)]
+    if images:
+        command += ["--images", images]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def agreement(probs, reference_probs):
+    """Share of inputs with the same top class as the reference, and the largest probability difference."""
+    probs, reference_probs = np.array(probs), np.array(reference_probs)
+    if probs.size == 0:
+        return float("nan"), float("nan")
+    return np.mean(probs.argmax(axis=1) == reference_probs.argmax(axis=1)), np.abs(probs - reference_probs).max()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("models", nargs="*", default=["model/best_model.tflite"])
+    parser.add_argument("--keras", default="model/best_model.keras")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--images", help="Folder of held-out images, not used for int8 calibration, to compare on")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.runs, args.images)
+        return
+
+    reference = run_child(args.keras, args.runs, args.images)
+    header = f"{'model':36s} {'load s':>7s} {'p50 ms':>8s} {'p99 ms':>8s} {'RSS MB':>8s} {'agree':>6s} {'max |dp|':>9s}"
+    if args.images:
+        print(f"Held-out: {len(reference['held_out_probs'])} images in {args.images}; "
+              f"'agree' is on the calibration samples, 'held-out' on the folder")
+        header += f" {'held-out':>9s} {'max |dp|':>9s}"
+    print(header)
+    for path in [args.keras] + args.models:
+        result = reference if path == args.keras else run_child(path, args.runs, args.images)
+        agree, max_diff = agreement(result["probs"], reference["probs"])
+        line = (f"{path:36s} {result['load_s']:7.2f} {result['p50_ms']:8.2f} {result['p99_ms']:8.2f} "
+                f"{result['rss_mb']:8.1f} {agree:6.0%} {max_diff:9.4f}")
+        if args.images:
+            agree, max_diff = agreement(result["held_out_probs"], reference["held_out_probs"])
+            line += f" {agree:9.0%} {max_diff:9.4f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
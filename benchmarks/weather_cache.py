@@ -0,0 +1,75 @@
+"""
+Repeated and season-long historical queries with and without the local weather cache.
+
+Simulates a risk run every day of a season: each run asks for the series from the crop
+start date to "today", so every run overlaps the previous one except for one new day.
+Run from the repository root:
+    python -m benchmarks.weather_cache --delay 0.1 --days 120
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import meteo_query
+import weather_cache
+from benchmarks.stand_in_server import StandInServer, dataset_handler
+
+LOCATION = [7.57327, 47.558399, 279]
+NAMES = ["precipitation", "soil_moisture", "max_temp", "min_temp"]
+
+
+def run_season(start, days):
+    results = []
+    for i in range(days):
+        today = start + datetime.timedelta(days=30 + i)
+        results.append(meteo_query.fetch_variables(LOCATION, "Basel", meteo_query.format_range(start, today), NAMES))
+    return results
+
+
+def as_lists(results):
+    """Series as plain lists, so results compare with ==."""
+    return [{name: None if series is None else series.tolist() for name, series in result.items()} for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=0.1, help="Injected latency per request (s)")
+    parser.add_argument("--days", type=int, default=120, help="Number of daily runs in the season")
+    args = parser.parse_args()
+
+    start = datetime.date(2023, 4, 1)
+    with StandInServer(dataset_handler, delay=args.delay) as server, tempfile.TemporaryDirectory() as directory:
+        meteo_query.BASE_URL = server.url + "/dataset/query"
+
+        weather_cache.ENABLED = False
+        begin = time.perf_counter()
+        uncached = run_season(start, args.days)
+        uncached_time, uncached_requests = time.perf_counter() - begin, server.requests
+
+        weather_cache.ENABLED = True
+        weather_cache._cache = weather_cache.WeatherCache(path=os.path.join(directory, "weather.sqlite"))
+        begin = time.perf_counter()
+        cached = run_season(start, args.days)
+        cached_time, cached_requests = time.perf_counter() - begin, server.requests - uncached_requests
+
+        # Asking again for the full season is served from disk without any request
+        before = server.requests
+        begin = time.perf_counter()
+        run_season(start, 1)
+        repeat_time = time.perf_counter() - begin
+        repeat_requests = server.requests - before
+
+        assert as_lists(cached) == as_lists(uncached), "cached series differ from fetched ones"
+        stats = weather_cache._cache.stats()
+        weather_cache._cache.close()
+
+    print(f"without cache: {uncached_requests:5d} requests, {uncached_time:6.2f} s")
+    print(f"with cache:    {cached_requests:5d} requests, {cached_time:6.2f} s, "
+          f"day hit rate {stats['hit_rate']:.1%}, {stats['rows']} rows stored")
+    print(f"repeat query:  {repeat_requests:5d} requests, {repeat_time * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
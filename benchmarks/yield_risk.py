@@ -0,0 +1,78 @@
+"""
+Vectorized GDD and yield risk against the scalar compute_gdd / compute_yield_risk.
+
+Run from the repository root:
+    python -m benchmarks.yield_risk --fields 20000 --days 180 --scenarios 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from data_visualization.yield_risk import (
+    CROPS, compute_gdd, compute_gdd_array, compute_yield_risk, compute_yield_risk_array, yield_risk_level_array,
+)
+
+
+def timed(function, repeats=3):
+    """Best of `repeats` runs, and the last result."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fields", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--scenarios", type=int, default=1_000_000, help="Field-season yield risk evaluations")
+    parser.add_argument("--scalar-sample", type=int, default=500, help="Fields timed on the scalar path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    tmax = rng.uniform(8, 36, (args.fields, args.days))
+    tmin = tmax - rng.uniform(4, 14, (args.fields, args.days))
+
+    # GDD, season totals
+    sample = args.scalar_sample
+    scalar_time, scalar_gdd = timed(lambda: [compute_gdd(a, b) for a, b in zip(tmax[:sample].tolist(), tmin[:sample].tolist())], 1)
+    vector_time, gdd = timed(lambda: compute_gdd_array(tmax, tmin))
+    assert np.allclose(gdd[:sample], scalar_gdd)
+    print(f"GDD scalar:      {sample / scalar_time:14,.0f} field-seasons/s")
+    print(f"GDD vectorized:  {args.fields / vector_time:14,.0f} field-seasons/s")
+
+    tbases = np.array([5.0, 8.0, 10.0, 12.0])
+    multi_time, _ = timed(lambda: compute_gdd_array(tmax, tmin, Tbase=tbases))
+    curve_time, _ = timed(lambda: compute_gdd_array(tmax, tmin, cumulative=True))
+    print(f"GDD x{len(tbases)} Tbase:    {args.fields * len(tbases) / multi_time:14,.0f} field-seasons/s")
+    print(f"GDD curves:      {args.fields / curve_time:14,.0f} field-seasons/s (cumulative per day)")
+
+    # Yield risk over many field-season scenarios
+    n = args.scenarios
+    GDD = rng.uniform(1500, 3500, n)
+    P = rng.uniform(200, 1600, n)
+    pH = rng.uniform(5.0, 8.0, n)
+    N = rng.uniform(0, 0.2, n)
+    crop_index = rng.integers(0, len(CROPS), n)
+    crop_names = np.array(CROPS)[crop_index]
+
+    scalar_time, scalar_risk = timed(lambda: [
+        compute_yield_risk(*row) for row in zip(GDD[:sample * 20].tolist(), P[:sample * 20].tolist(),
+                                                pH[:sample * 20].tolist(), N[:sample * 20].tolist(),
+                                                crop_names[:sample * 20].tolist())
+    ], 1)
+    index_time, risk = timed(lambda: compute_yield_risk_array(GDD, P, pH, N, crop_index))
+    names_time, _ = timed(lambda: compute_yield_risk_array(GDD, P, pH, N, crop_names))
+    level_time, _ = timed(lambda: yield_risk_level_array(risk))
+    assert np.allclose(risk[:sample * 20], scalar_risk)
+    print(f"risk scalar:     {sample * 20 / scalar_time:14,.0f} evaluations/s")
+    print(f"risk (indices):  {n / index_time:14,.0f} evaluations/s")
+    print(f"risk (names):    {n / names_time:14,.0f} evaluations/s")
+    print(f"risk levels:     {n / level_time:14,.0f} evaluations/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,6 @@
-import json
 import random
 
-# Simulated feedback database
-feedback_db = {}
+from feedback_store import get_store
 
 
 def predict_agriculture_risk():
@@ -17,10 +15,10 @@ def predict_agriculture_risk():
     return random.choice(predictions)  # Pick a random prediction
 
 
-def get_feedback(prediction_id, suggestion):
-    """Asks user for feedback on the suggested fix."""
+def get_feedback(prediction_id, suggestion, weather=None, risk=None):
+    """Asks user for feedback on the suggested fix and appends it to the feedback store."""
     feedback = input(f"Was the suggestion '{suggestion}' effective? (yes/no): ").strip().lower()
-    feedback_db[prediction_id] = feedback == "yes"
+    return get_store().add(prediction_id, feedback == "yes", weather, risk, suggestion)
 
 
 def collect_feedback():
@@ -34,10 +32,11 @@ def collect_feedback():
     print(f"⚠Identified Risk: {risk}")
     print(f"✅Suggested Fix: {suggestion}")
 
-    get_feedback(prediction_id, suggestion)
+    store = get_store()
+    effective, total = store.effectiveness(prediction_id=prediction_id)
+    if total:
+        print(f"👥 {effective} of {total} previous answers found this fix effective")
 
-    # Save feedback to file (optional)
-    with open("agriculture_feedback.json", "w") as file:
-        json.dump(feedback_db, file, indent=4)
+    store.flush(get_feedback(prediction_id, suggestion, weather, risk))
 
     print("\n🌱 Feedback saved! Thank you for your input.")
@@ -0,0 +1,98 @@
+"""
+Compact columnar container for CE Hub daily forecast responses.
+
+A response is a flat list of {"date", "measureLabel", "dailyValue", ...} objects, one per
+day and measure. DailyTable keeps one float column per measure over a single date index
+instead of the objects themselves: labels and dates are interned once, values land in a
+contiguous (days x measures) array, optionally float32, and missing values are NaN.
+"""
+import sys
+from array import array
+
+import numpy as np
+
+
+class DailyTable:
+    __slots__ = ("dates", "labels", "values", "columns")
+
+    def __init__(self, dates, labels, values):
+        self.dates = dates
+        self.labels = tuple(labels)
+        self.values = values
+        self.columns = {label: i for i, label in enumerate(self.labels)}
+
+    @classmethod
+    def from_entries(cls, entries, labels=None, dtype=np.float64):
+        """
+        Builds the table in one pass over the entries, without keeping them.
+
+        Args:
+            entries (iterable): CE Hub entry dicts, a list or any iterator over a response
+            labels (list): Measures to keep, in column order. By default every label, in first-seen order
+            dtype: np.float64, or np.float32 to halve the memory
+
+        Returns:
+            DailyTable: Dates in first-seen order. For a duplicated (date, measure) the first value wins.
+        """
+        fixed = labels is not None
+        columns = {label.strip(): i for i, label in enumerate(labels)} if fixed else {}
+        rows, dates = {}, []
+        # Cell coordinates and values as typed arrays, 24 bytes per value while parsing
+        cell_rows, cell_columns, cell_values = array("q"), array("q"), array("d")
+        for entry in entries:
+            date = entry["date"]
+            row = rows.get(date)
+            if row is None:
+                row = rows[date] = len(dates)
+                dates.append(sys.intern(date))
+            label = entry["measureLabel"].strip()
+            column = columns.get(label)
+            if column is None:
+                if fixed:
+                    continue
+                column = columns[sys.intern(label)] = len(columns)
+            cell_rows.append(row)
+            cell_columns.append(column)
+            cell_values.append(float(entry["dailyValue"]))
+
+        labels = [label.strip() for label in labels] if fixed else list(columns)
+        values = np.full((len(dates), len(labels)), np.nan, dtype=dtype)
+        cells = np.frombuffer(cell_rows, dtype=np.int64) * len(labels) + np.frombuffer(cell_columns, dtype=np.int64)
+        _, first = np.unique(cells, return_index=True)  # The first value of a duplicated cell wins
+        values.flat[cells[first]] = np.frombuffer(cell_values)[first]
+        return cls(dates, labels, values)
+
+    @staticmethod
+    def stack(tables, labels):
+        """
+        Aligns several tables on a shared date index.
+
+        Returns:
+            tuple: (dates, array of shape (tables, days, len(labels)) with NaN where a table has no value)
+        """
+        dates = list(dict.fromkeys(date for table in tables for date in table.dates))
+        index = {date: i for i, date in enumerate(dates)}
+        dtype = np.result_type(*(table.values.dtype for table in tables)) if tables else np.float64
+        values = np.full((len(tables), len(dates), len(labels)), np.nan, dtype=dtype)
+        for i, table in enumerate(tables):
+            rows = [index[date] for date in table.dates]
+            for j, label in enumerate(labels):
+                if label in table.columns:
+                    values[i, rows, j] = table.values[:, table.columns[label]]
+        return dates, values
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, label):
+        """The column of one measure, a view on the table."""
+        return self.values[:, self.columns[label.strip()]]
+
+    def row(self, i):
+        """The measures of one day as {label: value}, leaving out missing values."""
+        return {label: float(value) for label, value in zip(self.labels, self.values[i]) if not np.isnan(value)}
+
+    @property
+    def nbytes(self):
+        """Memory held by the values and the date index."""
+        return self.values.nbytes + sum(sys.getsizeof(date) for date in self.dates) + sys.getsizeof(self.dates)
@@ -0,0 +1,10 @@
+"""
+Crop name spellings shared across the risk modules.
+
+The nutrient modules (nitrogen_risk, phosphorus_risk) spell it "Soyabean", the yield and
+stress modules "Soybean". Callers normalize a crop name with CROP_NAMES and translate it
+with NUTRIENT_CROP_NAMES before calling a nutrient module.
+"""
+
+NUTRIENT_CROP_NAMES = {"Soybean": "Soyabean"}
+CROP_NAMES = {"Soyabean": "Soybean"}
@@ -1,12 +1,9 @@
-import os
 import datetime
-import requests
-from dotenv import load_dotenv
+import numpy as np
+from meteo_query import fetch_variables
 
-load_dotenv()  # Load environment variables from .env
-
-HIST_KEY = os.getenv("HIST_KEY")
-BASE_URL = f'http://my.meteoblue.com/dataset/query?apikey={HIST_KEY}'
+# NUE recommendation tiers, from worst to best
+NUE_CATEGORIES = ("low", "moderate", "high")
 
 
 class NitrogenStressRisk:
@@ -55,50 +52,61 @@ class NitrogenStressRisk:
             "Recommendation": nue_category
         }
 
+    @staticmethod
+    def compute_nue_array(crop_name, crop_yield, nitrogen_applied, actual_rainfall, actual_soil_moisture):
+        """
+        Vectorized compute_nue: the numeric arguments broadcast, so one call evaluates a grid of scenarios.
+
+        Returns:
+            dict: "NUE", "Rainfall Factor" and "Soil Moisture Factor" arrays, and "Category" holding
+            indices into NUE_CATEGORIES
+        """
+        if crop_name not in NitrogenStressRisk.CROP_OPTIMAL_VALUES:
+            raise ValueError(f"Unknown crop: {crop_name}")
+
+        optimal_precipitation = NitrogenStressRisk.CROP_OPTIMAL_VALUES[crop_name]["precipitation"]
+        optimal_soil_moisture = NitrogenStressRisk.CROP_OPTIMAL_VALUES[crop_name]["soil_moisture"]
+
+        rainfall_factor = np.asarray(actual_rainfall, dtype=float) / (sum(optimal_precipitation) / 2)
+        soil_moisture_factor = np.asarray(actual_soil_moisture, dtype=float) / (sum(optimal_soil_moisture) / 2)
+
+        with np.errstate(divide="ignore"):
+            nue = (np.asarray(crop_yield, dtype=float) / np.asarray(nitrogen_applied, dtype=float)) \
+                * rainfall_factor * soil_moisture_factor
+
+        return {
+            "NUE": nue,
+            "Rainfall Factor": rainfall_factor,
+            "Soil Moisture Factor": soil_moisture_factor,
+            "Category": NitrogenStressRisk.nue_category_array(nue),
+        }
+
+    @staticmethod
+    def nue_category_array(NUE):
+        """Vectorized tier of compute_nue's recommendation, returns indices into NUE_CATEGORIES."""
+        NUE = np.asarray(NUE, dtype=float)
+        return (NUE >= 20).astype(int) + (NUE > 40)
+
+    @staticmethod
+    def fetch_weather(location_coords, location_name, timestamp_range):
+        """Fetches total precipitation and average soil moisture in a single request."""
+        data = fetch_variables(location_coords, location_name, timestamp_range, ["precipitation", "soil_moisture"])
+        precipitation, soil_moisture = data["precipitation"], data["soil_moisture"]
+        actual_rainfall = sum(precipitation) if precipitation is not None else None
+        actual_soil_moisture = sum(soil_moisture) / len(soil_moisture) if soil_moisture is not None else None
+        return actual_rainfall, actual_soil_moisture
+
     @staticmethod
     def fetch_precipitation(location_coords, location_name, timestamp_range):
         """Fetches total precipitation over the given period."""
-        payload = {
-            "units": {"temperature": "C", "velocity": "km/h", "length": "metric", "energy": "watts"},
-            "geometry": {"type": "MultiPoint", "coordinates": [location_coords], "locationNames": [location_name]},
-            "format": "json",
-            "timeIntervals": [timestamp_range],
-            "queries": [{
-                "domain": "ERA5T",
-                "gapFillDomain": "NEMSGLOBAL",
-                "timeResolution": "daily",
-                "codes": [{"code": 61, "level": "sfc", "aggregation": "sum"}]
-            }]
-        }
-        response = requests.post(BASE_URL, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            return sum(data[0]['codes'][0]['dataPerTimeInterval'][0]['data'][0])
-        return None
+        data = fetch_variables(location_coords, location_name, timestamp_range, ["precipitation"])["precipitation"]
+        return sum(data) if data is not None else None
 
     @staticmethod
     def fetch_soil_moisture(location_coords, location_name, timestamp_range):
         """Fetches average soil moisture over the given period."""
-        payload = {
-            "units": {"temperature": "C", "velocity": "km/h", "length": "metric", "energy": "watts"},
-            "geometry": {"type": "MultiPoint", "coordinates": [location_coords], "locationNames": [location_name]},
-            "format": "json",
-            "timeIntervals": [timestamp_range],
-            "queries": [{
-                "domain": "ERA5T",
-                "gapFillDomain": "NEMSGLOBAL",
-                "timeResolution": "daily",
-                "codes": [
-                    {"code": 144, "level": "0-7 cm down", "aggregation": "mean"},
-                ]
-            }]
-        }
-        response = requests.post(BASE_URL, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            data = data[0]['codes'][0]['dataPerTimeInterval'][0]['data'][0]
-            return sum(data)/len(data)
-        return None
+        data = fetch_variables(location_coords, location_name, timestamp_range, ["soil_moisture"])["soil_moisture"]
+        return sum(data)/len(data) if data is not None else None
 
 
 def print_crop_list():
@@ -134,8 +142,7 @@ def nitrogen():
         timestamp_range = f"{start_date_colture}/{today_date}"
 
         print("\n🔄 Fetching weather data...")
-        actual_rainfall = NitrogenStressRisk.fetch_precipitation(location_coords, crop_name, timestamp_range)
-        actual_soil_moisture = NitrogenStressRisk.fetch_soil_moisture(location_coords, crop_name, timestamp_range)
+        actual_rainfall, actual_soil_moisture = NitrogenStressRisk.fetch_weather(location_coords, crop_name, timestamp_range)
 
         if actual_rainfall is None or actual_soil_moisture is None:
             print("❌ Error fetching weather data. Please check your inputs and try again.")
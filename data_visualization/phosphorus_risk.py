@@ -1,12 +1,10 @@
-import requests
 import datetime
-import os
-from dotenv import load_dotenv
+import numpy as np
+from meteo_query import fetch_variables
 
-load_dotenv()  # Load environment variables from .env
-
-HIST_KEY = os.getenv("HIST_KEY")
-BASE_URL = f'http://my.meteoblue.com/dataset/query?apikey={HIST_KEY}'
+# PUE recommendation tiers, from worst to best, and the PUE at which each better tier starts
+PUE_CATEGORIES = ("low", "moderate", "good", "excellent")
+PUE_THRESHOLDS = (0.05, 0.10, 0.15)
 
 class PhosphorusStress:
     def __init__(self, crop_name, yield_tonnes_per_ha, phosphorus_applied_kg_per_ha, actual_rainfall, actual_soil_moisture, actual_pH):
@@ -53,6 +51,19 @@ class PhosphorusStress:
         PUE = (self.yield_tonnes_per_ha / self.phosphorus_applied_kg_per_ha) * soil_factor
         return PUE
 
+    def calculate_PUE_array(self):
+        """Vectorized calculate_PUE for instances whose applied phosphorus and conditions are arrays that broadcast."""
+        optimal = self.optimal_conditions[self.crop_name]
+        actual_pH = np.asarray(self.actual_pH, dtype=float)
+        applied = np.asarray(self.phosphorus_applied_kg_per_ha, dtype=float)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pH_factor = np.where(actual_pH > 0, (sum(optimal["pH"]) / 2) / actual_pH, 0)
+            rainfall_factor = np.asarray(self.actual_rainfall, dtype=float) / (sum(optimal["precipitation"]) / 2)
+            soil_moisture_factor = np.asarray(self.actual_soil_moisture, dtype=float) / (sum(optimal["soil_moisture"]) / 2)
+            soil_factor = (pH_factor + soil_moisture_factor + rainfall_factor) / 4
+            return np.where(applied > 0, (self.yield_tonnes_per_ha / applied) * soil_factor, 0)
+
     def recommend_biosimulants(self):
         PUE = self.calculate_PUE()
         
@@ -90,70 +101,39 @@ class PhosphorusStress:
         else:
             return "🌟 Excellent PUE - No biosimulants needed at this time"
 
+    @staticmethod
+    def pue_category_array(PUE):
+        """Vectorized tier of recommend_biosimulants, returns indices into PUE_CATEGORIES."""
+        return np.searchsorted(PUE_THRESHOLDS, PUE, side="right")
+
+    @staticmethod
+    def fetch_conditions(location_coords, location_name, timestamp_range):
+        """Fetches total precipitation, average soil moisture and soil pH with one request per domain."""
+        data = fetch_variables(location_coords, location_name, timestamp_range,
+                               ["precipitation", "soil_moisture", "ph"])
+        precipitation, soil_moisture, ph = data["precipitation"], data["soil_moisture"], data["ph"]
+        return (
+            sum(precipitation) if precipitation is not None else None,
+            sum(soil_moisture) / len(soil_moisture) if soil_moisture is not None else None,
+            ph[0] if ph is not None else None,
+        )
+
     @staticmethod
     def fetch_precipitation(location_coords, location_name, timestamp_range):
         """Fetches total precipitation over the given period."""
-        payload = {
-            "units": {"temperature": "C", "velocity": "km/h", "length": "metric", "energy": "watts"},
-            "geometry": {"type": "MultiPoint", "coordinates": [location_coords], "locationNames": [location_name]},
-            "format": "json",
-            "timeIntervals": [timestamp_range],
-            "queries": [{
-                "domain": "ERA5T",
-                "gapFillDomain": "NEMSGLOBAL",
-                "timeResolution": "daily",
-                "codes": [{"code": 61, "level": "sfc", "aggregation": "sum"}]
-            }]
-        }
-        response = requests.post(BASE_URL, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            return sum(data[0]['codes'][0]['dataPerTimeInterval'][0]['data'][0])
-        return None
+        data = fetch_variables(location_coords, location_name, timestamp_range, ["precipitation"])["precipitation"]
+        return sum(data) if data is not None else None
 
     @staticmethod
     def fetch_ph(location_coords, location_name, timestamp_range):
         """Fetches soil pH from the dataset."""
-        payload = {
-            "units": {"temperature": "C", "velocity": "km/h", "length": "metric", "energy": "watts"},
-            "geometry": {"type": "MultiPoint", "coordinates": [location_coords], "locationNames": [location_name]},
-            "format": "json",
-            "timeIntervals": [timestamp_range],
-            "queries": [{
-                "domain": "SOILGRIDS1000",
-                "gapFillDomain": "NEMSGLOBAL",
-                "timeResolution": "static",
-                "codes": [{"code": 812, "level": "5 cm"}]
-            }]
-        }
-        response = requests.post(BASE_URL, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            return data[0]['codes'][0]['dataPerTimeInterval'][0]['data'][0][0]
-        return None
+        data = fetch_variables(location_coords, location_name, timestamp_range, ["ph"])["ph"]
+        return data[0] if data is not None else None
 
     @staticmethod
     def fetch_soil_moisture(location_coords, location_name, timestamp_range):
-        payload = {
-            "units": {"temperature": "C", "velocity": "km/h", "length": "metric", "energy": "watts"},
-            "geometry": {"type": "MultiPoint", "coordinates": [location_coords], "locationNames": [location_name]},
-            "format": "json",
-            "timeIntervals": [timestamp_range],
-            "queries": [{
-                "domain": "ERA5T",
-                "gapFillDomain": "NEMSGLOBAL",
-                "timeResolution": "daily",
-                "codes": [
-                    {"code": 144, "level": "0-7 cm down", "aggregation": "mean"},  # Soil moisture
-                ]
-            }]
-        }
-        response = requests.post(BASE_URL, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            data = data[0]['codes'][0]['dataPerTimeInterval'][0]['data'][0]
-            return sum(data)/len(data)
-        return None
+        data = fetch_variables(location_coords, location_name, timestamp_range, ["soil_moisture"])["soil_moisture"]
+        return sum(data)/len(data) if data is not None else None
 
 
 def phosphorus():
@@ -187,9 +167,8 @@ def phosphorus():
     timestamp_range = f"{start_date_colture}/{today_date}"
 
     print("\n⏳ Fetching environmental data...")
-    actual_rainfall = PhosphorusStress.fetch_precipitation(location_coords, crop_name, timestamp_range)
-    actual_soil_moisture = PhosphorusStress.fetch_soil_moisture(location_coords, crop_name, timestamp_range)
-    actual_pH = PhosphorusStress.fetch_ph(location_coords, crop_name, timestamp_range)
+    actual_rainfall, actual_soil_moisture, actual_pH = PhosphorusStress.fetch_conditions(
+        location_coords, crop_name, timestamp_range)
 
     print("\n📊 Environmental Conditions:")
     print(f"Rainfall: {actual_rainfall:.2f} mm")
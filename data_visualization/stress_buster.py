@@ -1,42 +1,59 @@
-import requests
-from collections import defaultdict
+import forecast_cache
 import os
+import numpy as np
+from daily_table import DailyTable
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env
 
+FORECAST_URL = "https://services.cehub.syngenta-ais.com/api/Forecast/ShortRangeForecastDaily"
+
 
 def fetch_daily_temperatures(latitude, longitude):
-    url = "https://services.cehub.syngenta-ais.com/api/Forecast/ShortRangeForecastDaily"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "supplier": "Meteoblue",
-        "measureLabel": "TempAir_DailyMax (C); TempAir_DailyMin (C); TempAir_DailyAvg (C); Precip_DailySum (mm); Referenceevapotranspiration_DailySum (mm); Soilmoisture_0to10cm_DailyAvg (vol%)",
-        "top": 30,
-        "format": "json"
-    }
-    headers = {
-        "accept": "*/*",
-        "ApiKey": os.getenv('LONG_KEY')
-    }
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return f"Error: {response.status_code}, {response.text}"
+    return forecast_cache.fetch_forecast(FORECAST_URL, latitude, longitude, MEASURES, os.getenv('LONG_KEY'))
+
+
+# Crop -> (TMaxOptimum, TMaxLimit)
+DIURNAL_HEAT_PARAMS = {
+    "Soybean": (32, 45),
+    "Corn": (33, 44),
+    "Cotton": (32, 38),
+    "Rice": (32, 38),
+    "Wheat": (25, 32)
+}
+
+# Crop -> (TMinOptimum, TMinLimit)
+NIGHTTIME_HEAT_PARAMS = {
+    "Soybean": (22, 28),
+    "Corn": (22, 28),
+    "Cotton": (20, 25),
+    "Rice": (22, 28),
+    "Wheat": (15, 20)
+}
+
+# Crop -> (TMinNoFrost, TMinFrost), frost stress is not applicable for Rice & Wheat
+FROST_PARAMS = {
+    "Soybean": (4, -3),
+    "Corn": (4, -3),
+    "Cotton": (4, -3)
+}
+
+# Columns of the pivoted (date x measure) arrays
+MEASURES = [
+    'TempAir_DailyMax (C)',
+    'TempAir_DailyMin (C)',
+    'TempAir_DailyAvg (C)',
+    'Precip_DailySum (mm)',
+    'Referenceevapotranspiration_DailySum (mm)',
+    'Soilmoisture_0to10cm_DailyAvg (vol%)',
+]
+TMAX, TMIN, TAVG, PRECIP, ET0, SOIL_MOISTURE = range(len(MEASURES))
+
+DROUGHT_RISKS = np.array(["No risk", "Medium risk", "High risk"])
 
 
 def compute_diurnal_heat_stress(tmax, crop):
-    crop_params = {
-        "Soybean": (32, 45),
-        "Corn": (33, 44),
-        "Cotton": (32, 38),
-        "Rice": (32, 38),
-        "Wheat": (25, 32)
-    }
-    
-    TMaxOptimum, TMaxLimit = crop_params[crop]
+    TMaxOptimum, TMaxLimit = DIURNAL_HEAT_PARAMS[crop]
     
     if tmax <= TMaxOptimum:
         return 0
@@ -46,15 +63,7 @@ def compute_diurnal_heat_stress(tmax, crop):
         return 9
 
 def compute_nighttime_heat_stress(tmin, crop):
-    crop_params = {
-        "Soybean": (22, 28),
-        "Corn": (22, 28),
-        "Cotton": (20, 25),
-        "Rice": (22, 28),
-        "Wheat": (15, 20)
-    }
-    
-    TMinOptimum, TMinLimit = crop_params[crop]
+    TMinOptimum, TMinLimit = NIGHTTIME_HEAT_PARAMS[crop]
     
     if tmin < TMinOptimum:
         return 0
@@ -64,16 +73,10 @@ def compute_nighttime_heat_stress(tmin, crop):
         return 9
     
 def compute_frost_stress(tmin, crop):
-    crop_params = {
-        "Soybean": (4, -3),
-        "Corn": (4, -3),
-        "Cotton": (4, -3)
-    }
-    
-    if crop not in crop_params:
+    if crop not in FROST_PARAMS:
         return 0  # Frost stress not applicable for Rice & Wheat
     
-    TMinNoFrost, TMinFrost = crop_params[crop]
+    TMinNoFrost, TMinFrost = FROST_PARAMS[crop]
     
     if tmin >= TMinNoFrost:
         return 0
@@ -96,6 +99,106 @@ def compute_drought_risk(rainfall, evapotranspiration, soil_moisture, avg_temp):
         return "High risk"
 
 
+def pivot_daily_data(daily_data, measures=MEASURES, dtype=np.float64):
+    """
+    Pivots CE Hub entries into a (date x measure) array in a single pass.
+
+    Returns:
+        tuple: (dates in first-seen order, float array of shape (days, len(measures)) with NaN for missing values)
+    """
+    table = DailyTable.from_entries(daily_data, measures, dtype)
+    return table.dates, table.values
+
+
+def stack_fields(daily_data_per_field, measures=MEASURES, dtype=np.float64):
+    """Pivots several fields onto a shared date index, shape (fields, days, measures)."""
+    return DailyTable.stack([DailyTable.from_entries(daily_data, measures, dtype)
+                             for daily_data in daily_data_per_field], measures)
+
+
+def _crop_thresholds(params, crops, ndim, default=None):
+    """Looks up (low, high) thresholds for one crop, or for one crop per field broadcast over days."""
+    if isinstance(crops, str):
+        return params.get(crops, default) if default is not None else params[crops]
+    table = np.array([params.get(crop, default) if default is not None else params[crop] for crop in crops],
+                     dtype=float)
+    shape = (len(crops),) + (1,) * (ndim - 1)
+    return table[:, 0].reshape(shape), table[:, 1].reshape(shape)
+
+
+def diurnal_heat_stress(tmax, crops):
+    """Vectorized compute_diurnal_heat_stress over days (and fields when crops is a list)."""
+    tmax = np.asarray(tmax, dtype=float)
+    optimum, limit = _crop_thresholds(DIURNAL_HEAT_PARAMS, crops, tmax.ndim)
+    with np.errstate(invalid="ignore"):
+        stress = np.where(tmax <= optimum, 0.0, np.where(tmax < limit, 9 * ((tmax - optimum) / (limit - optimum)), 9.0))
+    return np.where(np.isnan(tmax), np.nan, stress)
+
+
+def nighttime_heat_stress(tmin, crops):
+    """Vectorized compute_nighttime_heat_stress over days (and fields when crops is a list)."""
+    tmin = np.asarray(tmin, dtype=float)
+    optimum, limit = _crop_thresholds(NIGHTTIME_HEAT_PARAMS, crops, tmin.ndim)
+    with np.errstate(invalid="ignore"):
+        stress = np.where(tmin < optimum, 0.0, np.where(tmin < limit, 9 * ((tmin - optimum) / (limit - optimum)), 9.0))
+    return np.where(np.isnan(tmin), np.nan, stress)
+
+
+def frost_stress(tmin, crops):
+    """Vectorized compute_frost_stress over days (and fields when crops is a list)."""
+    tmin = np.asarray(tmin, dtype=float)
+    no_frost, frost = _crop_thresholds(FROST_PARAMS, crops, tmin.ndim, default=(np.nan, np.nan))
+    with np.errstate(invalid="ignore"):
+        stress = np.where(tmin >= no_frost, 0.0,
+                          np.where(tmin > frost, 9 * np.abs(tmin - no_frost) / np.abs(frost - no_frost), 9.0))
+        # Crops without frost parameters have NaN thresholds and get 0, like the scalar version
+        stress = np.where(np.isnan(no_frost), 0.0, stress)
+    return np.where(np.isnan(tmin), np.nan, stress)
+
+
+def drought_index(rainfall, evapotranspiration, soil_moisture, avg_temp):
+    """Vectorized Drought Index; drought_risk_level maps it to the compute_drought_risk labels."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (np.asarray(rainfall) - evapotranspiration + soil_moisture) / avg_temp
+
+
+def drought_risk_level(DI):
+    """0 = No risk, 1 = Medium risk, 2 = High risk, indexes into DROUGHT_RISKS."""
+    DI = np.asarray(DI)
+    with np.errstate(invalid="ignore"):
+        return np.where(DI > 1, 0, np.where(DI == 1, 1, 2))
+
+
+def compute_stress_indices(values, crops):
+    """
+    Computes every stress index for all days, and all fields, in one pass.
+
+    Args:
+        values (np.ndarray): Pivoted measures, shape (days, measures) or (fields, days, measures)
+        crops: Crop name, or one crop name per field
+
+    Returns:
+        dict: Arrays of shape (days,) or (fields, days) for each index, plus a "complete" mask of
+        days that have all measures
+    """
+    values = np.asarray(values, dtype=float)
+    DI = drought_index(values[..., PRECIP], values[..., ET0], values[..., SOIL_MOISTURE], values[..., TAVG])
+    return {
+        "diurnal_heat_stress": diurnal_heat_stress(values[..., TMAX], crops),
+        "nighttime_heat_stress": nighttime_heat_stress(values[..., TMIN], crops),
+        "frost_stress": frost_stress(values[..., TMIN], crops),
+        "drought_index": DI,
+        "drought_risk": drought_risk_level(DI),
+        "complete": ~np.isnan(values).any(axis=-1),
+    }
+
+
+def compute_daily_risks(daily_data, crop):
+    """Headless version of print_daily_risks: returns the dates and the stress index arrays."""
+    dates, values = pivot_daily_data(daily_data)
+    return dates, compute_stress_indices(values, crop)
+
+
 def get_value_for_measure(daily_data, measure_label):
     """Extract the value for a specific measure (e.g., TempAir_DailyMax) from the daily data."""
     for entry in daily_data:
@@ -149,27 +252,17 @@ def get_stress_recommendations(diurnal_heat_stress, nighttime_heat_stress, frost
 
 def print_daily_risks(daily_data, crop):
     """Print the risk levels and recommendations for each day with emojis."""
-    data_by_date = defaultdict(list)
-    for entry in daily_data:
-        data_by_date[entry['date']].append(entry)
-
-    for date, data in data_by_date.items():
-        tmax = get_value_for_measure(data, 'TempAir_DailyMax (C)')
-        tmin = get_value_for_measure(data, 'TempAir_DailyMin (C)')
-        avg_temp = get_value_for_measure(data, 'TempAir_DailyAvg (C)')
-        rainfall = get_value_for_measure(data, 'Precip_DailySum (mm)')
-        evapotranspiration = get_value_for_measure(data, 'Referenceevapotranspiration_DailySum (mm)')
-        soil_moisture = get_value_for_measure(data, 'Soilmoisture_0to10cm_DailyAvg (vol%)')
+    dates, risks = compute_daily_risks(daily_data, crop)
 
-        if any(x is None for x in [tmax, tmin, avg_temp, rainfall, evapotranspiration, soil_moisture]):
+    for i, date in enumerate(dates):
+        if not risks["complete"][i]:
             print(f"⚠️ Missing data for {date}")
             continue
 
-        # Compute the different stress factors
-        diurnal_heat_stress = compute_diurnal_heat_stress(tmax, crop)
-        nighttime_heat_stress = compute_nighttime_heat_stress(tmin, crop)
-        frost_stress = compute_frost_stress(tmin, crop)
-        drought_risk = compute_drought_risk(rainfall, evapotranspiration, soil_moisture, avg_temp)
+        diurnal_heat_stress = risks["diurnal_heat_stress"][i]
+        nighttime_heat_stress = risks["nighttime_heat_stress"][i]
+        frost_stress = risks["frost_stress"][i]
+        drought_risk = DROUGHT_RISKS[risks["drought_risk"][i]]
 
         # Print the results
         print(f"\n📅 Date: {date[:10]}")
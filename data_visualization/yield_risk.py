@@ -1,13 +1,6 @@
-import requests
-import json
 import datetime
-import os
-from dotenv import load_dotenv
-
-load_dotenv()  # Load environment variables from .env
-
-HIST_KEY = os.getenv("HIST_KEY")
-BASE_URL = f'http://my.meteoblue.com/dataset/query?apikey={HIST_KEY}'
+import numpy as np
+from meteo_query import fetch_variables
 
 CROP_OPTIMAL_VALUES = {
     "Soybean": {"GDD": (2400, 3000), "P": (450, 700), "pH": (6.0, 6.8), "N": (0, 0.026)},
@@ -19,70 +12,32 @@ CROP_OPTIMAL_VALUES = {
 
 WEIGHTS = {"GDD": 0.3, "P": 0.3, "pH": 0.2, "N": 0.2}
 
+# Crops in a fixed order, with the midpoints of their optimal ranges as rows of (GDD, P, pH, N)
+CROPS = list(CROP_OPTIMAL_VALUES)
+CROP_OPTIMA = np.array([[sum(CROP_OPTIMAL_VALUES[crop][key]) / 2 for key in WEIGHTS] for crop in CROPS])
+
+def fetch_inputs(location_coords, location_name, timestamp_range):
+    """Fetches total precipitation, soil pH and daily Tmax/Tmin with one request per domain."""
+    data = fetch_variables(location_coords, location_name, timestamp_range,
+                           ["precipitation", "ph", "max_temp", "min_temp"])
+    P = sum(data["precipitation"]) if data["precipitation"] is not None else None
+    pH = data["ph"][0] if data["ph"] is not None else None
+    return P, pH, data["max_temp"], data["min_temp"]
+
 def fetch_precipitation(location_coords, location_name, timestamp_range):
     """Fetches total precipitation over the given period."""
-    payload = {
-        "units": {"temperature": "C", "velocity": "km/h", "length": "metric", "energy": "watts"},
-        "geometry": {"type": "MultiPoint", "coordinates": [location_coords], "locationNames": [location_name]},
-        "format": "json",
-        "timeIntervals": [timestamp_range],
-        "queries": [{
-            "domain": "ERA5T",
-            "gapFillDomain": "NEMSGLOBAL",
-            "timeResolution": "daily",
-            "codes": [{"code": 61, "level": "sfc", "aggregation": "sum"}]
-        }]
-    }
-    response = requests.post(BASE_URL, json=payload)
-    if response.status_code == 200:
-        data = response.json()
-        return sum(data[0]['codes'][0]['dataPerTimeInterval'][0]['data'][0])
-    return None
+    data = fetch_variables(location_coords, location_name, timestamp_range, ["precipitation"])["precipitation"]
+    return sum(data) if data is not None else None
 
 def fetch_ph(location_coords, location_name, timestamp_range):
     """Fetches soil pH from the dataset."""
-    payload = {
-        "units": {"temperature": "C", "velocity": "km/h", "length": "metric", "energy": "watts"},
-        "geometry": {"type": "MultiPoint", "coordinates": [location_coords], "locationNames": [location_name]},
-        "format": "json",
-        "timeIntervals": [timestamp_range],
-        "queries": [{
-            "domain": "SOILGRIDS1000",
-            "gapFillDomain": "NEMSGLOBAL",
-            "timeResolution": "static",
-            "codes": [{"code": 812, "level": "5 cm"}]
-        }]
-    }
-    response = requests.post(BASE_URL, json=payload)
-    if response.status_code == 200:
-        data = response.json()
-        return data[0]['codes'][0]['dataPerTimeInterval'][0]['data'][0][0]
-    return None
+    data = fetch_variables(location_coords, location_name, timestamp_range, ["ph"])["ph"]
+    return data[0] if data is not None else None
 
 def fetch_temperature(location_coords, location_name, timestamp_range):
     """Fetches daily max and min temperature for GDD calculation."""
-    payload = {
-        "units": {"temperature": "C", "velocity": "km/h", "length": "metric", "energy": "watts"},
-        "geometry": {"type": "MultiPoint", "coordinates": [location_coords], "locationNames": [location_name]},
-        "format": "json",
-        "timeIntervals": [timestamp_range],
-        "queries": [{
-            "domain": "ERA5T",
-            "gapFillDomain": "NEMSGLOBAL",
-            "timeResolution": "daily",
-            "codes": [
-                {"code": 11, "level": "2 m above gnd", "aggregation": "max"},  # Tmax
-                {"code": 11, "level": "2 m above gnd", "aggregation": "min"}   # Tmin
-            ]
-        }]
-    }
-    response = requests.post(BASE_URL, json=payload)
-    if response.status_code == 200:
-        data = response.json()
-        Tmax_values = data[0]['codes'][0]['dataPerTimeInterval'][0]['data'][0]
-        Tmin_values = data[0]['codes'][1]['dataPerTimeInterval'][0]['data'][0]
-        return Tmax_values, Tmin_values
-    return None, None
+    data = fetch_variables(location_coords, location_name, timestamp_range, ["max_temp", "min_temp"])
+    return data["max_temp"], data["min_temp"]
 
 def compute_gdd(Tmax_values, Tmin_values, Tbase=10):
     """Computes the total GDD over the period."""
@@ -107,15 +62,94 @@ def compute_yield_risk(GDD, P, pH, N, crop):
     return yield_risk
 
 
+def compute_gdd_array(Tmax_values, Tmin_values, Tbase=10, cumulative=False):
+    """
+    Vectorized compute_gdd over stacked temperature series.
+
+    Days with a missing (NaN) temperature contribute no GDD, so seasons of different
+    lengths can be padded with NaN into one array.
+
+    Args:
+        Tmax_values (np.ndarray): Daily max temperature, shape (..., days), e.g. (fields, days)
+        Tmin_values (np.ndarray): Daily min temperature, same shape
+        Tbase: Base temperature, or a 1-D array of base temperatures evaluated all at once
+        cumulative (bool): Return the running GDD total per day instead of the season total
+
+    Returns:
+        np.ndarray: Shape (...) or (..., days) when cumulative, with a leading axis per Tbase
+        value when Tbase is an array
+    """
+    mean_temp = (np.asarray(Tmax_values, dtype=float) + np.asarray(Tmin_values, dtype=float)) / 2
+    Tbase = np.asarray(Tbase, dtype=float)
+    if Tbase.ndim:
+        Tbase = Tbase.reshape(Tbase.shape + (1,) * mean_temp.ndim)
+    daily_gdd = np.fmax(mean_temp - Tbase, 0)  # fmax turns NaN days into 0
+    if cumulative:
+        return np.cumsum(daily_gdd, axis=-1)
+    return daily_gdd.sum(axis=-1)
+
+
+def crop_indices(crops):
+    """Maps crop names (a name or an array of names) to row indices of CROP_OPTIMA."""
+    if isinstance(crops, str):
+        return CROPS.index(crops)
+    names, inverse = np.unique(np.asarray(crops), return_inverse=True)
+    lookup = np.array([CROPS.index(name) for name in names])
+    return lookup[inverse].reshape(np.shape(crops))
+
+
+def compute_yield_risk_array(GDD, P, pH, N, crops):
+    """
+    Vectorized compute_yield_risk: every argument broadcasts, so one call scores many fields and seasons.
+
+    Args:
+        GDD, P, pH, N: Scalars or arrays
+        crops: Crop name, array of crop names, or array of indices into CROPS
+
+    Returns:
+        np.ndarray: Yield risk with the broadcast shape of the inputs
+    """
+    crops = np.asarray(crops)
+    index = crop_indices(crops) if crops.dtype.kind in "UO" else crops
+    optima = CROP_OPTIMA[index]
+    weights = WEIGHTS.values()
+    terms = [np.asarray(value, dtype=float) for value in (GDD, P, pH, N)]
+    yield_risk = 0
+    for i, (weight, value) in enumerate(zip(weights, terms)):
+        yield_risk = yield_risk + weight * (value - optima[..., i]) ** 2
+    return yield_risk
+
+
+YIELD_RISK_THRESHOLDS = (5000, 10000, 20000)  # Example threshold values, adjust based on real data
+YIELD_RISK_LEVELS = np.array(["low", "moderate", "high", "critical"])
+
+
+def yield_risk_level(yield_risk):
+    """Classifies a yield risk score as low, moderate, high or critical."""
+    T1, T2, T3 = YIELD_RISK_THRESHOLDS
+    if yield_risk < T1:
+        return "low"
+    elif yield_risk < T2:
+        return "moderate"
+    elif yield_risk < T3:
+        return "high"
+    return "critical"
+
+
+def yield_risk_level_array(yield_risk):
+    """Vectorized yield_risk_level, returns indices into YIELD_RISK_LEVELS."""
+    return np.searchsorted(YIELD_RISK_THRESHOLDS, yield_risk, side="right")
+
+
 def recommend_biostimulant(yield_risk):
     """Prints recommendations based on yield risk."""
-    T1, T2, T3 = 5000, 10000, 20000  # Example threshold values, adjust based on real data
+    level = yield_risk_level(yield_risk)
 
-    if yield_risk < T1:
+    if level == "low":
         print("Yield risk is low. No intervention needed.")
-    elif yield_risk < T2:
+    elif level == "moderate":
         print("Yield risk is moderate. Monitor conditions and consider minor adjustments.")
-    elif yield_risk < T3:
+    elif level == "high":
         print("Yield risk is high. Consider applying a biostimulant.")
     else:
         print("\n⚠️ Critical Yield Risk Detected! ⚠️")
@@ -145,11 +179,9 @@ def yield_():
     today_date = datetime.datetime.now().strftime("%Y-%m-%dT+00:00")
     timestamp_range = f"{start_date_colture}/{today_date}"
 
-    P = fetch_precipitation(location_coords, crop_name, timestamp_range)
-    pH = fetch_ph(location_coords, crop_name, timestamp_range)
-    Tmax_values, Tmin_values = fetch_temperature(location_coords, crop_name, timestamp_range)
+    P, pH, Tmax_values, Tmin_values = fetch_inputs(location_coords, crop_name, timestamp_range)
     
-    if None in (P, pH, Tmax_values, Tmin_values):
+    if any(value is None for value in (P, pH, Tmax_values, Tmin_values)):
         print("Error fetching data. Check API response.")
     else:
         GDD = compute_gdd(Tmax_values, Tmin_values)
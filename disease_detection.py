@@ -1,39 +1,174 @@
+import io
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # 3 = Suppress all INFO and WARNING messages
 import absl.logging
 absl.logging.set_verbosity(absl.logging.ERROR)
 
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import http_client
 from PIL import Image
 
+# Define class labels
+LABELS = ['Healthy', 'Powdery', 'Rusty']
+IMAGE_SIZE = 256
+
+# Address of a running inference_server.py, used when predict_image gets no model
+INFERENCE_URL = os.getenv("INFERENCE_URL")
+
+
+class TFLiteModel:
+    """Runs a .tflite export of the classifier behind the same predict() call as a Keras model."""
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = None
+
+    def predict(self, img_batch, batch_size=None, verbose=0):
+        img_batch = np.asarray(img_batch, dtype=np.float32)
+        if img_batch.shape[0] != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, img_batch.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = img_batch.shape[0]
+        self.interpreter.set_tensor(self.input_index, img_batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index)
+
 
-def predict_image(image_path, model):
-    # Load the image using PIL
-    img = Image.open(image_path)
+def load_model(model_path):
+    """Loads the classifier, using the TFLite backend for .tflite files and Keras otherwise."""
+    if model_path.endswith(".tflite"):
+        return TFLiteModel(model_path)
+
+    import tensorflow as tf
+    return tf.keras.models.load_model(model_path)
+
+
+def load_padded_image(image, out=None):
+    """
+    Loads an image and letterboxes it on a white IMAGE_SIZE x IMAGE_SIZE canvas.
+
+    Image.thumbnail already decodes JPEGs in draft mode at the largest DCT scale that stays
+    above twice the target size, so the decode is cheap and the pixels match the original
+    thumbnail/paste path. The result is written straight into `out` instead of a new image.
+
+    Args:
+        image: Path or file object of an image, or an already decoded HxWx3 uint8 array
+        out (np.ndarray): Optional reusable uint8 buffer of shape (IMAGE_SIZE, IMAGE_SIZE, 3)
+
+    Returns:
+        np.ndarray: uint8 array of shape (IMAGE_SIZE, IMAGE_SIZE, 3)
+    """
+    if out is None:
+        out = np.empty((IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8)
+
+    if isinstance(image, np.ndarray):
+        if image.shape == (IMAGE_SIZE, IMAGE_SIZE, 3) and image.dtype == np.uint8:
+            out[...] = image
+            return out
+        img = Image.fromarray(image)
+    else:
+        img = Image.open(image)
 
     # Resize image while maintaining aspect ratio to fit within 256x256
-    max_size = 256
-    img.thumbnail((max_size, max_size))  # Resize maintaining aspect ratio
+    img.thumbnail((IMAGE_SIZE, IMAGE_SIZE))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    # White padding around the centered image
+    left, top = (IMAGE_SIZE - img.width) // 2, (IMAGE_SIZE - img.height) // 2
+    out.fill(255)
+    out[top:top + img.height, left:left + img.width] = np.asarray(img)
+    return out
 
-    # Create a new 256x256 white image for padding
-    new_img = Image.new("RGB", (256, 256), (255, 255, 255))  # White padding
-    new_img.paste(img, ((256 - img.width) // 2, (256 - img.height) // 2))
 
-    # Convert the image to a NumPy array and preprocess it
-    img_array = np.array(new_img)
-    img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
-    img_array = img_array / 255.0  # Rescale the image to [0, 1]
+def normalize(img_batch, out=None):
+    """Rescales uint8 pixels to [0, 1] float32, bit-identical to float32(pixels / 255.0)."""
+    return np.divide(img_batch, np.float32(255), out=out, dtype=np.float32)
+
+
+def predict_images(images, model, batch_size=32, num_workers=4):
+    """
+    Classifies many images with one model call per batch.
+
+    Decoding and padding run on a thread pool (PIL releases the GIL while decoding).
+    Each worker letterboxes into its slot of a reusable uint8 batch, which is then
+    normalized into a reusable float32 batch.
+
+    Args:
+        images (list): Image paths, file objects or decoded uint8 arrays
+        model: Loaded Keras model
+        batch_size (int): Number of images per model call
+        num_workers (int): Decoding threads
+
+    Returns:
+        list: (label, probabilities) tuples in input order
+    """
+    images = list(images)
+    results = []
+    pixels = np.empty((batch_size, IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8)
+    batch = np.empty((batch_size, IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+
+    with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            list(executor.map(load_padded_image, chunk, pixels[:len(chunk)]))
+            normalize(pixels[:len(chunk)], out=batch[:len(chunk)])
+
+            predictions = model.predict(batch[:len(chunk)], batch_size=len(chunk), verbose=0)
+            for probs in np.asarray(predictions):
+                results.append((LABELS[int(np.argmax(probs))], probs))
+
+    return results
+
+
+def predict_remote(image_bytes, server_url):
+    """Sends the raw image bytes to inference_server.py and returns (label, probabilities)."""
+    response = http_client.post(f"{server_url.rstrip('/')}/predict", data=image_bytes, timeout=30)
+    response.raise_for_status()
+    result = response.json()
+    return result["label"], result["probabilities"]
+
+
+def predict_image(image_path, model=None, server_url=None, cache=None):
+    server_url = server_url or (INFERENCE_URL if model is None else None)
+    if server_url or cache is not None:
+        with open(image_path, "rb") as file:
+            image_bytes = file.read()
+
+        # Re-uploaded photos are answered from the prediction cache without touching the model
+        cached = cache.get(image_bytes) if cache is not None else None
+        if cached is not None:
+            return cached[0]
+
+        if server_url:
+            label, probs = predict_remote(image_bytes, server_url)
+        else:
+            label, probs = predict_images([io.BytesIO(image_bytes)], model, batch_size=1, num_workers=1)[0]
+        if cache is not None:
+            cache.put(image_bytes, label, probs)
+        return label
+
+    # Letterbox into a 256x256 uint8 array and rescale to [0, 1] float32
+    img_array = normalize(load_padded_image(image_path))
+    img_array = img_array[np.newaxis]  # Add batch dimension
 
     # Make prediction
     predictions = model.predict(img_array, verbose=0)
 
-    # Define class labels
-    labels = ['Healthy', 'Powdery', 'Rusty']
-
     # Get the predicted class index
     predicted_class_idx = np.argmax(predictions, axis=1)[0]
 
     # Get the predicted label name
-    predicted_label = labels[int(predicted_class_idx)]
+    predicted_label = LABELS[int(predicted_class_idx)]
 
     return predicted_label
@@ -0,0 +1,295 @@
+"""
+Append-only store for the feedback on risk predictions.
+
+Every submission is a new row in a SQLite database in WAL mode; nothing is rewritten.
+Submissions are queued in memory and written by one background thread, many rows per
+transaction, so a burst of feedback costs one fsync per batch instead of one per row.
+Several threads and processes can write to the same file at once: SQLite serializes the
+transactions and readers never block writers. Indexes on prediction id, weather condition
+and time keep the queries fast, and the WAL file is checkpointed and truncated
+periodically so it does not grow without bound. A batch whose transaction fails, e.g. on a
+lock held too long by another process, is retried with backoff before it is given up on.
+
+Feedback from the previous agriculture_feedback.json is imported once.
+
+Settings come from the environment:
+    FEEDBACK_DB               database file (default agriculture_feedback.sqlite)
+    FEEDBACK_FLUSH_MS         how long a submission waits for others to share its transaction (default 50)
+    FEEDBACK_FLUSH_SIZE       submissions written per transaction at most (default 1000)
+    FEEDBACK_COMPACT_SECONDS  seconds between WAL checkpoints (default 300)
+    FEEDBACK_MAX_RETRIES      retries of a failed batch before its submissions are reported as failed (default 5)
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.getenv("FEEDBACK_DB", "agriculture_feedback.sqlite")
+FLUSH_MS = float(os.getenv("FEEDBACK_FLUSH_MS", 50))
+FLUSH_SIZE = int(os.getenv("FEEDBACK_FLUSH_SIZE", 1000))
+COMPACT_SECONDS = float(os.getenv("FEEDBACK_COMPACT_SECONDS", 300))
+MAX_RETRIES = int(os.getenv("FEEDBACK_MAX_RETRIES", 5))
+LEGACY_PATH = "agriculture_feedback.json"
+
+COLUMNS = ("prediction_id", "weather", "risk", "suggestion", "effective", "created_at")
+
+
+class FeedbackStore:
+    def __init__(self, path=DB_PATH, flush_ms=FLUSH_MS, flush_size=FLUSH_SIZE, compact_seconds=COMPACT_SECONDS,
+                 max_retries=MAX_RETRIES):
+        """
+        Args:
+            path (str): SQLite database file
+            flush_ms (float): How long a submission waits for others to share its transaction
+            flush_size (int): Submissions written per transaction at most
+            compact_seconds (float): Seconds between WAL checkpoints
+            max_retries (int): Retries of a failed batch, with exponential backoff
+        """
+        self.path = path
+        self.max_retries = max_retries
+        self.flush_wait = flush_ms / 1000
+        self.flush_size = max(flush_size, 1)
+        self.compact_seconds = compact_seconds
+        self.writer = self._connect()
+        self.writer.executescript("""
+            CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY,
+                prediction_id TEXT NOT NULL,
+                weather TEXT,
+                risk TEXT,
+                suggestion TEXT,
+                effective INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS feedback_prediction ON feedback (prediction_id, created_at);
+            CREATE INDEX IF NOT EXISTS feedback_weather ON feedback (weather, created_at);
+            CREATE INDEX IF NOT EXISTS feedback_time ON feedback (created_at);
+            CREATE TABLE IF NOT EXISTS imports (path TEXT PRIMARY KEY, imported_at REAL);
+        """)
+        self.reader = self._connect()
+        self.read_lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.pending = []
+        self.submitted = self.processed = 0  # Sequence numbers of the last queued and last written or failed submission
+        self.written = self.batches = 0
+        self.failures = []  # (first, last sequence number, error) of the batches given up on
+        self.reported = 0  # flush() has raised the failures up to this sequence number
+        self.flush_requested = False
+        self.closed = False
+        self.last_compaction = time.monotonic()
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")  # fsync on every commit, that is once per batch
+        return db
+
+    def add(self, prediction_id, effective, weather=None, risk=None, suggestion=None, created_at=None):
+        """
+        Queues one submission and returns its sequence number, see flush().
+
+        Args:
+            prediction_id (str): The prediction the feedback is about, e.g. "Frost -> Crop damage"
+            effective (bool): Whether the suggested fix worked
+            weather, risk, suggestion (str): The prediction's weather condition, risk and suggested fix
+            created_at (float): Unix time of the submission, now by default
+        """
+        row = (prediction_id, weather, risk, suggestion, int(bool(effective)),
+               time.time() if created_at is None else created_at)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Feedback store is closed")
+            self.pending.append(row)
+            self.submitted += 1
+            if len(self.pending) in (1, self.flush_size):
+                self.condition.notify_all()
+            return self.submitted
+
+    def flush(self, sequence=None, timeout=None):
+        """
+        Waits until the submission with this sequence number, all queued ones by default, is on disk.
+
+        Raises the error of its batch when that submission could not be written. Without a sequence
+        number, raises when any submission failed since the previous flush().
+        """
+        with self.condition:
+            target = self._wait(sequence, timeout)
+            if sequence is None:
+                failed = [failure for failure in self.failures if failure[1] > self.reported]
+                self.reported = max(self.reported, target)
+            else:
+                failed = [failure for failure in self.failures if failure[0] <= sequence <= failure[1]]
+            if failed:
+                raise failed[-1][2]
+
+    def _wait(self, sequence=None, timeout=None):
+        """Waits, holding the condition, until the submissions up to sequence are written or given up on."""
+        target = self.submitted if sequence is None else sequence
+        if self.processed < target:
+            self.flush_requested = True
+            self.condition.notify_all()
+        if not self.condition.wait_for(lambda: self.processed >= target, timeout):
+            raise TimeoutError("Feedback was not written in time")
+        return target
+
+    def _write_loop(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.closed)
+                if not self.pending and self.closed:
+                    return
+                # Let more submissions share the transaction, unless someone waits in flush()
+                deadline = time.monotonic() + self.flush_wait
+                while len(self.pending) < self.flush_size and not self.flush_requested and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.condition.wait(remaining):
+                        break
+                batch, self.pending = self.pending[:self.flush_size], self.pending[self.flush_size:]
+                self.flush_requested = bool(self.pending) and self.flush_requested
+            error = self._commit(batch)
+            with self.condition:
+                first = self.processed + 1
+                self.processed += len(batch)
+                if error is None:
+                    self.written += len(batch)
+                    self.batches += 1
+                else:
+                    self.failures.append((first, self.processed, error))
+                self.condition.notify_all()
+            if time.monotonic() - self.last_compaction >= self.compact_seconds:
+                self.compact()
+
+    def _commit(self, batch):
+        """Writes a batch in one transaction, retrying with backoff. Returns the last error if it never succeeds."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.writer.execute("BEGIN IMMEDIATE")
+                self.writer.executemany(f"INSERT INTO feedback ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", batch)
+                self.writer.execute("COMMIT")
+                return None
+            except sqlite3.Error as e:
+                if self.writer.in_transaction:
+                    self.writer.execute("ROLLBACK")
+                error = e
+            if attempt < self.max_retries:
+                time.sleep(min(0.1 * 2 ** attempt, 5))
+        print(f"❌ Error saving feedback: {error}")
+        return error
+
+    def compact(self):
+        """Copies the WAL into the database file and truncates it."""
+        self.last_compaction = time.monotonic()
+        with self.read_lock:
+            self.reader.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.reader.execute("PRAGMA optimize")
+
+    def query(self, prediction_id=None, weather=None, since=None, until=None, limit=None):
+        """
+        Submissions matching every given filter, oldest first.
+
+        Args:
+            prediction_id (str): Only feedback on this prediction
+            weather (str): Only feedback on predictions for this weather condition
+            since, until (float): Unix time range, since included, until excluded
+            limit (int): Most recent submissions only
+
+        Returns:
+            list: dicts with the COLUMNS, effective as a bool
+        """
+        where, parameters = self._filters(prediction_id, weather, since, until)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM feedback{where} ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        with self.condition:
+            self._wait()
+        with self.read_lock:
+            rows = self.reader.execute(sql, parameters).fetchall()
+        return [dict(zip(COLUMNS, row[:4] + (bool(row[4]), row[5]))) for row in reversed(rows)]
+
+    def effectiveness(self, prediction_id=None, weather=None, since=None, until=None):
+        """Returns (effective submissions, all submissions) matching the filters."""
+        where, parameters = self._filters(prediction_id, weather, since, until)
+        with self.condition:
+            self._wait()
+        with self.read_lock:
+            effective, total = self.reader.execute(
+                f"SELECT COALESCE(SUM(effective), 0), COUNT(*) FROM feedback{where}", parameters
+            ).fetchone()
+        return effective, total
+
+    def latest_by_prediction(self):
+        """The most recent verdict per prediction id, as the old agriculture_feedback.json kept it."""
+        with self.condition:
+            self._wait()
+        with self.read_lock:
+            rows = self.reader.execute(
+                "SELECT prediction_id, effective FROM feedback f WHERE id = "
+                "(SELECT id FROM feedback WHERE prediction_id = f.prediction_id ORDER BY created_at DESC, id DESC LIMIT 1)"
+            ).fetchall()
+        return {prediction_id: bool(effective) for prediction_id, effective in rows}
+
+    @staticmethod
+    def _filters(prediction_id, weather, since, until):
+        clauses, parameters = [], []
+        for clause, value in (("prediction_id = ?", prediction_id), ("weather = ?", weather),
+                              ("created_at >= ?", since), ("created_at < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                parameters.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), parameters
+
+    def import_legacy(self, path=LEGACY_PATH):
+        """Imports a {prediction_id: effective} JSON file once, dated by its modification time."""
+        if not os.path.exists(path):
+            return 0
+        key = os.path.abspath(path)
+        with self.read_lock:
+            if self.reader.execute("SELECT 1 FROM imports WHERE path = ?", (key,)).fetchone():
+                return 0
+        with open(path) as file:
+            legacy = json.load(file)
+        created_at = os.path.getmtime(path)
+        for prediction_id, effective in legacy.items():
+            weather, _, risk = prediction_id.partition(" -> ")
+            self.add(prediction_id, effective, weather, risk or None, created_at=created_at)
+        self.flush()
+        with self.read_lock:
+            self.reader.execute("INSERT OR IGNORE INTO imports VALUES (?, ?)", (key, time.time()))
+        return len(legacy)
+
+    def stats(self):
+        with self.condition:
+            return {"submitted": self.submitted, "written": self.written, "pending": len(self.pending),
+                    "batches": self.batches, "failed": sum(last - first + 1 for first, last, _ in self.failures)}
+
+    def close(self):
+        """Writes the queued submissions and closes the database."""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.compact()
+        self.writer.close()
+        self.reader.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the process-wide store, importing the legacy JSON file and closing the store at exit."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FeedbackStore()
+            _store.import_legacy()
+            atexit.register(_store.close)
+        return _store
@@ -0,0 +1,230 @@
+"""
+Shared cache for CE Hub ShortRangeForecastDaily responses.
+
+weather.py and stress_buster.py ask the same endpoint for different measure labels. With the
+cache enabled, every request asks for the union of their labels, so one fetch serves both
+modules, and the response is filtered to the labels each caller asked for.
+
+Entries are keyed by the coordinates snapped to the forecast model grid, and are fetched at
+the center of their cell, so every field in a cell gets the same forecast. They expire at the
+next scheduled model update, which the provider publishes every few hours. Recent entries
+are kept in memory, all of them in SQLite so they survive restarts. Concurrent requests
+for the same cell wait for a single fetch.
+
+Settings come from the environment:
+    FORECAST_CACHE               set to 0 to disable the cache
+    FORECAST_CACHE_GRID          grid cell size in degrees (default 0.1)
+    FORECAST_CACHE_UPDATE_HOURS  hours between model updates, UTC (default 6)
+    FORECAST_CACHE_MEMORY        entries kept in memory (default 1024)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import http_client
+from weather_cache import CACHE_DIR
+
+ENABLED = os.getenv("FORECAST_CACHE", "1") != "0"
+GRID_STEP = float(os.getenv("FORECAST_CACHE_GRID", 0.1))
+UPDATE_HOURS = float(os.getenv("FORECAST_CACHE_UPDATE_HOURS", 6))
+MEMORY_ENTRIES = int(os.getenv("FORECAST_CACHE_MEMORY", 1024))
+
+# Union of the labels requested by weather.py and stress_buster.py
+MEASURE_LABELS = [
+    "ThunderstormProbability_DailyMax (pct)",
+    "Cloudcover_DailyAvg (pct)",
+    "PrecipProbability_Daily (pct)",
+    "SnowFraction_Daily (pct)",
+    "TempAir_DailyMax (C)",
+    "TempAir_DailyMin (C)",
+    "TempAir_DailyAvg (C)",
+    "Precip_DailySum (mm)",
+    "Referenceevapotranspiration_DailySum (mm)",
+    "Soilmoisture_0to10cm_DailyAvg (vol%)",
+]
+
+
+class ForecastCache:
+    def __init__(self, path=None, grid_step=GRID_STEP, update_hours=UPDATE_HOURS, memory_entries=MEMORY_ENTRIES):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "forecast.sqlite")
+        self.grid_step = grid_step
+        self.update_seconds = update_hours * 3600
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.key_locks = {}  # key: [lock, threads using it], dropped when the last one is done
+        self.memory_hits = self.disk_hits = self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS forecasts (
+                cell TEXT, supplier TEXT, top INTEGER, labels TEXT, expires_at REAL, entries TEXT,
+                PRIMARY KEY (cell, supplier, top)
+            )
+        """)
+
+    def center(self, latitude, longitude):
+        """Snaps coordinates to the center of their grid cell."""
+        if self.grid_step <= 0:
+            return round(float(latitude), 5), round(float(longitude), 5)
+        step = self.grid_step
+        return round(round(float(latitude) / step) * step, 4), round(round(float(longitude) / step) * step, 4)
+
+    def cell(self, latitude, longitude):
+        """The grid cell used as cache key."""
+        latitude, longitude = self.center(latitude, longitude)
+        return f"{longitude:.5f},{latitude:.5f}"
+
+    def expires_at(self, fetched_at):
+        """The first model update after fetched_at."""
+        return (fetched_at // self.update_seconds + 1) * self.update_seconds
+
+    def _lookup(self, key, labels, now):
+        """Returns the cached entries for key if they are fresh and cover labels, counting the hit."""
+        with self.lock:
+            cached = self.memory.get(key)
+            if cached is not None and cached[1] > now and labels <= cached[0]:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return cached[2]
+            row = self.db.execute(
+                "SELECT labels, expires_at, entries FROM forecasts WHERE cell = ? AND supplier = ? AND top = ?", key
+            ).fetchone()
+            if row is None or row[1] <= now or not labels <= set(json.loads(row[0])):
+                return None
+            cached = (frozenset(json.loads(row[0])), row[1], json.loads(row[2]))
+            self._remember(key, cached)
+            self.disk_hits += 1
+            return cached[2]
+
+    def _remember(self, key, cached):
+        self.memory[key] = cached
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, latitude, longitude, labels, fetch, supplier="Meteoblue", top=30):
+        """
+        Returns the forecast entries for labels, calling fetch() on a miss.
+
+        Args:
+            latitude, longitude: Coordinates of the request
+            labels (iterable): Measure labels the caller needs
+            fetch (callable): Fetches the entries for (latitude, longitude) of the cell center, returns a
+                list or an error string that is not cached
+            supplier (str): Forecast supplier
+            top (int): Number of days
+
+        Returns:
+            list: Entries whose measureLabel is in labels, or the error string from fetch()
+        """
+        labels = frozenset(labels)
+        center = self.center(latitude, longitude)
+        key = (self.cell(*center), supplier, top)
+        entries = self._lookup(key, labels, time.time())
+        if entries is None:
+            entries = self._fetch_once(key, labels, lambda: fetch(*center))
+            if not isinstance(entries, list):
+                return entries
+        return [entry for entry in entries if entry["measureLabel"].strip() in labels]
+
+    def _fetch_once(self, key, labels, fetch):
+        """Fetches and stores the entries for key, unless a thread holding its lock already did."""
+        with self.lock:
+            holder = self.key_locks.setdefault(key, [threading.Lock(), 0])
+            holder[1] += 1
+        try:
+            with holder[0]:
+                # Another thread may have fetched this cell while we waited
+                entries = self._lookup(key, labels, time.time())
+                if entries is None:
+                    with self.lock:
+                        self.misses += 1
+                    entries = fetch()
+                    if isinstance(entries, list):
+                        self.store(key, entries)
+                return entries
+        finally:
+            with self.lock:
+                holder[1] -= 1
+                if not holder[1]:
+                    del self.key_locks[key]
+
+    def store(self, key, entries):
+        fetched_labels = frozenset(entry["measureLabel"].strip() for entry in entries)
+        expires_at = self.expires_at(time.time())
+        with self.lock, self.db:
+            self._remember(key, (fetched_labels, expires_at, entries))
+            self.db.execute(
+                "INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?, ?)",
+                key + (json.dumps(sorted(fetched_labels)), expires_at, json.dumps(entries)),
+            )
+            self.db.execute("DELETE FROM forecasts WHERE expires_at <= ?", (time.time(),))
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        requested = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / requested if requested else 0.0,
+            "saved_calls": hits,
+        }
+
+    def close(self):
+        self.db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide cache, or None when FORECAST_CACHE=0."""
+    global _cache
+    if not ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ForecastCache()
+        return _cache
+
+
+def fetch_forecast(url, latitude, longitude, labels, api_key, supplier="Meteoblue", top=30):
+    """
+    Fetches daily forecast entries for labels, through the shared cache when it is enabled.
+
+    Returns:
+        list: CE Hub entries for the requested labels, or an error string
+    """
+    cache = get_cache()
+    requested = MEASURE_LABELS + [label for label in labels if label not in MEASURE_LABELS] if cache else labels
+
+    def fetch(latitude=latitude, longitude=longitude):
+        params = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "supplier": supplier,
+            "measureLabel": "; ".join(requested),
+            "top": top,
+            "format": "json"
+        }
+        headers = {
+            "accept": "*/*",
+            "ApiKey": api_key
+        }
+        response = http_client.get(url, headers=headers, params=params)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            return f"Error: {response.status_code}, {response.text}"
+
+    if cache is None:
+        return fetch()
+    return cache.get(latitude, longitude, labels, fetch, supplier, top)
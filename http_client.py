@@ -0,0 +1,168 @@
+"""
+Shared, pooled HTTP client for the meteoblue and CE Hub APIs.
+
+All fetch functions go through get()/post() here instead of bare requests calls, so
+connections are kept alive and reused per host, responses are gzip-compressed, every
+call has a timeout, and 429/5xx answers are retried with jittered exponential backoff.
+A per-host semaphore caps the number of concurrent requests to each provider.
+
+Settings come from the environment:
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT   seconds (default 5 and 60)
+    HTTP_MAX_RETRIES                          retries on 429/5xx and connection errors (default 3)
+    HTTP_MAX_PER_HOST                         concurrent requests per host (default 8)
+    HTTP_REPLAY, HTTP_FIXTURES, HTTP_REPLAY_LATENCY   record/replay mode, see http_replay.py
+"""
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import http_replay
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 60))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", 8))
+
+_session = None
+_session_lock = threading.Lock()
+_replay = {"mode": http_replay.MODE, "path": http_replay.FIXTURES, "latency": http_replay.LATENCY}
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_latencies = defaultdict(lambda: deque(maxlen=10000))
+_request_counts = defaultdict(int)
+_connections_opened = defaultdict(int)
+
+
+def _count_connection(host, port):
+    with _metrics_lock:
+        _connections_opened[f"{host}:{port}" if port not in (80, 443) else host] += 1
+
+
+class CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        super().connect()
+        _count_connection(self.host, self.port)
+
+
+class CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        super().connect()
+        _count_connection(self.host, self.port)
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CountingHTTPConnection
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+
+
+def get_session():
+    """Returns the process-wide session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=MAX_RETRIES,
+                backoff_factor=0.5,
+                backoff_jitter=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=None,  # The dataset API is queried with POST, retry it too
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter_kwargs = {"pool_connections": 4, "pool_maxsize": MAX_PER_HOST, "max_retries": retry}
+            adapter = (http_replay.make_adapter(_replay["mode"], _replay["path"], _replay["latency"], **adapter_kwargs)
+                       or HTTPAdapter(**adapter_kwargs))
+            if isinstance(adapter, HTTPAdapter):
+                # Pools whose connections count themselves as they open, replayed responses open none
+                adapter.poolmanager.pool_classes_by_scheme = {
+                    "http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate"})
+            _session = session
+        return _session
+
+
+def use_replay(mode, path=http_replay.FIXTURES, latency=0.0):
+    """
+    Switches the session to record or replay fixtures, or back to live requests.
+
+    Args:
+        mode (str): "record", "replay", or "" for live requests
+        path (str): Fixture file
+        latency (float): Seconds added to every replayed response
+    """
+    global _session
+    if mode not in ("", "record", "replay"):
+        raise ValueError(f"Unknown replay mode: {mode}, use 'record' or 'replay'")
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        _replay.update(mode=mode, path=path, latency=latency)
+
+
+def _host_limit(host):
+    with _host_limits_lock:
+        limit = _host_limits.get(host)
+        if limit is None:
+            limit = _host_limits[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+        return limit
+
+
+def request(method, url, timeout=None, **kwargs):
+    """Sends a request through the shared session, honouring the per-host concurrency limit."""
+    host = urlsplit(url).netloc
+    with _host_limit(host):
+        start = time.perf_counter()
+        response = get_session().request(method, url, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT), **kwargs)
+        elapsed = time.perf_counter() - start
+    with _metrics_lock:
+        _latencies[host].append(elapsed)
+        _request_counts[host] += 1
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def stats():
+    """Per-host request counts, latency percentiles and connection reuse."""
+    with _metrics_lock:
+        result = {}
+        for host, count in _request_counts.items():
+            latencies = sorted(_latencies[host])
+            connections = _connections_opened.get(host, 0)
+            result[host] = {
+                "requests": count,
+                "connections_opened": connections,
+                "connection_reuse": 1 - connections / count if count else 0.0,
+                "latency_p50_ms": latencies[len(latencies) // 2] * 1000,
+                "latency_p99_ms": latencies[min(int(0.99 * len(latencies)), len(latencies) - 1)] * 1000,
+            }
+        return result
+
+
+def reset_stats():
+    with _metrics_lock:
+        _latencies.clear()
+        _request_counts.clear()
+        _connections_opened.clear()
@@ -0,0 +1,159 @@
+"""
+Record/replay transport for the shared HTTP session.
+
+In record mode every response from the meteoblue and CE Hub APIs is captured in a fixture
+file next to its request. In replay mode the fixture file answers instead of the network,
+after an optional artificial latency, so the risk flows can be benchmarked and compared
+offline and deterministically.
+
+Requests are matched on method, path, sorted query parameters and canonical JSON body.
+The host and API key parameters are ignored, so fixtures recorded against a local
+stand-in also answer the real URLs. Headers and keys are never written to the fixtures.
+A request without a recorded response gets a 404, which the fetch functions report
+like any other API error.
+
+Settings come from the environment:
+    HTTP_REPLAY           "record" or "replay", unset for live requests
+    HTTP_FIXTURES         fixture file (default fixtures/api.json.gz)
+    HTTP_REPLAY_LATENCY   seconds added to every replayed response (default 0)
+"""
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+MODE = os.getenv("HTTP_REPLAY", "")
+FIXTURES = os.getenv("HTTP_FIXTURES", os.path.join("fixtures", "api.json.gz"))
+LATENCY = float(os.getenv("HTTP_REPLAY_LATENCY", 0))
+
+# Query parameters carrying credentials, left out of the match and the fixtures
+SECRET_PARAMS = {"apikey", "api_key", "key"}
+
+
+def request_key(method, url, body):
+    """Identifies a request by method, path, sorted query and canonical JSON body."""
+    parts = urlsplit(url)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name.lower() not in SECRET_PARAMS)
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")) if body else ""
+    except ValueError:
+        pass
+    text = json.dumps([method.upper(), parts.path, query, body])
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+class FixtureStore:
+    """Recorded responses keyed by request_key, stored as one gzipped JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.responses = {}
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                self.responses = json.load(file)
+
+    def lookup(self, key):
+        return self.responses.get(key)
+
+    def add(self, key, method, url, response):
+        with self.lock:
+            self.responses[key] = {
+                "request": f"{method} {urlsplit(url).path}",
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", ""),
+                "body": response.content.decode("utf-8", "replace"),
+            }
+            self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with gzip.open(self.path, "wt", encoding="utf-8") as file:
+                json.dump(self.responses, file, separators=(",", ":"))
+            self.dirty = False
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that also writes every final response to the fixture store."""
+
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        self.store.add(request_key(request.method, request.url, request.body), request.method, request.url, response)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests from the fixture store instead of the network."""
+
+    def __init__(self, store, latency=0.0):
+        super().__init__()
+        self.store = store
+        self.latency = latency
+        self.hits = self.misses = 0
+
+    def send(self, request, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        recorded = self.store.lookup(request_key(request.method, request.url, request.body))
+        response = Response()
+        response.request = request
+        response.url = request.url
+        response.encoding = "utf-8"
+        response._content_consumed = True  # iter_content() then slices the recorded body
+        if recorded is None:
+            self.misses += 1
+            response.status_code = 404
+            response.reason = "Not Recorded"
+            response.headers = CaseInsensitiveDict({"Content-Type": "text/plain"})
+            response._content = f"No recorded response for {request.method} {urlsplit(request.url).path}".encode()
+        else:
+            self.hits += 1
+            response.status_code = recorded["status"]
+            response.reason = "OK" if recorded["status"] == 200 else ""
+            response.headers = CaseInsensitiveDict({"Content-Type": recorded["content_type"]})
+            response._content = recorded["body"].encode("utf-8")
+        return response
+
+    def close(self):
+        pass
+
+
+_stores = {}
+
+
+def get_store(path):
+    """One store per fixture file, saved when the process exits."""
+    if path not in _stores:
+        _stores[path] = FixtureStore(path)
+        atexit.register(_stores[path].save)
+    return _stores[path]
+
+
+def make_adapter(mode, path, latency, **http_adapter_kwargs):
+    """Returns the adapter for a mode, or None for live requests."""
+    if mode == "record":
+        return RecordingAdapter(get_store(path), **http_adapter_kwargs)
+    if mode == "replay":
+        return ReplayAdapter(get_store(path), latency)
+    if mode:
+        raise ValueError(f"Unknown HTTP_REPLAY mode: {mode}, use 'record' or 'replay'")
+    return None
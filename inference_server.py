@@ -0,0 +1,171 @@
+"""
+Long-lived local inference daemon that keeps the disease classifier warm.
+
+Start it once:
+    python inference_server.py --port 8501
+
+then point predict_image at it with server_url="http://127.0.0.1:8501" (or set INFERENCE_URL).
+POST /predict takes raw image bytes, GET /stats returns latency and batch-size counters.
+"""
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # 3 = Suppress all INFO and WARNING messages
+
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from disease_detection import IMAGE_SIZE, LABELS, load_model, load_padded_image, normalize
+
+
+class _PendingRequest:
+    def __init__(self, img_array):
+        self.img_array = img_array
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.probs = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Collects concurrent requests into batches of up to max_batch or max_wait_ms, whichever comes first."""
+
+    def __init__(self, model, max_batch=32, max_wait_ms=10):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=10000)
+        self.lock = threading.Lock()
+        self.batch = np.empty((max_batch, IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def predict(self, img_array):
+        pending = _PendingRequest(img_array)
+        self.requests.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.probs
+
+    def _collect(self):
+        pending = [self.requests.get()]
+        deadline = pending[0].enqueued + self.max_wait
+        while len(pending) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                pending.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            try:
+                for i, req in enumerate(pending):
+                    normalize(req.img_array, out=self.batch[i])
+                predictions = np.asarray(self.model.predict(self.batch[:len(pending)], verbose=0))
+                for req, probs in zip(pending, predictions):
+                    req.probs = probs
+            except Exception as e:
+                for req in pending:
+                    req.error = e
+
+            now = time.perf_counter()
+            with self.lock:
+                self.batch_sizes[len(pending)] += 1
+                for req in pending:
+                    self.latencies.append(now - req.enqueued)
+            for req in pending:
+                req.done.set()
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            batch_sizes = dict(self.batch_sizes)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000
+
+        return {
+            "requests": sum(size * count for size, count in batch_sizes.items()),
+            "batches": sum(batch_sizes.values()),
+            "batch_sizes": batch_sizes,
+            "latency_p50_ms": percentile(0.50),
+            "latency_p99_ms": percentile(0.99),
+        }
+
+
+def make_handler(batcher):
+    class InferenceHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, batcher.stats())
+            else:
+                self._send_json(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404, {"error": "Not found"})
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                # Decoding happens on the handler thread so it overlaps with model calls
+                img_array = load_padded_image(io.BytesIO(body))
+                probs = batcher.predict(img_array)
+            except Exception as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(200, {
+                "label": LABELS[int(np.argmax(probs))],
+                "probabilities": [float(p) for p in probs],
+            })
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet, /stats has the numbers
+
+    return InferenceHandler
+
+
+def serve(model_path, host="127.0.0.1", port=8501, max_batch=32, max_wait_ms=10):
+    model = load_model(model_path)
+    batcher = MicroBatcher(model, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher))
+    print(f"Inference server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="model/best_model.keras")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8501)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    args = parser.parse_args()
+    serve(args.model, args.host, args.port, args.max_batch, args.max_wait_ms)
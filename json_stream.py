@@ -0,0 +1,235 @@
+"""
+Incremental JSON parser for large dataset API responses.
+
+The response body is fed chunk by chunk as it arrives, so the raw text is never held
+whole. Arrays of numbers and nulls, the bulk of a dataset response, are read as float64
+NumPy arrays (null becomes NaN) straight from the text, without a Python float per value.
+Everything else becomes the usual dicts, lists and scalars. Containers under `skip_keys`
+are stepped over without being parsed.
+"""
+import codecs
+import json
+import json.decoder
+import json.scanner
+import re
+
+import numpy as np
+
+_scan_once = json.scanner.make_scanner(json.JSONDecoder())
+_WHITESPACE = " \t\n\r"
+_NUMBER_START = "-0123456789n"
+_DELIMITERS = ",]} \t\n\r"
+_NOT_NUMERIC = re.compile(r"[^-+0-9.eE,nul \t\n\r]")
+_SKIP_RUN = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*')
+
+# What the parser expects next
+VALUE, VALUE_OR_CLOSE, KEY, KEY_OR_CLOSE, COLON, COMMA_OR_CLOSE, END = range(7)
+
+
+def parse_numbers(text):
+    """Parses "1.5, null, -2" into a float64 array."""
+    return np.array(text.replace("null", "nan").split(","), dtype=np.float64)
+
+
+class Frame:
+    __slots__ = ("container", "key", "numbers")
+
+    def __init__(self, container, numbers=False):
+        self.container = container
+        self.key = None
+        self.numbers = numbers
+
+
+class StreamingJSONParser:
+    def __init__(self, skip_keys=()):
+        self.skip_keys = frozenset(skip_keys)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.stack = []
+        self.state = VALUE
+        self.skip_depth = 0  # Nesting depth inside a skipped container
+        self.result = None
+
+    def feed(self, data):
+        """Parses as much of the document as the data received so far allows."""
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(data)
+        self.pos = 0
+        self._parse(final=False)
+
+    def close(self):
+        """Finishes the document and returns its value."""
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(b"", final=True)
+        self.pos = 0
+        self._parse(final=True)
+        if self.state != END:
+            raise ValueError("Incomplete JSON document")
+        return self.result
+
+    def _skipped(self):
+        """Whether the value about to be parsed belongs to a skipped key."""
+        return bool(self.stack) and isinstance(self.stack[-1].container, dict) and self.stack[-1].key in self.skip_keys
+
+    def _push(self, container, numbers=False):
+        self.stack.append(Frame(container, numbers))
+
+    def _add(self, value):
+        if not self.stack:
+            self.result = value
+            self.state = END
+            return
+        frame = self.stack[-1]
+        self.state = COMMA_OR_CLOSE
+        if isinstance(frame.container, list):
+            frame.container.append(value)
+        elif frame.key not in self.skip_keys:
+            frame.container[frame.key] = value
+
+    def _close(self):
+        frame = self.stack.pop()
+        if frame.numbers:
+            pieces = frame.container
+            value = pieces[0] if len(pieces) == 1 else np.concatenate(pieces) if pieces else np.empty(0)
+        else:
+            value = frame.container
+        self._add(value)
+
+    def _parse(self, final):
+        buffer, pos, size = self.buffer, self.pos, len(self.buffer)
+        while True:
+            if self.skip_depth:
+                # Jump over a skipped container, a run of strings and non-brackets at a time
+                pos = _SKIP_RUN.match(buffer, pos).end()
+                if pos >= size:
+                    break
+                char = buffer[pos]
+                if char == '"':
+                    if final:
+                        raise ValueError(f"Unterminated string at {pos}")
+                    break  # The string continues in the next chunk
+                pos += 1
+                self.skip_depth += 1 if char in "[{" else -1
+                if not self.skip_depth:
+                    self._add(None)
+                continue
+
+            if self.stack and self.stack[-1].numbers:
+                frame = self.stack[-1]
+                end = buffer.find("]", pos)
+                if _NOT_NUMERIC.search(buffer, pos, size if end == -1 else end):
+                    # Mixed array after all, parse the rest of it value by value
+                    frame.numbers = False
+                    frame.container = [None if np.isnan(x) else x for piece in frame.container for x in piece.tolist()]
+                    self.state = VALUE
+                    continue
+                if end == -1:
+                    # Parse the complete numbers received so far, keep the partial last one
+                    cut = buffer.rfind(",", pos)
+                    if cut != -1:
+                        frame.container.append(parse_numbers(buffer[pos:cut]))
+                        pos = cut + 1
+                    if final:
+                        raise ValueError("Unterminated array")
+                    break
+                if buffer[pos:end].strip():
+                    frame.container.append(parse_numbers(buffer[pos:end]))
+                pos = end + 1
+                self._close()
+                continue
+
+            while pos < size and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= size:
+                break
+            char = buffer[pos]
+            state = self.state
+
+            if state in (VALUE, VALUE_OR_CLOSE):
+                if char == "]" and state == VALUE_OR_CLOSE:
+                    pos += 1
+                    self._close()
+                elif char in "[{" and self._skipped():
+                    pos += 1
+                    self.skip_depth = 1
+                elif char == "{":
+                    pos += 1
+                    self._push({})
+                    self.state = KEY_OR_CLOSE
+                elif char == "[":
+                    ahead = pos + 1
+                    while ahead < size and buffer[ahead] in _WHITESPACE:
+                        ahead += 1
+                    if ahead >= size:
+                        if final:
+                            raise ValueError("Unterminated array")
+                        break  # Wait to see what the array holds
+                    if buffer[ahead] in _NUMBER_START or buffer[ahead] == "]":
+                        # An empty array is read as numbers too, so it comes back as an empty float64 array
+                        self._push([], numbers=True)
+                        pos = ahead
+                    else:
+                        self._push([])
+                        self.state = VALUE_OR_CLOSE
+                        pos += 1
+                else:
+                    try:
+                        value, end = _scan_once(buffer, pos)
+                    except (StopIteration, json.JSONDecodeError):
+                        if final:
+                            raise ValueError(f"Invalid JSON value at {pos}")
+                        break
+                    if not final and (end >= size or buffer[end] not in _DELIMITERS):
+                        break  # A number may continue in the next chunk
+                    pos = end
+                    self._add(value)
+            elif state in (KEY, KEY_OR_CLOSE):
+                if char == "}" and state == KEY_OR_CLOSE:
+                    pos += 1
+                    self._close()
+                elif char == '"':
+                    try:
+                        key, end = json.decoder.scanstring(buffer, pos + 1)
+                    except json.JSONDecodeError:
+                        if final:
+                            raise ValueError(f"Unterminated key at {pos}")
+                        break
+                    self.stack[-1].key = key
+                    pos = end
+                    self.state = COLON
+                else:
+                    raise ValueError(f"Expected a key at {pos}")
+            elif state == COLON:
+                if char != ":":
+                    raise ValueError(f"Expected ':' at {pos}")
+                pos += 1
+                self.state = VALUE
+            elif state == COMMA_OR_CLOSE:
+                in_object = isinstance(self.stack[-1].container, dict)
+                if char == ",":
+                    pos += 1
+                    self.state = KEY if in_object else VALUE
+                elif char == ("}" if in_object else "]"):
+                    pos += 1
+                    self._close()
+                else:
+                    raise ValueError(f"Expected ',' or a closing bracket at {pos}")
+            else:
+                raise ValueError(f"Unexpected data after the document at {pos}")
+        self.pos = pos
+
+
+def parse_stream(chunks, skip_keys=()):
+    """
+    Parses a JSON document from an iterable of byte chunks, e.g. response.iter_content().
+
+    Args:
+        chunks (iterable): Bytes chunks of the document
+        skip_keys (iterable): Object keys whose values are not kept
+
+    Returns:
+        The document, with numeric arrays as float64 NumPy arrays
+    """
+    parser = StreamingJSONParser(skip_keys)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
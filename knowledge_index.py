@@ -0,0 +1,299 @@
+"""
+Semantic retrieval over agronomy texts for the chat assistant.
+
+The index covers the recommendation texts of the risk modules (NUE, PUE, stress indices
+and yield risk) and the .txt / .md documents in RAG_DOCS_DIR. Documents are split into
+paragraph snippets, and every snippet is embedded once into a float32 matrix stored as a
+.npy file and memory-mapped, so the index opens instantly and is shared by the page cache.
+A search is one matrix-vector product and a partial sort for the top k.
+
+Re-indexing is incremental: snippets are identified by the hash of their text, and only
+new or changed ones are embedded. The rows of unchanged snippets are copied over.
+
+Snippets are embedded with a small sentence-transformers model, all-MiniLM-L6-v2 by default,
+run through transformers and torch. When the model cannot be loaded, e.g. without torch or
+offline before its first download, the index falls back to hashing words, word pairs and
+character 4-grams into a fixed number of dimensions, which needs no model at all.
+
+Settings come from the environment:
+    RAG_DOCS_DIR    directory of additional documents (default knowledge)
+    RAG_EMBEDDER    a sentence-transformers model name (default sentence-transformers/all-MiniLM-L6-v2) or "hashing"
+    RAG_TOP_K       snippets added to a prompt (default 3, 0 disables retrieval)
+    RAG_MIN_SCORE   cosine similarity below which snippets are left out (default 0.15)
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+from weather_cache import CACHE_DIR
+
+DOCS_DIR = os.getenv("RAG_DOCS_DIR", "knowledge")
+EMBEDDER = os.getenv("RAG_EMBEDDER", "sentence-transformers/all-MiniLM-L6-v2")
+TOP_K = int(os.getenv("RAG_TOP_K", 3))
+MIN_SCORE = float(os.getenv("RAG_MIN_SCORE", 0.15))
+SNIPPET_CHARS = 600
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by can do for from how i in is it my of on or should the this to we what when "
+    "which with you your".split()
+)
+
+
+@contextlib.contextmanager
+def replacing(path, mode="wb", **kwargs):
+    """
+    Opens a uniquely named temporary file next to path, and moves it over path once written.
+
+    Processes sharing the cache directory never write to the same temporary file, and a
+    failed write leaves path as it was.
+    """
+    file = tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path), prefix=os.path.basename(path) + ".",
+                                       suffix=".tmp", delete=False, **kwargs)
+    try:
+        with file:
+            yield file
+        os.replace(file.name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(file.name)
+        raise
+
+
+def builtin_documents():
+    """Recommendation texts of the risk modules, by source name."""
+    from data_visualization.nitrogen_risk import NitrogenStressRisk
+    from data_visualization.phosphorus_risk import PhosphorusStress
+    from data_visualization.stress_buster import get_stress_recommendations
+    from data_visualization.yield_risk import YIELD_RISK_THRESHOLDS, recommend_biostimulant
+
+    documents = {}
+    # Corn at its optimal rainfall and soil moisture, so NUE is yield / nitrogen
+    for tier, crop_yield in (("high", 50), ("moderate", 30), ("low", 10)):
+        result = NitrogenStressRisk.compute_nue("Corn", crop_yield, 1, 650, 60)
+        documents[f"nitrogen_risk/{tier}"] = f"Nitrogen use efficiency (NUE), {tier}:\n{result['Recommendation']}"
+    # Corn at its optimal conditions, so PUE is 0.75 * yield / phosphorus
+    for tier, crop_yield in (("low", 4), ("moderate", 10), ("good", 16), ("excellent", 30)):
+        text = PhosphorusStress("Corn", crop_yield, 100, 650, 60, 6.5).recommend_biosimulants()
+        documents[f"phosphorus_risk/{tier}"] = f"Phosphorus use efficiency (PUE), {tier}:\n{text}"
+    for i, text in enumerate(get_stress_recommendations(7, 7, 7, "High risk")):
+        documents[f"stress_buster/{i}"] = text
+    for level, risk in zip(("low", "moderate", "high", "critical"), (0,) + YIELD_RISK_THRESHOLDS):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            recommend_biostimulant(risk)
+        documents[f"yield_risk/{level}"] = f"Yield risk, {level}:\n{output.getvalue().strip()}"
+    return documents
+
+
+def load_documents(docs_dir=DOCS_DIR):
+    """The .txt and .md files under docs_dir, by relative path."""
+    documents = {}
+    if not os.path.isdir(docs_dir):
+        return documents
+    for root, _, files in os.walk(docs_dir):
+        for name in sorted(files):
+            if name.endswith((".txt", ".md")):
+                path = os.path.join(root, name)
+                with open(path, encoding="utf-8", errors="replace") as file:
+                    documents[os.path.relpath(path, docs_dir)] = file.read()
+    return documents
+
+
+def split_snippets(text, max_chars=SNIPPET_CHARS):
+    """Splits a document at blank lines, merging short paragraphs up to max_chars."""
+    snippets, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 1 > max_chars:
+            snippets.append(current)
+            current = ""
+        current = f"{current} {paragraph}" if current else paragraph
+        while len(current) > max_chars:
+            cut = current.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            snippets.append(current[:cut])
+            current = current[cut:].strip()
+    if current:
+        snippets.append(current)
+    return snippets
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words, word pairs and character 4-grams, L2-normalized."""
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def features(self, text):
+        words = [word for word in _WORD.findall(text.lower()) if word not in _STOP_WORDS]
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + 4] for i in range(max(len(padded) - 3, 1)))
+        return features
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.array([zlib.crc32(feature.encode()) for feature in self.features(text)], dtype=np.uint32)
+            if hashes.size == 0:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))  # Dampen repeated features
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+
+class TransformerEmbedder:
+    """Mean-pooled sentence-transformers model run with transformers, L2-normalized."""
+
+    def __init__(self, model_name, batch_size=32):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.torch = torch
+        self.name = model_name
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.dim = self.model.config.hidden_size
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = self.tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True,
+                                   max_length=256, return_tensors="pt")
+            with self.torch.no_grad():
+                hidden = self.model(**batch).last_hidden_state
+            mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            vectors[start:start + len(pooled)] = self.torch.nn.functional.normalize(pooled, dim=1).numpy()
+        return vectors
+
+
+def make_embedder(name=EMBEDDER):
+    """The named sentence-transformers model, or the HashingEmbedder for "hashing" or when the model cannot be loaded."""
+    if name == "hashing":
+        return HashingEmbedder()
+    try:
+        return TransformerEmbedder(name)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"⚠️ Embedding model {name} unavailable, falling back to word hashing: {e}")
+        return HashingEmbedder()
+
+
+class KnowledgeIndex:
+    def __init__(self, directory=None, embedder=None):
+        """
+        Args:
+            directory (str): Where the embedding matrix and snippet list are stored
+            embedder: HashingEmbedder or TransformerEmbedder, make_embedder() by default
+        """
+        self.directory = directory or os.path.join(CACHE_DIR, "knowledge")
+        self.embedder = embedder or make_embedder()
+        self.matrix_path = os.path.join(self.directory, "embeddings.npy")
+        self.snippets_path = os.path.join(self.directory, "snippets.json")
+        self.lock = threading.Lock()
+        self.snippets = []  # [{"id", "source", "text"}], one per matrix row
+        self.matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        if os.path.exists(self.snippets_path) and os.path.exists(self.matrix_path):
+            with open(self.snippets_path, encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved["embedder"] == self.embedder.name:
+                self.snippets = saved["snippets"]
+                self.matrix = np.load(self.matrix_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.snippets)
+
+    def update(self, documents):
+        """
+        Re-indexes documents, embedding only the snippets that are not indexed yet.
+
+        Args:
+            documents (dict): Source name -> text, the full set to index
+
+        Returns:
+            dict: Number of snippets embedded, reused and removed
+        """
+        wanted = []
+        for source, text in documents.items():
+            for snippet in split_snippets(text):
+                snippet_id = hashlib.sha256(f"{source}\0{snippet}".encode()).hexdigest()[:24]
+                wanted.append({"id": snippet_id, "source": source, "text": snippet})
+
+        with self.lock:
+            rows = {snippet["id"]: row for row, snippet in enumerate(self.snippets)}
+            reused = [rows[snippet["id"]] for snippet in wanted if snippet["id"] in rows]
+            new = [snippet for snippet in wanted if snippet["id"] not in rows]
+            removed = len(self.snippets) - len(reused)
+            if not new and not removed:
+                return {"embedded": 0, "reused": len(reused), "removed": 0}
+
+            os.makedirs(self.directory, exist_ok=True)
+            snippets = [self.snippets[row] for row in reused] + new
+            with replacing(self.matrix_path) as file:
+                matrix = np.lib.format.open_memmap(file.name, mode="w+", dtype=np.float32,
+                                                   shape=(len(snippets), self.embedder.dim))
+                if reused:
+                    matrix[:len(reused)] = self.matrix[reused]
+                if new:
+                    matrix[len(reused):] = self.embedder.embed([snippet["text"] for snippet in new])
+                matrix.flush()
+                del matrix
+            with replacing(self.snippets_path, "w", encoding="utf-8") as file:
+                json.dump({"embedder": self.embedder.name, "snippets": snippets}, file)
+            self.snippets = snippets
+            self.matrix = np.load(self.matrix_path, mmap_mode="r")
+            return {"embedded": len(new), "reused": len(reused), "removed": removed}
+
+    def search(self, query, k=TOP_K, min_score=MIN_SCORE):
+        """
+        Finds the snippets closest to a query.
+
+        Returns:
+            list: (score, source, text) tuples, best first, at most k with score >= min_score
+        """
+        snippets, matrix = self.snippets, self.matrix
+        if not snippets or k <= 0:
+            return []
+        scores = matrix @ self.embedder.embed([query])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), snippets[i]["source"], snippets[i]["text"]) for i in top if scores[i] >= min_score]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Returns the process-wide index, brought up to date with the documents on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = KnowledgeIndex()
+            _index.update({**builtin_documents(), **load_documents()})
+        return _index
+
+
+def retrieve(question, k=None):
+    """Texts of the snippets most relevant to a question, best first, RAG_TOP_K of them by default."""
+    k = TOP_K if k is None else k
+    if k <= 0:
+        return []
+    return [text for _, _, text in get_index().search(question, k)]
@@ -1,34 +1,397 @@
+"""
+Agricultural question answering with an instruct LLM.
+
+Two backends answer behind the same stream(prompt, max_new_tokens) call: the hosted model
+through a Hugging Face InferenceClient, or a small quantized model run locally on CPU with
+gpt4all, for field offices with poor connectivity. Either is created once per process and
+kept warm. Answers are streamed token by token, so the first words are shown while the
+rest is still being generated.
+
+The local model serves one generation at a time from a FIFO queue of bounded size. Every
+question gets a fresh chat session, so the context never grows beyond one prompt and its
+answer, and the knowledge snippets are trimmed so that the prompt fits the context window.
+
+Prompts carry the snippets of the knowledge index most relevant to the question, see
+knowledge_index.py for its settings.
+
+Generations go through llm_scheduler: a bounded pool of workers and a token bucket keep
+within the provider's limits, interactive questions go ahead of batch ones, and batch
+questions share one request when LLM_BATCH allows it.
+
+Answers are cached by normalized question (case, whitespace and trailing punctuation
+ignored) in an in-memory LRU with a TTL. When the same question is asked again while its
+answer is being generated, the second caller follows the running generation instead of
+starting another one.
+
+Settings come from the environment:
+    LLM_BACKEND          "hosted" (default) or "local"
+    ACCESS_TOKEN         Hugging Face access token
+    LLM_URL              inference endpoint URL, the hosted model by default
+    LLM_LOCAL_MODEL      gpt4all model file (default Phi-3-mini-4k-instruct.Q4_0.gguf)
+    LLM_LOCAL_MODEL_DIR  directory of the model file, gpt4all's default when unset
+    LLM_ALLOW_DOWNLOAD   set to 1 to download the local model on first use
+    LLM_CONTEXT          context window of the local model in tokens (default 2048)
+    LLM_THREADS          CPU threads of the local model, all cores when unset
+    LLM_QUEUE_SIZE       questions waiting for the local model before new ones are refused (default 16)
+    LLM_CONCURRENCY      generations running at once (default 4)
+    LLM_RATE             requests per second sent to the backend (default 0, no limit)
+    LLM_BURST            requests sent at once after an idle period (default 4)
+    LLM_BATCH            batch questions per hosted request (default 1, the inference API takes
+                         several prompts per request, dedicated endpoints usually do not)
+    LLM_BATCH_WAIT_MS    how long a batch question waits for others to share its request (default 50)
+    LLM_CACHE_TTL        seconds an answer stays cached (default 86400, 0 disables the cache)
+    LLM_CACHE_SIZE       answers kept in the cache (default 256)
+"""
 import warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
 from huggingface_hub import InferenceClient
 import json
 import os
+import queue
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 
+import knowledge_index
+import llm_scheduler
+from llm_scheduler import BATCH, INTERACTIVE
+
 load_dotenv()
 
 # Replace this with your Hugging Face access token
 access_token = os.getenv("ACCESS_TOKEN")
 repo_id = "mistralai/Mistral-7B-Instruct-v0.3" # Updated model ID
 
+BACKEND = os.getenv("LLM_BACKEND", "hosted")
+LLM_URL = os.getenv("LLM_URL")
+LOCAL_MODEL = os.getenv("LLM_LOCAL_MODEL", "Phi-3-mini-4k-instruct.Q4_0.gguf")
+LOCAL_MODEL_DIR = os.getenv("LLM_LOCAL_MODEL_DIR")
+ALLOW_DOWNLOAD = os.getenv("LLM_ALLOW_DOWNLOAD", "0") == "1"
+CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT", 2048))
+LOCAL_THREADS = int(os.getenv("LLM_THREADS", 0)) or None
+QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", 16))
+CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 4))
+RATE = float(os.getenv("LLM_RATE", 0))
+BURST = int(os.getenv("LLM_BURST", 4))
+MAX_BATCH = int(os.getenv("LLM_BATCH", 1))
+BATCH_WAIT_MS = float(os.getenv("LLM_BATCH_WAIT_MS", 50))
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 256))
+MAX_NEW_TOKENS = 200
+MIN_SNIPPET_CHARS = 100  # Shorter remains of a trimmed snippet are dropped
+DEFAULT_QUESTION = "How can I handle the hot soil problem?"
+
+
+def build_prompt(question, snippets=(), max_chars=None):
+    """
+    The prompt for a question and its knowledge snippets, most relevant first.
+
+    With max_chars, the least relevant snippets are dropped or trimmed until the prompt fits.
+    The question itself is never cut.
+    """
+    snippets = list(snippets)
+    while True:
+        notes = "".join(f"- {snippet}\n" for snippet in snippets)
+        if notes:
+            notes = f"Relevant notes, use them if they help:\n{notes}"
+        prompt = f"We are talking about agriculture. {notes}Answer to this question BRIEFELY: {question}"
+        if max_chars is None or len(prompt) <= max_chars or not snippets:
+            return prompt
+        # Trim the last snippet at a word boundary when enough of it is left, drop it otherwise
+        kept = snippets[-1][:len(snippets[-1]) - (len(prompt) - max_chars)].rsplit(" ", 1)[0]
+        if len(kept) >= MIN_SNIPPET_CHARS:
+            snippets[-1] = kept
+        else:
+            snippets.pop()
+
+
+def normalize_question(question):
+    """Cache key of a question: lowercase, single spaces, no trailing punctuation."""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+class ResponseCache:
+    """Answers by normalized question, least recently used evicted first, expiring after ttl seconds."""
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key, answer):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, answer)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+class Generation:
+    """A running generation, read token by token by every caller asking the same question."""
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def append(self, token):
+        with self.condition:
+            self.tokens.append(token)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def follow(self):
+        """Yields the tokens generated so far, then each new one as it arrives."""
+        position = 0
+        while True:
+            with self.condition:
+                while position == len(self.tokens) and not self.done:
+                    self.condition.wait()
+                tokens = self.tokens[position:]
+                done, error = self.done, self.error
+            position += len(tokens)
+            yield from tokens
+            if done and position == len(self.tokens):
+                if error is not None:
+                    raise error
+                return
+
+
+def prompt_budget(max_new_tokens, context_tokens=CONTEXT_TOKENS, chars_per_token=3):
+    """Characters of prompt that leave room for the answer in the context window, counting tokens conservatively."""
+    return max(context_tokens - max_new_tokens, 0) * chars_per_token
+
+
+class HostedBackend:
+    """Generates with the hosted model, reusing the client and its connections."""
+
+    def __init__(self, model):
+        self.client = InferenceClient(
+            model=model,
+            timeout=120,
+            token=access_token  # Add the token here
+        )
 
-def call_llm(question: str):
-    # Pass the access token to the InferenceClient
-    llm_client = InferenceClient(
-        model=repo_id,
-        timeout=120,
-        token=access_token  # Add the token here
-    )
+    def max_prompt_chars(self, max_new_tokens):
+        return None  # The hosted model's context is far larger than any prompt built here
+
+    def stream(self, prompt, max_new_tokens):
+        return self.client.text_generation(prompt, max_new_tokens=max_new_tokens, stream=True)
+
+    def generate_batch(self, prompts, max_new_tokens):
+        """Answers several prompts in one request, without streaming."""
+        response = self.client.post(json={
+            "inputs": prompts,
+            "parameters": {"max_new_tokens": max_new_tokens, "return_full_text": False},
+        }, task="text-generation")
+        outputs = json.loads(response.decode())
+        # One list of generations per prompt, or a single generation per prompt
+        return [(output[0] if isinstance(output, list) else output)["generated_text"] for output in outputs]
+
+
+class LocalBackend:
+    """Generates with a quantized gpt4all model kept resident on CPU, one question at a time."""
+
+    def __init__(self, model_name=LOCAL_MODEL, model_dir=LOCAL_MODEL_DIR, context_tokens=CONTEXT_TOKENS,
+                 threads=LOCAL_THREADS, queue_size=QUEUE_SIZE, allow_download=ALLOW_DOWNLOAD):
+        """
+        Args:
+            model_name (str): gpt4all model file, e.g. a Q4_0 GGUF instruct model
+            model_dir (str): Directory of the model file, gpt4all's default when None
+            context_tokens (int): Context window, prompt and answer together
+            threads (int): CPU threads, all cores when None
+            queue_size (int): Questions that may wait for the model before new ones are refused
+            allow_download (bool): Download the model file when it is missing
+        """
+        from gpt4all import GPT4All
+
+        self.context_tokens = context_tokens
+        self.model = GPT4All(model_name, model_path=model_dir, allow_download=allow_download,
+                             n_threads=threads, device="cpu", n_ctx=context_tokens)
+        self.queue = queue.Queue(maxsize=queue_size)
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            prompt, max_new_tokens, generation = self.queue.get()
+            try:
+                # A fresh session per question keeps the context to this prompt and its answer
+                with self.model.chat_session():
+                    for token in self.model.generate(prompt, max_tokens=max_new_tokens, streaming=True):
+                        generation.append(token)
+            except Exception as e:
+                generation.finish(e)
+            else:
+                generation.finish()
+
+    def max_prompt_chars(self, max_new_tokens):
+        return prompt_budget(max_new_tokens, self.context_tokens)
+
+    def stream(self, prompt, max_new_tokens):
+        generation = Generation()
+        try:
+            self.queue.put_nowait((prompt, max_new_tokens, generation))
+        except queue.Full:
+            raise RuntimeError(f"Local LLM is busy, {self.queue.maxsize} questions are already waiting")
+        return generation.follow()
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_cache = ResponseCache()
+_generations = {}
+_generations_lock = threading.Lock()
+_deduplicated = 0
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_backend():
+    """Returns the process-wide backend chosen by LLM_BACKEND, loading it on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if BACKEND == "local":
+                _backend = LocalBackend()
+            elif BACKEND == "hosted":
+                _backend = HostedBackend(LLM_URL or repo_id)
+            else:
+                raise ValueError(f"Unknown LLM_BACKEND: {BACKEND}, use 'hosted' or 'local'")
+        return _backend
+
+
+def get_scheduler():
+    """Returns the process-wide scheduler, batching only when the backend can."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            run_batch = _generate_batch if hasattr(get_backend(), "generate_batch") else None
+            _scheduler = llm_scheduler.Scheduler(_generate, run_batch, CONCURRENCY, RATE, BURST, MAX_BATCH,
+                                                 BATCH_WAIT_MS)
+        return _scheduler
+
+
+def _generate(payload):
+    """Streams the answer into the generation, caching it once complete."""
+    key, question, generation = payload
+    try:
+        backend = get_backend()
+        prompt = build_prompt(question, knowledge_index.retrieve(question), backend.max_prompt_chars(MAX_NEW_TOKENS))
+        for token in backend.stream(prompt, MAX_NEW_TOKENS):
+            generation.append(token)
+    except Exception as e:
+        generation.finish(e)
+    else:
+        _cache.put(key, "".join(generation.tokens))
+        generation.finish()
+    finally:
+        with _generations_lock:
+            _generations.pop(key, None)
+
+
+def _generate_batch(payloads):
+    """Answers several questions in one backend request."""
+    try:
+        backend = get_backend()
+        max_chars = backend.max_prompt_chars(MAX_NEW_TOKENS)
+        prompts = [build_prompt(question, knowledge_index.retrieve(question), max_chars) for _, question, _ in payloads]
+        answers = backend.generate_batch(prompts, MAX_NEW_TOKENS)
+    except Exception as e:
+        for _, _, generation in payloads:
+            generation.finish(e)
+    else:
+        for (key, _, generation), answer in zip(payloads, answers):
+            generation.append(answer)
+            _cache.put(key, answer)
+            generation.finish()
+    finally:
+        with _generations_lock:
+            for key, _, _ in payloads:
+                _generations.pop(key, None)
+
+
+def stream_llm(question: str, priority=INTERACTIVE):
+    """
+    Answers a question, yielding the text as it is generated.
+
+    Args:
+        question (str): Question of the user, the hot soil question when empty
+        priority (str): INTERACTIVE for someone waiting on the answer, BATCH for reports and other
+            background work, which may be answered in one piece
+
+    Returns:
+        generator: Text pieces of the answer, the whole answer at once when it is cached
+    """
+    global _deduplicated
     if not question:
-        question = "How can I handle the hot soil problem?"
-
-    prompt = f"We are talking about agriculture. Answer to this question BRIEFELY: {question}"
-    response = llm_client.post(
-        json={
-            "inputs": prompt,
-            "parameters": {"max_new_tokens": 200},
-            "task": "text-generation",
-        },
-    )
-    data = json.loads(response.decode())[0]["generated_text"]
-    return data.split(prompt)[1]
+        question = DEFAULT_QUESTION
+    key = normalize_question(question)
+    answer = _cache.get(key)
+    if answer is not None:
+        yield answer
+        return
+
+    # The first call may load the backend, which must not hold up the other callers
+    scheduler = get_scheduler()
+    with _generations_lock:
+        running = _generations.get(key)
+        if running is None:
+            generation = Generation()
+            # The generation runs on a scheduler worker, so an early stop of this caller does not cut it short for the others.
+            # Submitting only queues the job, and doing it under the lock keeps its cleanup from running before the insert.
+            job = scheduler.submit((key, question, generation), priority)
+            _generations[key] = (generation, job)
+        else:
+            generation, job = running
+            _deduplicated += 1
+    if running is not None and priority == INTERACTIVE:
+        scheduler.promote(job)
+    yield from generation.follow()
+
+
+def call_llm(question: str, priority=INTERACTIVE):
+    """Answers a question, returning the whole text."""
+    return "".join(stream_llm(question, priority))
+
+
+def stats():
+    """Cache hits and misses, questions that joined a running generation, questions waiting for the local model, and the scheduler's counters."""
+    requested = _cache.hits + _cache.misses
+    return {
+        "hits": _cache.hits,
+        "misses": _cache.misses,
+        "hit_rate": _cache.hits / requested if requested else 0.0,
+        "deduplicated": _deduplicated,
+        "queue_depth": _backend.queue_depth() if isinstance(_backend, LocalBackend) else 0,
+        "scheduler": _scheduler.stats() if _scheduler is not None else None,
+    }
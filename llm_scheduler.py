@@ -0,0 +1,178 @@
+"""
+Request scheduler in front of the LLM backend.
+
+Questions wait in two priority lanes: interactive questions, whose answers are streamed to
+someone waiting, are always dispatched before batch questions such as reports. A fixed pool
+of workers bounds the number of generations running at once, and a token bucket spaces the
+requests sent to the provider, so its rate limits are not hit. When the backend can answer
+several prompts in one request, waiting batch questions are sent together.
+
+Queue depth, wait times, throughput and batch sizes are available from stats().
+"""
+import threading
+import time
+from collections import Counter, deque
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, returns the seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class Job:
+    """A question waiting for a worker. `payload` is handed to the run functions as is."""
+
+    __slots__ = ("payload", "lane", "enqueued", "started")
+
+    def __init__(self, payload, lane):
+        if lane not in LANES:
+            raise ValueError(f"Unknown priority: {lane}, use one of {LANES}")
+        self.payload = payload
+        self.lane = lane
+        self.enqueued = time.perf_counter()
+        self.started = None
+
+
+class Scheduler:
+    def __init__(self, run, run_batch=None, concurrency=4, rate=0.0, burst=4, max_batch=8, max_wait_ms=50):
+        """
+        Args:
+            run (callable): Answers one job's payload
+            run_batch (callable): Answers a list of payloads in one request, None when the backend cannot
+            concurrency (int): Workers, the most generations running at once
+            rate (float): Requests per second sent to the backend, 0 for no limit
+            burst (int): Requests that may be sent at once after an idle period
+            max_batch (int): Batch questions sent in one request
+            max_wait_ms (float): How long a lone batch question waits for others to share its request
+        """
+        self.run = run
+        self.run_batch = run_batch if max_batch > 1 else None
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.bucket = TokenBucket(rate, burst)
+        self.lanes = {lane: deque() for lane in LANES}
+        self.condition = threading.Condition()
+        self.running = 0
+        self.waits = {lane: deque(maxlen=10000) for lane in LANES}
+        self.completed = Counter()
+        self.batch_sizes = Counter()
+        self.throttled = 0.0
+        self.started = time.perf_counter()
+        for _ in range(concurrency):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, payload, lane=INTERACTIVE):
+        """Queues a payload in a lane and returns its job."""
+        job = Job(payload, lane)
+        with self.condition:
+            self.lanes[lane].append(job)
+            self.condition.notify()
+        return job
+
+    def promote(self, job):
+        """Moves a queued batch job to the interactive lane, e.g. when someone is now waiting for it."""
+        with self.condition:
+            if job.lane == BATCH and job in self.lanes[BATCH]:
+                self.lanes[BATCH].remove(job)
+                job.lane = INTERACTIVE
+                self.lanes[INTERACTIVE].append(job)
+                # Wakes a worker, also one holding batch questions back, which then takes this one first
+                self.condition.notify()
+
+    def _take(self):
+        """Waits for work: the oldest interactive job, or else up to max_batch batch jobs."""
+        with self.condition:
+            while True:
+                if self.lanes[INTERACTIVE]:
+                    return [self.lanes[INTERACTIVE].popleft()]
+                if not self.lanes[BATCH]:
+                    self.condition.wait()
+                    continue
+                if self.run_batch is None:
+                    return [self.lanes[BATCH].popleft()]
+                if len(self.lanes[BATCH]) < self.max_batch:
+                    # Give other batch questions a moment to share the request, counted from the oldest
+                    # one still waiting, which changes when one is promoted
+                    remaining = self.lanes[BATCH][0].enqueued + self.max_wait - time.perf_counter()
+                    if remaining > 0:
+                        self.condition.wait(remaining)
+                        continue
+                count = min(len(self.lanes[BATCH]), self.max_batch)
+                return [self.lanes[BATCH].popleft() for _ in range(count)]
+
+    def _work(self):
+        while True:
+            jobs = self._take()
+            # Time spent waiting for the rate limit counts as queue wait, not as running
+            throttled = self.bucket.acquire()
+            with self.condition:
+                now = time.perf_counter()
+                for job in jobs:
+                    job.started = now
+                    self.waits[job.lane].append(now - job.enqueued)
+                self.running += 1
+                self.throttled += throttled
+            try:
+                if len(jobs) == 1:
+                    self.run(jobs[0].payload)
+                else:
+                    self.run_batch([job.payload for job in jobs])
+            finally:
+                with self.condition:
+                    self.running -= 1
+                    self.batch_sizes[len(jobs)] += 1
+                    for job in jobs:
+                        self.completed[job.lane] += 1
+
+    def stats(self):
+        with self.condition:
+            depth = {lane: len(jobs) for lane, jobs in self.lanes.items()}
+            waits = {lane: sorted(values) for lane, values in self.waits.items()}
+            completed = dict(self.completed)
+            batch_sizes = dict(self.batch_sizes)
+            running, throttled = self.running, self.throttled
+        elapsed = time.perf_counter() - self.started
+
+        def percentile(values, p):
+            if not values:
+                return None
+            return values[min(int(p * len(values)), len(values) - 1)] * 1000
+
+        return {
+            "queue_depth": depth,
+            "running": running,
+            "completed": completed,
+            "throughput_per_s": sum(completed.values()) / elapsed if elapsed else 0.0,
+            "wait_p50_ms": {lane: percentile(values, 0.50) for lane, values in waits.items()},
+            "wait_p95_ms": {lane: percentile(values, 0.95) for lane, values in waits.items()},
+            "requests": sum(batch_sizes.values()),
+            "batch_sizes": batch_sizes,
+            "throttled_s": throttled,
+        }
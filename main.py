@@ -1,5 +1,3 @@
-import absl.logging
-absl.logging.set_verbosity(absl.logging.ERROR)
 import os
 import logging
 logging.getLogger('tensorflow').setLevel(logging.ERROR)
@@ -7,34 +5,106 @@ os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
 import random
-import matplotlib.pyplot as plt
-from PIL import Image
 import sys
 from colorama import Fore, Style, init
 
-from llm import call_llm
-from disease_detection import predict_image
-from weather import predict_weather
-from collect_user_feedback import collect_feedback
-from data_visualization.nitrogen_risk import nitrogen
-from data_visualization.phosphorus_risk import phosphorus
-from data_visualization.yield_risk import yield_
-from data_visualization.stress_buster import stress
-import tensorflow as tf
-
+# Heavy dependencies (tensorflow, matplotlib, PIL, the LLM client and the risk modules)
+# are imported inside the menu handlers, so each task only pays for what it uses.
 
 # Initialize colorama
 init(autoreset=True)
 
-# Load the pre-trained ResNet-50 model (Keras)
-model_path = 'model/best_model.keras'  # Path to your .keras model
-model = tf.keras.models.load_model(model_path)  # Load the .keras model
+# Path to the pre-trained ResNet-50 model, loaded on first use.
+# Point MODEL_PATH at a .tflite export (see model_export.py) to use the TFLite backend.
+model_path = os.getenv('MODEL_PATH', 'model/best_model.keras')
+_model = None
+_prediction_cache = None
+
+
+def get_prediction_cache():
+    global _prediction_cache
+    if _prediction_cache is None and os.path.exists(model_path):
+        from prediction_cache import PredictionCache
+        _prediction_cache = PredictionCache(model_path)
+    return _prediction_cache
+
+
+def get_model():
+    global _model
+    if _model is None:
+        from disease_detection import load_model
+        _model = load_model(model_path)
+    return _model
 
 
 def print_colored(text, color=Fore.WHITE, style=Style.BRIGHT):
     print(f"{style}{color}{text}{Style.RESET_ALL}")
 
 
+def ask_question():
+    from llm import stream_llm
+
+    question = input(Fore.BLUE + "Enter your question: " + Style.RESET_ALL)
+    print_colored("Response:", Fore.MAGENTA)
+    for text in stream_llm(question):
+        print(text, end="", flush=True)
+    print()
+
+
+def detect_disease():
+    import matplotlib.pyplot as plt
+    from PIL import Image
+    from disease_detection import INFERENCE_URL, predict_image
+
+    imgs = ["Healthy", "Rusty", "Powdery"]
+    img_path = f"model/{random.choice(imgs)}.jpg"
+    try:
+        image = Image.open(img_path)
+        # With a running inference server there is no need to load the model locally
+        model = None if INFERENCE_URL else get_model()
+        prediction = predict_image(img_path, model, cache=get_prediction_cache())
+        # Display results
+        print_colored(f"Prediction: {prediction}", Fore.GREEN)
+        plt.imshow(image)
+        plt.axis("off")  # Hide axes
+        plt.title(f"Prediction: {prediction}", fontsize=14, fontweight='bold', color='green')
+        plt.show()
+    except FileNotFoundError:
+        print_colored("Error: Image file not found!", Fore.RED)
+
+
+def weather_prediction():
+    from weather import predict_weather
+
+    lat = input(Fore.BLUE + "Insert the latitude and the latitude: " + Style.RESET_ALL)
+    long = input(Fore.BLUE + "Insert the latitude and the longitude: " + Style.RESET_ALL)
+    if not lat or not long:
+        lat, long = 47.5, 7.5
+    predict_weather(lat, long)
+
+
+def risk_analysis():
+    choice = input("Do you want to analyze: Nitrogen, Phosphorus, Yield or Stress?")
+    if choice == 'Nitrogen':
+        from data_visualization.nitrogen_risk import nitrogen
+        nitrogen()
+    elif choice == 'Phosphorus':
+        from data_visualization.phosphorus_risk import phosphorus
+        phosphorus()
+    elif choice == 'Yield':
+        from data_visualization.yield_risk import yield_
+        yield_()
+    else:
+        from data_visualization.stress_buster import stress
+        stress()
+
+
+def user_feedback():
+    from collect_user_feedback import collect_feedback
+
+    collect_feedback()
+
+
 def main():
     while True:
         print_colored("\nSelect a task to run:", Fore.CYAN)
@@ -50,41 +120,15 @@ def main():
 
         # Check the user choice and call the corresponding function
         if choice == '1':
-            question = input(Fore.BLUE + "Enter your question: " + Style.RESET_ALL)
-            print_colored("Response:", Fore.MAGENTA)
-            print(call_llm(question))
+            ask_question()
         elif choice == '2':
-            imgs = ["Healthy", "Rusty", "Powdery"]
-            img_path = f"model/{random.choice(imgs)}.jpg"
-            try:
-                image = Image.open(img_path)
-                prediction = predict_image(img_path, model)
-                # Display results
-                print_colored(f"Prediction: {prediction}", Fore.GREEN)
-                plt.imshow(image)
-                plt.axis("off")  # Hide axes
-                plt.title(f"Prediction: {prediction}", fontsize=14, fontweight='bold', color='green')
-                plt.show()
-            except FileNotFoundError:
-                print_colored("Error: Image file not found!", Fore.RED)
+            detect_disease()
         elif choice == '3':
-            lat = input(Fore.BLUE + "Insert the latitude and the latitude: " + Style.RESET_ALL)
-            long = input(Fore.BLUE + "Insert the latitude and the longitude: " + Style.RESET_ALL)
-            if not lat or not long:
-                lat, long = 47.5, 7.5
-            predict_weather(lat, long)
+            weather_prediction()
         elif choice == '4':
-            choice = input("Do you want to analyze: Nitrogen, Phosphorus, Yield or Stress?")
-            if choice == 'Nitrogen':
-                nitrogen()
-            elif choice == 'Phosphorus':
-                phosphorus()
-            elif choice == 'Yield':
-                yield_()
-            else:
-                stress()
+            risk_analysis()
         elif choice == '5':
-            collect_feedback()
+            user_feedback()
         elif choice == '6':
             print_colored("Exiting the program.", Fore.RED)
             sys.exit()  # Exit the program
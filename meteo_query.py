@@ -0,0 +1,302 @@
+"""
+Query planner for the meteoblue dataset API.
+
+Risk calculations name the variables they need. The planner merges every variable
+served by the same domain into a single request, since queries[].codes accepts many codes,
+and fans the per-code series back out by name. A nitrogen assessment then takes one
+round trip instead of two. Phosphorus and yield assessments take two (ERA5T and
+SOILGRIDS1000) instead of three.
+
+Daily series go through the local weather_cache, so only days that are not stored yet
+are requested. All missing sub-ranges go into one request as separate timeIntervals.
+
+Response bodies are parsed as they stream in, straight into one NumPy array per series,
+so a long multi-location response is never decoded into a tree of Python floats.
+
+The requests of one assessment run concurrently on asyncio. Each one goes through the
+pooled http_client session on a worker thread and is bounded by METEO_REQUEST_TIMEOUT.
+
+Many locations are packed into one MultiPoint request, up to METEO_MULTIPOINT_CHUNK
+coordinates, and the per-location series of the response are split back out in order.
+"""
+import asyncio
+import datetime
+import functools
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dotenv import load_dotenv
+
+import http_client
+import weather_cache
+from json_stream import parse_stream
+
+load_dotenv()  # Load environment variables from .env
+
+HIST_KEY = os.getenv("HIST_KEY")
+BASE_URL = f'http://my.meteoblue.com/dataset/query?apikey={HIST_KEY}'
+
+# Upper bound in seconds for one dataset request, retries included
+REQUEST_TIMEOUT = float(os.getenv("METEO_REQUEST_TIMEOUT", 90))
+
+# Locations packed into one MultiPoint request
+MULTIPOINT_CHUNK = int(os.getenv("METEO_MULTIPOINT_CHUNK", 50))
+
+# Bytes read from the response body at a time, the body is parsed as it arrives
+STREAM_CHUNK = int(os.getenv("METEO_STREAM_CHUNK", 64 * 1024))
+
+# Long-lived pool, so a timed-out request never holds up the caller while asyncio.run shuts down
+_executor = ThreadPoolExecutor(max_workers=http_client.MAX_PER_HOST * 2, thread_name_prefix="meteo")
+
+UNITS = {"temperature": "C", "velocity": "km/h", "length": "metric", "energy": "watts"}
+
+# Variable name -> (domain, time resolution, code spec)
+VARIABLES = {
+    "precipitation": ("ERA5T", "daily", {"code": 61, "level": "sfc", "aggregation": "sum"}),
+    "soil_moisture": ("ERA5T", "daily", {"code": 144, "level": "0-7 cm down", "aggregation": "mean"}),
+    "max_temp": ("ERA5T", "daily", {"code": 11, "level": "2 m above gnd", "aggregation": "max"}),
+    "min_temp": ("ERA5T", "daily", {"code": 11, "level": "2 m above gnd", "aggregation": "min"}),
+    "mean_temp": ("ERA5T", "daily", {"code": 11, "level": "2 m above gnd", "aggregation": "mean"}),
+    "cumulative_precipitation": ("ERA5T", "daily", {"code": 180, "level": "sfc", "aggregation": "sum"}),
+    "evaporation": ("ERA5T", "daily", {"code": 261, "level": "sfc", "aggregation": "sum"}),
+    "ph": ("SOILGRIDS1000", "static", {"code": 812, "level": "5 cm"}),
+}
+
+
+def plan_queries(names):
+    """
+    Groups variables into the fewest dataset queries.
+
+    Args:
+        names (list): Variable names from VARIABLES
+
+    Returns:
+        list: (domain, time resolution, [names]) per request, in first-seen order
+    """
+    groups = {}
+    for name in dict.fromkeys(names):  # Drop duplicates, keep order
+        if name not in VARIABLES:
+            raise ValueError(f"Unknown variable: {name}")
+        domain, time_resolution, _ = VARIABLES[name]
+        groups.setdefault((domain, time_resolution), []).append(name)
+    return [(domain, time_resolution, group) for (domain, time_resolution), group in groups.items()]
+
+
+def parse_range(timestamp_range):
+    """Splits "YYYY-MM-DDT+00:00/YYYY-MM-DDT+00:00" into start and end dates."""
+    start, end = timestamp_range.split("/")
+    return datetime.date.fromisoformat(start[:10]), datetime.date.fromisoformat(end[:10])
+
+
+def format_range(start, end):
+    return f"{start.isoformat()}T+00:00/{end.isoformat()}T+00:00"
+
+
+def build_payload(domain, time_resolution, names, locations, time_intervals):
+    return {
+        "units": UNITS,
+        "geometry": {
+            "type": "MultiPoint",
+            "coordinates": [location_coords for location_coords, _ in locations],
+            "locationNames": [location_name for _, location_name in locations],
+        },
+        "format": "json",
+        "timeIntervals": time_intervals,
+        "queries": [{
+            "domain": domain,
+            "gapFillDomain": "NEMSGLOBAL",
+            "timeResolution": time_resolution,
+            "codes": [VARIABLES[name][2] for name in names],
+        }]
+    }
+
+
+def post_query(domain, time_resolution, names, locations, time_intervals):
+    """
+    Sends one dataset request for one or more locations.
+
+    Args:
+        locations (list): (location_coords, location_name) pairs
+
+    Returns:
+        list: {name: [series per time interval]} per location, in request order, or None if the request failed.
+        Each series is a float64 NumPy array with NaN for missing values.
+    """
+    payload = build_payload(domain, time_resolution, names, locations, time_intervals)
+    with http_client.post(BASE_URL, json=payload, stream=True) as response:
+        if response.status_code != 200:
+            print(f"Failed to fetch {domain} data: {response.status_code} - {response.text}")
+            return None
+        try:
+            # The per-day timestamps are not used, the series are aligned with the requested range
+            items = parse_stream(response.iter_content(STREAM_CHUNK), skip_keys=("timeIntervals",))
+        except ValueError as e:
+            print(f"Failed to parse {domain} data: {e}")
+            return None
+    # One item for the query, whose data lists hold one series per location, in the order of geometry.coordinates
+    if len(items) != 1 or any(len(interval['data']) != len(locations)
+                              for res in items[0]['codes'] for interval in res['dataPerTimeInterval']):
+        print(f"Failed to fetch {domain} data: unexpected response for {len(locations)} locations")
+        return None
+    codes = items[0]['codes']
+    return [
+        {name: [interval['data'][i] for interval in res['dataPerTimeInterval']] for name, res in zip(names, codes)}
+        for i in range(len(locations))
+    ]
+
+
+def post_chunked(domain, time_resolution, names, locations, time_intervals, chunk_size=MULTIPOINT_CHUNK):
+    """Splits locations into MultiPoint requests of at most chunk_size; failed chunks give None per location."""
+    results = []
+    for i in range(0, len(locations), chunk_size):
+        chunk = locations[i:i + chunk_size]
+        series = post_query(domain, time_resolution, names, chunk, time_intervals)
+        results.extend(series if series is not None else [None] * len(chunk))
+    return results
+
+
+def fetch_cached_query(cache, domain, names, locations, timestamp_range, chunk_size=MULTIPOINT_CHUNK):
+    """
+    Serves a daily query from the weather cache, requesting only the days it does not have.
+
+    Locations missing exactly the same days share MultiPoint requests. A location gets None
+    when any requested day is still missing, so its series always cover the whole range.
+    """
+    start, end = parse_range(timestamp_range)
+    days = weather_cache.date_range(start, end)
+    cells, stored, missing_groups = [], [], {}
+    for index, (location_coords, _) in enumerate(locations):
+        cell = {name: cache.cell(location_coords, VARIABLES[name][2]) for name in names}
+        values = {name: cache.load(cell[name], VARIABLES[name][2], start, end) for name in names}
+        missing = sorted({day for name in names for day in days if day not in values[name]})
+        hits = sum(len(v) for v in values.values())
+        cache.count(hits, len(days) * len(names) - hits)
+        cells.append(cell)
+        stored.append(values)
+        if missing:
+            missing_groups.setdefault(tuple(weather_cache.contiguous_ranges(missing)), []).append(index)
+
+    for ranges, indexes in missing_groups.items():
+        fetched = post_chunked(domain, "daily", names, [locations[i] for i in indexes],
+                               [format_range(first, last) for first, last in ranges], chunk_size)
+        for index, series in zip(indexes, fetched):
+            if series is None:
+                stored[index] = None
+                continue
+            if any(len(values) != (last - first).days + 1
+                   for name in names for (first, last), values in zip(ranges, series[name])):
+                print(f"Failed to fetch {domain} data: short series for {locations[index][1]}")
+                stored[index] = None
+                continue
+            for name in names:
+                new_values = {}
+                for (first, last), values in zip(ranges, series[name]):
+                    new_values.update(zip(weather_cache.date_range(first, last), values))
+                cache.store(cells[index][name], VARIABLES[name][2], new_values)
+                stored[index][name].update(new_values)
+
+    results = []
+    for (_, location_name), values in zip(locations, stored):
+        if values is not None and any(day not in values[name] for name in names for day in days):
+            print(f"Failed to fetch {domain} data: missing days for {location_name}")
+            values = None
+        results.append(None if values is None else {
+            name: np.array([values[name][day] for day in days], dtype=np.float64) for name in names
+        })
+    return results
+
+
+def fetch_query_multi(domain, time_resolution, names, locations, timestamp_range, chunk_size=MULTIPOINT_CHUNK):
+    """Runs one planned query for many locations and returns {name: series} per location, None where it failed."""
+    cache = weather_cache.get_cache()
+    if cache is not None and time_resolution == "daily":
+        return fetch_cached_query(cache, domain, names, locations, timestamp_range, chunk_size)
+
+    results = post_chunked(domain, time_resolution, names, locations, [timestamp_range], chunk_size)
+    return [
+        None if series is None else {name: intervals[0] for name, intervals in series.items()}
+        for series in results
+    ]
+
+
+def fetch_query(domain, time_resolution, names, location_coords, location_name, timestamp_range):
+    """Runs one planned query and returns {name: series}, or None if the request failed."""
+    return fetch_query_multi(domain, time_resolution, names, [(location_coords, location_name)], timestamp_range)[0]
+
+
+async def fetch_query_async(domain, time_resolution, names, locations, timestamp_range,
+                            timeout=REQUEST_TIMEOUT, chunk_size=MULTIPOINT_CHUNK):
+    """Runs fetch_query_multi on a worker thread, giving up after timeout seconds per MultiPoint chunk."""
+    call = functools.partial(fetch_query_multi, domain, time_resolution, names, locations, timestamp_range,
+                             chunk_size)
+    timeout = timeout * max(1, math.ceil(len(locations) / chunk_size))
+    try:
+        return await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(_executor, call), timeout)
+    except asyncio.TimeoutError:
+        print(f"Timed out fetching {domain} data after {timeout:g} s")
+        return [None] * len(locations)
+
+
+async def fetch_variables_multi_async(locations, timestamp_range, names, timeout=REQUEST_TIMEOUT,
+                                      chunk_size=MULTIPOINT_CHUNK):
+    """Same as fetch_variables_multi, with the per-domain requests running concurrently."""
+    plan = plan_queries(names)
+    results = await asyncio.gather(*(
+        fetch_query_async(domain, time_resolution, group, locations, timestamp_range, timeout, chunk_size)
+        for domain, time_resolution, group in plan
+    ))
+    merged = [dict.fromkeys(names) for _ in locations]
+    for per_location in results:
+        for result, series in zip(merged, per_location):
+            if series is not None:
+                result.update(series)
+    return merged
+
+
+async def fetch_variables_async(location_coords, location_name, timestamp_range, names, timeout=REQUEST_TIMEOUT):
+    """Same as fetch_variables, with the per-domain requests running concurrently."""
+    results = await fetch_variables_multi_async([(location_coords, location_name)], timestamp_range, names, timeout)
+    return results[0]
+
+
+def fetch_variables_multi(locations, timestamp_range, names, timeout=REQUEST_TIMEOUT, chunk_size=MULTIPOINT_CHUNK):
+    """
+    Fetches every named variable for many locations, packing up to chunk_size locations per request.
+
+    Args:
+        locations (list): (location_coords, location_name) pairs, coords as [longitude, latitude, altitude]
+        timestamp_range (str): Time interval in format "YYYY-MM-DDT+00:00/YYYY-MM-DDT+00:00"
+        names (list): Variable names from VARIABLES
+        timeout (float): Seconds allowed per request
+        chunk_size (int): Maximum number of coordinates per MultiPoint request
+
+    Returns:
+        list: One dict per location, variable name -> NumPy array of values (None where a request failed)
+    """
+    return asyncio.run(fetch_variables_multi_async(locations, timestamp_range, names, timeout, chunk_size))
+
+
+def fetch_variables(location_coords, location_name, timestamp_range, names, timeout=REQUEST_TIMEOUT):
+    """
+    Fetches every named variable with one request per domain, all domains concurrently.
+
+    Args:
+        location_coords (list): [longitude, latitude, altitude]
+        location_name (str): Human-readable location name
+        timestamp_range (str): Time interval in format "YYYY-MM-DDT+00:00/YYYY-MM-DDT+00:00"
+        names (list): Variable names from VARIABLES
+        timeout (float): Seconds allowed per request
+
+    Returns:
+        dict: Variable name -> NumPy array of values, None for variables whose request failed
+    """
+    plan = plan_queries(names)
+    if len(plan) == 1:
+        # Nothing to overlap, skip the event loop
+        result = dict.fromkeys(names)
+        series = fetch_query(*plan[0], location_coords, location_name, timestamp_range)
+        if series is not None:
+            result.update(series)
+        return result
+    return asyncio.run(fetch_variables_async(location_coords, location_name, timestamp_range, names, timeout))
@@ -0,0 +1,70 @@
+"""
+Exports the Keras disease classifier to TensorFlow Lite for CPU-only inference.
+
+    python model_export.py                      # float32 model/best_model.tflite
+    python model_export.py --int8               # int8 post-training quantization
+
+The exported file is loaded through disease_detection.load_model, which picks the
+TFLite backend from the .tflite extension.
+"""
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # 3 = Suppress all INFO and WARNING messages
+
+import argparse
+
+import numpy as np
+
+from disease_detection import load_padded_image, normalize
+
+CALIBRATION_IMAGES = ["model/Healthy.jpg", "model/Powdery.jpg", "model/Rusty.jpg"]
+
+
+def representative_dataset(image_paths):
+    """Yields calibration batches, including flipped variants to widen the activation ranges."""
+    def generator():
+        for path in image_paths:
+            img_array = normalize(load_padded_image(path))
+            for variant in (img_array, img_array[:, ::-1], img_array[::-1, :]):
+                yield [np.ascontiguousarray(variant[np.newaxis])]
+    return generator
+
+
+def export_tflite(model_path, output_path, int8=False, calibration_images=CALIBRATION_IMAGES):
+    """
+    Converts a .keras model to a .tflite flatbuffer.
+
+    Args:
+        model_path (str): Path of the Keras model
+        output_path (str): Where to write the .tflite file
+        int8 (bool): Apply full int8 post-training quantization, calibrated on calibration_images
+        calibration_images (list): Image paths used to estimate activation ranges
+
+    Returns:
+        int: Size of the exported model in bytes
+    """
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if int8:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calibration_images)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Inputs and outputs stay float32 so callers feed the same arrays as the Keras model
+
+    tflite_model = converter.convert()
+    with open(output_path, "wb") as file:
+        file.write(tflite_model)
+    return len(tflite_model)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="model/best_model.keras")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--int8", action="store_true")
+    args = parser.parse_args()
+
+    output = args.output or ("model/best_model_int8.tflite" if args.int8 else "model/best_model.tflite")
+    size = export_tflite(args.model, output, int8=args.int8)
+    print(f"Exported {output} ({size / 1e6:.1f} MB)")
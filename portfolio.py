@@ -0,0 +1,216 @@
+"""
+Non-interactive batch risk engine for a portfolio of fields.
+
+    python portfolio.py fields.csv --output results.csv --concurrency 16
+
+The input table has one row per field with the columns
+    field_id, crop, lon, lat, altitude, start_date, yield_kg_ha, nitrogen_kg_ha, phosphorus_kg_ha
+and optionally nitrogen_index (the 0-1 nitrogen value used by the yield risk, default 0).
+CSV is always supported, Parquet when pyarrow is installed.
+
+Historical weather is fetched once per distinct (location, start date). Locations that
+share a start date are packed into MultiPoint requests of up to --chunk-size coordinates.
+The CE Hub forecast is fetched once per distinct (lat, lon). At most `concurrency` weather
+batches and forecast queries run at once. A weather batch sends one request per domain
+(ERA5T and SOILGRIDS1000) concurrently, so the requests actually in flight to each API
+are capped by http_client at HTTP_MAX_PER_HOST. All four indicators are then computed per
+field and written as one table, with the NUE and PUE tiers as their plain category names
+(NUE_CATEGORIES, PUE_CATEGORIES).
+"""
+import argparse
+import csv
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from meteo_query import MULTIPOINT_CHUNK, fetch_variables_multi, format_range
+from data_visualization.crops import CROP_NAMES, NUTRIENT_CROP_NAMES
+from data_visualization.nitrogen_risk import NUE_CATEGORIES, NitrogenStressRisk
+from data_visualization.phosphorus_risk import PUE_CATEGORIES, PhosphorusStress
+from data_visualization.stress_buster import compute_daily_risks, fetch_daily_temperatures
+from data_visualization.yield_risk import compute_gdd_array, compute_yield_risk, yield_risk_level
+
+WEATHER_VARIABLES = ["precipitation", "soil_moisture", "ph", "max_temp", "min_temp"]
+
+RESULT_COLUMNS = [
+    "field_id", "crop", "nue", "nue_category", "pue", "pue_category", "gdd", "yield_risk", "yield_risk_level",
+    "max_diurnal_heat_stress", "max_nighttime_heat_stress", "max_frost_stress", "high_drought_days", "error",
+]
+
+
+def read_fields(path):
+    """Reads the field table from CSV or Parquet into a list of dicts."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Reading Parquet needs pyarrow, install it or convert the table to CSV")
+        rows = pq.read_table(path).to_pylist()
+    else:
+        with open(path, newline="") as file:
+            rows = list(csv.DictReader(file))
+
+    fields = []
+    for row in rows:
+        crop = CROP_NAMES.get(str(row["crop"]).strip().capitalize(), str(row["crop"]).strip().capitalize())
+        fields.append({
+            "field_id": str(row["field_id"]),
+            "crop": crop,
+            "location": [float(row["lon"]), float(row["lat"]), float(row["altitude"])],
+            "start_date": str(row["start_date"])[:10],
+            "yield_kg_ha": float(row["yield_kg_ha"]),
+            "nitrogen_kg_ha": float(row["nitrogen_kg_ha"]),
+            "phosphorus_kg_ha": float(row["phosphorus_kg_ha"]),
+            "nitrogen_index": float(row.get("nitrogen_index") or 0),
+        })
+    return fields
+
+
+def summarize_stress(daily_data, crop):
+    """Worst daily stress indices over the forecast window, the same indices stress() prints per day."""
+    _, risks = compute_daily_risks(daily_data, crop)
+    complete = risks["complete"]
+    if not complete.any():
+        return {"max_diurnal_heat_stress": None, "max_nighttime_heat_stress": None, "max_frost_stress": None,
+                "high_drought_days": 0}
+    return {
+        "max_diurnal_heat_stress": float(risks["diurnal_heat_stress"][complete].max()),
+        "max_nighttime_heat_stress": float(risks["nighttime_heat_stress"][complete].max()),
+        "max_frost_stress": float(risks["frost_stress"][complete].max()),
+        "high_drought_days": int((risks["drought_risk"][complete] == 2).sum()),
+    }
+
+
+def assess_field(field, weather, forecast):
+    """Computes NUE, PUE, yield risk and stress indices for one field from already fetched inputs."""
+    result = {"field_id": field["field_id"], "crop": field["crop"]}
+    if any(weather[name] is None for name in WEATHER_VARIABLES):
+        result["error"] = "Missing historical weather data"
+        return result
+
+    rainfall = float(np.sum(weather["precipitation"]))
+    soil_moisture = float(np.mean(weather["soil_moisture"]))
+    pH = weather["ph"][0]
+    nutrient_crop = NUTRIENT_CROP_NAMES.get(field["crop"], field["crop"])
+
+    nue = NitrogenStressRisk.compute_nue(nutrient_crop, field["yield_kg_ha"], field["nitrogen_kg_ha"],
+                                         rainfall, soil_moisture)
+    result["nue"] = nue["NUE"]
+    result["nue_category"] = NUE_CATEGORIES[int(NitrogenStressRisk.nue_category_array(nue["NUE"]))]
+
+    phosphorus = PhosphorusStress(nutrient_crop, field["yield_kg_ha"] / 1000, field["phosphorus_kg_ha"],
+                                  rainfall, soil_moisture, pH)
+    result["pue"] = phosphorus.calculate_PUE()
+    result["pue_category"] = PUE_CATEGORIES[int(PhosphorusStress.pue_category_array(result["pue"]))]
+
+    gdd = float(compute_gdd_array(weather["max_temp"], weather["min_temp"]))
+    yield_risk = compute_yield_risk(gdd, rainfall, pH, field["nitrogen_index"], field["crop"])
+    result.update(gdd=gdd, yield_risk=yield_risk, yield_risk_level=yield_risk_level(yield_risk))
+
+    if isinstance(forecast, list):
+        result.update(summarize_stress(forecast, field["crop"]))
+    else:
+        result["error"] = f"Forecast unavailable: {forecast}"
+    return result
+
+
+def run_portfolio(fields, concurrency=16, end_date=None, chunk_size=MULTIPOINT_CHUNK):
+    """
+    Fetches deduplicated weather for all fields and assesses every field.
+
+    Returns:
+        tuple: (list of result dicts in input order, dict of run statistics)
+    """
+    end_date = end_date or datetime.date.today()
+    weather_keys = {(tuple(field["location"]), field["start_date"]) for field in fields}
+    forecast_keys = {(field["location"][1], field["location"][0]) for field in fields}
+
+    # Locations sharing a start date share the time interval, so they can share MultiPoint requests
+    by_start_date = {}
+    for location, start_date in sorted(weather_keys):
+        by_start_date.setdefault(start_date, []).append(location)
+    batches = [
+        (start_date, locations[i:i + chunk_size])
+        for start_date, locations in by_start_date.items()
+        for i in range(0, len(locations), chunk_size)
+    ]
+
+    def fetch_weather(start_date, locations):
+        timestamp_range = format_range(datetime.date.fromisoformat(start_date), end_date)
+        results = fetch_variables_multi([(list(location), "field") for location in locations], timestamp_range,
+                                        WEATHER_VARIABLES, chunk_size=chunk_size)
+        return {(location, start_date): result for location, result in zip(locations, results)}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        weather_futures = [executor.submit(fetch_weather, *batch) for batch in batches]
+        forecast_futures = {key: executor.submit(fetch_daily_temperatures, *key) for key in forecast_keys}
+        # A request that still fails after its retries only fails the fields that need it
+        weather, weather_errors = {}, {}
+        for batch, future in zip(batches, weather_futures):
+            try:
+                weather.update(future.result())
+            except requests.RequestException as e:
+                start_date, locations = batch
+                weather_errors.update({(location, start_date): f"Historical weather unavailable: {e}"
+                                       for location in locations})
+        forecasts = {}
+        for key, future in forecast_futures.items():
+            try:
+                forecasts[key] = future.result()
+            except requests.RequestException as e:
+                forecasts[key] = str(e)
+    fetch_time = time.perf_counter() - start
+
+    results = []
+    for field in fields:
+        key = (tuple(field["location"]), field["start_date"])
+        forecast = forecasts[(field["location"][1], field["location"][0])]
+        if key in weather_errors:
+            results.append({"field_id": field["field_id"], "crop": field["crop"], "error": weather_errors[key]})
+            continue
+        try:
+            results.append(assess_field(field, weather[key], forecast))
+        except Exception as e:
+            results.append({"field_id": field["field_id"], "crop": field["crop"], "error": str(e)})
+    elapsed = time.perf_counter() - start
+
+    return results, {
+        "fields": len(fields),
+        "weather_locations": len(weather_keys),
+        "weather_batches": len(batches),
+        "forecast_queries": len(forecast_keys),
+        "fetch_seconds": fetch_time,
+        "total_seconds": elapsed,
+        "fields_per_second": len(fields) / elapsed if elapsed else float("inf"),
+    }
+
+
+def write_results(results, path):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=RESULT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assess nitrogen, phosphorus, yield and stress risk for many fields.")
+    parser.add_argument("fields", help="CSV or Parquet table of fields")
+    parser.add_argument("--output", default="portfolio_results.csv")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--chunk-size", type=int, default=MULTIPOINT_CHUNK, help="Locations per MultiPoint request")
+    args = parser.parse_args()
+
+    fields = read_fields(args.fields)
+    results, stats = run_portfolio(fields, concurrency=args.concurrency, chunk_size=args.chunk_size)
+    write_results(results, args.output)
+    print(f"Assessed {stats['fields']} fields in {stats['total_seconds']:.1f} s "
+          f"({stats['fields_per_second']:.1f} fields/s, {stats['weather_locations']} weather locations in "
+          f"{stats['weather_batches']} batches, {stats['forecast_queries']} forecast queries) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
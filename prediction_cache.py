@@ -0,0 +1,229 @@
+"""
+Content-addressed cache for disease predictions.
+
+Entries are keyed by the SHA-256 of the image bytes and live in a bounded in-memory
+LRU backed by a SQLite file. Every entry is tagged with a fingerprint of the model file,
+so replacing the model invalidates the cache. Processes using different model files
+share the store without touching each other's entries; only the entries of a model file
+that has since changed are deleted. The store is capped at a number of rows, evicting the
+least recently used entries.
+
+In near-duplicate mode a 64-bit difference hash (dHash) also matches re-encoded or
+slightly resized uploads. The hashes are split into max_distance + 1 bands and indexed
+per band: two hashes within max_distance bits agree on at least one band, so a lookup
+only compares the hashes sharing a band instead of every stored one.
+
+Settings come from the environment:
+    AGRIGO_CACHE_DIR             directory of the store (default .agrigo_cache)
+    PREDICTION_CACHE_MAX_ROWS    entries kept on disk, for all models together (default 100,000)
+"""
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+CACHE_DIR = os.getenv("AGRIGO_CACHE_DIR", ".agrigo_cache")
+MAX_ROWS = int(os.getenv("PREDICTION_CACHE_MAX_ROWS", 100_000))
+
+
+def model_fingerprint(model_path):
+    """Identifies a model file by path, size and modification time."""
+    stat = os.stat(model_path)
+    return hashlib.sha256(f"{os.path.abspath(model_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+
+
+def perceptual_hash(image_bytes):
+    """64-bit difference hash: compares neighbouring pixels of a 9x8 grayscale thumbnail."""
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft("L", (64, 64))  # Let the JPEG decoder skip most of the work
+    pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+class PredictionCache:
+    def __init__(self, model_path, cache_dir=CACHE_DIR, max_entries=1024, near_duplicates=False, max_distance=4,
+                 max_rows=MAX_ROWS):
+        """
+        Args:
+            model_path (str): Model file whose fingerprint tags the entries
+            cache_dir (str): Directory of the on-disk store
+            max_entries (int): Size of the in-memory LRU tier
+            near_duplicates (bool): Also match images whose dHash differs by at most max_distance bits
+            max_distance (int): Hamming distance accepted as a near duplicate
+            max_rows (int): Entries kept on disk, the least recently used are evicted beyond it
+        """
+        self.model_path = model_path
+        self.max_entries = max_entries
+        self.near_duplicates = near_duplicates
+        self.max_distance = max_distance
+        self.max_rows = max(max_rows, 1)
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.near_hits = self.misses = self.evicted = 0
+
+        # (shift, mask) of each band of the 64-bit dHash
+        bands = min(max_distance + 1, 64)
+        widths = [64 // bands + (i < 64 % bands) for i in range(bands)]
+        self.band_layout = [(sum(widths[:i]), (1 << width) - 1) for i, width in enumerate(widths)]
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, "predictions.sqlite"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "model TEXT, key TEXT, phash INTEGER, label TEXT, probs TEXT, PRIMARY KEY (model, key))"
+            )
+            if "last_used" not in [row[1] for row in self.db.execute("PRAGMA table_info(predictions)")]:
+                self.db.execute("ALTER TABLE predictions ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self.db.execute("CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)")
+            # The fingerprint each model file had when it was last used, to spot a replaced model
+            self.db.execute("CREATE TABLE IF NOT EXISTS models (path TEXT PRIMARY KEY, fingerprint TEXT)")
+        self.rows = self.db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        self.fingerprint = None
+        self._check_model()
+
+    def _check_model(self):
+        """Switches to the current version of the model file, dropping the entries of its previous version."""
+        fingerprint = model_fingerprint(self.model_path)
+        if fingerprint == self.fingerprint:
+            return
+        self.fingerprint = fingerprint
+        self.memory.clear()
+        path = os.path.abspath(self.model_path)
+        with self.db:
+            row = self.db.execute("SELECT fingerprint FROM models WHERE path = ?", (path,)).fetchone()
+            if row is not None and row[0] != fingerprint:
+                self.db.execute("DELETE FROM predictions WHERE model = ?", (row[0],))
+            self.db.execute("INSERT OR REPLACE INTO models VALUES (?, ?)", (path, fingerprint))
+        self.rows = self.db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        self._load_phashes()
+
+    def _load_phashes(self):
+        """Rebuilds the dHash index from the entries of the current model."""
+        self.phashes = {}
+        self.bands = [{} for _ in self.band_layout]
+        for key, phash in self.db.execute(
+            "SELECT key, phash FROM predictions WHERE model = ? AND phash IS NOT NULL", (self.fingerprint,)
+        ):
+            self._index_phash(phash & 0xFFFFFFFFFFFFFFFF, key)  # Stored signed, see _signed
+
+    def _index_phash(self, phash, key):
+        if phash not in self.phashes:
+            for band, (shift, mask) in zip(self.bands, self.band_layout):
+                band.setdefault((phash >> shift) & mask, set()).add(phash)
+        self.phashes[phash] = key
+
+    def _nearest(self, phash):
+        """(distance, key) of the closest indexed dHash sharing at least one band, or None."""
+        candidates = set()
+        for band, (shift, mask) in zip(self.bands, self.band_layout):
+            candidates.update(band.get((phash >> shift) & mask, ()))
+        if not candidates:
+            return None
+        return min((bin(phash ^ other).count("1"), self.phashes[other]) for other in candidates)
+
+    @staticmethod
+    def _signed(phash):
+        return phash - (1 << 64) if phash >= 1 << 63 else phash
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        """Deletes the least recently used tenth of the rows once the store is over max_rows."""
+        if self.rows <= self.max_rows:
+            return
+        # Other processes write to the same file, so count before evicting
+        self.rows = self.db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        if self.rows <= self.max_rows:
+            return
+        excess = self.rows - self.max_rows * 9 // 10
+        with self.db:
+            self.db.execute(
+                "DELETE FROM predictions WHERE rowid IN (SELECT rowid FROM predictions ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+        self.rows -= excess
+        self.evicted += excess
+        self.memory.clear()
+        if self.near_duplicates:
+            self._load_phashes()
+
+    def _lookup(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        row = self.db.execute(
+            "SELECT label, probs FROM predictions WHERE model = ? AND key = ?", (self.fingerprint, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value = (row[0], json.loads(row[1]))
+        self._remember(key, value)
+        with self.db:
+            self.db.execute("UPDATE predictions SET last_used = ? WHERE model = ? AND key = ?",
+                            (time.time(), self.fingerprint, key))
+        return value
+
+    def get(self, image_bytes):
+        """Returns (label, probabilities) for a cached image, or None."""
+        key = hashlib.sha256(image_bytes).hexdigest()
+        with self.lock:
+            self._check_model()
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            if self.near_duplicates and self.phashes:
+                nearest = self._nearest(perceptual_hash(image_bytes))
+                if nearest is not None and nearest[0] <= self.max_distance:
+                    value = self._lookup(nearest[1])
+                    if value is not None:
+                        self.near_hits += 1
+                        return value
+
+            self.misses += 1
+            return None
+
+    def put(self, image_bytes, label, probs):
+        key = hashlib.sha256(image_bytes).hexdigest()
+        probs = [float(p) for p in probs]
+        phash = perceptual_hash(image_bytes) if self.near_duplicates else None
+        with self.lock:
+            self._remember(key, (label, probs))
+            if phash is not None:
+                self._index_phash(phash, key)
+            with self.db:
+                inserted = self.db.execute(
+                    "INSERT OR REPLACE INTO predictions (model, key, phash, label, probs, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.fingerprint, key, None if phash is None else self._signed(phash), label, json.dumps(probs),
+                     time.time()),
+                )
+            self.rows += inserted.rowcount
+            self._evict()
+
+    def stats(self):
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,213 @@
+"""
+Bulk disease scanning of a directory or watch folder.
+
+    python scan_folder.py /data/drone_survey --output results.jsonl
+    python scan_folder.py /data/inbox --output results.csv --watch
+
+Paths are streamed in a fixed lexicographic order, decoded on a bounded prefetch pool
+and classified in batches. Results are appended to the output as they are produced,
+and a checkpoint next to the output records how far the scan got, so an interrupted
+run resumes where it stopped. Memory stays constant regardless of the folder size.
+
+Watch mode picks up files by the later of their modification and inode change time, so
+files copied in with their original modification time (rsync -a, cp -p) are seen too.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from disease_detection import LABELS, load_model, load_padded_image, predict_images
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+
+def iter_image_paths(root, after=None, newer_than=None, older_than=None):
+    """
+    Lazily yields image paths under root in lexicographic order of their path components.
+
+    Args:
+        root (str): Directory to scan
+        after (str): Skip paths up to and including this one (relative to root), used to resume
+        newer_than (float): Only yield files modified or added after this timestamp
+        older_than (float): Only yield files modified or added at or before this timestamp
+    """
+    after_parts = tuple(after.split("/")) if after else None
+
+    def walk(directory, prefix):
+        with os.scandir(directory) as entries:
+            names = sorted((entry.name, entry.is_dir()) for entry in entries)
+        for name, is_dir in names:
+            parts = prefix + (name,)
+            if after_parts is not None:
+                if is_dir and parts < after_parts[:len(parts)]:
+                    continue  # Whole subtree was already scanned
+                if not is_dir and parts <= after_parts:
+                    continue
+            path = os.path.join(directory, name)
+            if is_dir:
+                yield from walk(path, parts)
+            elif os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                if newer_than is not None or older_than is not None:
+                    stat = os.stat(path)
+                    # A copy that keeps its mtime still gets a new ctime when it appears here
+                    changed = max(stat.st_mtime, stat.st_ctime)
+                    if newer_than is not None and changed <= newer_than:
+                        continue
+                    if older_than is not None and changed > older_than:
+                        continue
+                yield "/".join(parts)
+
+    yield from walk(root, ())
+
+
+def prefetch(root, paths, num_workers, depth):
+    """Decodes images on a thread pool, keeping at most `depth` of them in flight."""
+    def decode(relative_path):
+        try:
+            return relative_path, load_padded_image(os.path.join(root, relative_path)), None
+        except Exception as e:
+            return relative_path, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        in_flight = deque()
+        for path in paths:
+            in_flight.append(executor.submit(decode, path))
+            if len(in_flight) >= depth:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+class ResultWriter:
+    """Appends results to a JSONL or CSV file, flushing after every batch."""
+
+    def __init__(self, output_path):
+        self.is_csv = output_path.endswith(".csv")
+        write_header = self.is_csv and (not os.path.exists(output_path) or os.path.getsize(output_path) == 0)
+        self.file = open(output_path, "a", newline="")
+        if self.is_csv:
+            self.csv = csv.writer(self.file)
+            if write_header:
+                self.csv.writerow(["path", "label"] + [f"p_{label}" for label in LABELS] + ["error"])
+
+    def write(self, path, label=None, probs=None, error=None):
+        if self.is_csv:
+            probs = [f"{p:.6f}" for p in probs] if probs is not None else [""] * len(LABELS)
+            self.csv.writerow([path, label or ""] + probs + [error or ""])
+        else:
+            row = {"path": path}
+            if error is None:
+                row.update(label=label, probabilities=[round(float(p), 6) for p in probs])
+            else:
+                row["error"] = error
+            self.file.write(json.dumps(row) + "\n")
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def load_checkpoint(checkpoint_path):
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as file:
+            return json.load(file)
+    return {"last_path": None, "scan_start": None, "watermark": None, "processed": 0}
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    # Write and rename so a crash never leaves a half-written checkpoint
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def scan(root, paths, model, writer, checkpoint, checkpoint_path, batch_size=32, num_workers=4, prefetch_batches=2):
+    """Classifies the streamed paths, committing results and checkpoint after every batch."""
+    batch_paths, batch_arrays, scanned = [], [], []
+
+    def commit():
+        if batch_arrays:
+            predictions = predict_images(batch_arrays, model, batch_size=batch_size, num_workers=1)
+            for path, (label, probs) in zip(batch_paths, predictions):
+                writer.write(path, label, probs)
+        writer.flush()
+        if scanned:
+            checkpoint["last_path"] = scanned[-1]
+            checkpoint["processed"] += len(scanned)
+            save_checkpoint(checkpoint_path, checkpoint)
+        batch_paths.clear()
+        batch_arrays.clear()
+        scanned.clear()
+
+    for path, img_array, error in prefetch(root, paths, num_workers, prefetch_batches * batch_size):
+        scanned.append(path)
+        if error is not None:
+            writer.write(path, error=error)
+        else:
+            batch_paths.append(path)
+            batch_arrays.append(img_array)
+        if len(scanned) >= batch_size:
+            commit()
+    commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify every image in a folder.")
+    parser.add_argument("folder")
+    parser.add_argument("--output", default="scan_results.jsonl", help="Results file, .jsonl or .csv")
+    parser.add_argument("--checkpoint", default=None, help="Defaults to <output>.checkpoint")
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", "model/best_model.keras"))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--prefetch-batches", type=int, default=2)
+    parser.add_argument("--watch", action="store_true", help="Keep polling the folder for new images")
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+    checkpoint = load_checkpoint(checkpoint_path)
+    model = load_model(args.model)
+    writer = ResultWriter(args.output)
+    options = dict(batch_size=args.batch_size, num_workers=args.workers, prefetch_batches=args.prefetch_batches)
+
+    try:
+        if checkpoint["watermark"] is None:
+            # Files added after the first run started are left to the watch loop, also when resuming
+            if checkpoint.get("scan_start") is None:
+                checkpoint["scan_start"] = time.time()
+                save_checkpoint(checkpoint_path, checkpoint)
+            paths = iter_image_paths(args.folder, after=checkpoint["last_path"], older_than=checkpoint["scan_start"])
+            scan(args.folder, paths, model, writer, checkpoint, checkpoint_path, **options)
+            checkpoint["watermark"] = checkpoint["scan_start"]
+            save_checkpoint(checkpoint_path, checkpoint)
+        print(f"Scanned {checkpoint['processed']} images into {args.output}")
+
+        while args.watch:
+            time.sleep(args.poll_interval)
+            # Leave files younger than one poll interval alone, they may still be being written
+            upper = time.time() - args.poll_interval
+            if upper <= checkpoint["watermark"]:
+                continue
+            paths = iter_image_paths(args.folder, newer_than=checkpoint["watermark"], older_than=upper)
+            before = checkpoint["processed"]
+            scan(args.folder, paths, model, writer, checkpoint, checkpoint_path, **options)
+            checkpoint["watermark"] = upper
+            save_checkpoint(checkpoint_path, checkpoint)
+            if checkpoint["processed"] > before:
+                print(f"Scanned {checkpoint['processed'] - before} new images")
+    except KeyboardInterrupt:
+        print(f"\nStopped, progress saved to {checkpoint_path}")
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
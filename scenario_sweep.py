@@ -0,0 +1,235 @@
+"""
+Scenario and sensitivity sweeps for the nitrogen, phosphorus and yield recommendations.
+
+    python scenario_sweep.py Corn 11.25 45.4 120 2024-04-01 --yield 8000
+
+The season's weather is fetched once. NUE, PUE and yield risk are then evaluated over a
+grid of application rates and weather perturbations, one vectorized call per indicator:
+rainfall and soil moisture are scaled and temperatures shifted relative to what was observed.
+The result holds the response surfaces and, for every weather scenario, the rate thresholds
+of the recommendation tiers, read in the direction each indicator moves. NUE and PUE fall
+as more nutrient is applied, so a tier holds up to the highest rate on the grid that keeps
+it or a better one. Yield risk is lowest near the crop's optimal nitrogen value, so a level
+is reached from the lowest nitrogen value on the grid that brings the risk to it or below.
+"""
+import argparse
+import datetime
+
+import numpy as np
+
+from meteo_query import fetch_variables, format_range
+from data_visualization.crops import CROP_NAMES, NUTRIENT_CROP_NAMES
+from data_visualization.nitrogen_risk import NUE_CATEGORIES, NitrogenStressRisk
+from data_visualization.phosphorus_risk import PUE_CATEGORIES, PhosphorusStress
+from data_visualization.yield_risk import (
+    YIELD_RISK_LEVELS, compute_gdd_array, compute_yield_risk_array, yield_risk_level_array,
+)
+
+WEATHER_VARIABLES = ["precipitation", "soil_moisture", "ph", "max_temp", "min_temp"]
+
+
+def fetch_weather(location_coords, start_date, end_date=None):
+    """
+    Fetches the season's weather once for all scenarios.
+
+    Args:
+        location_coords (list): [longitude, latitude, altitude]
+        start_date (datetime.date): Start of the season
+        end_date (datetime.date): End of the season, today by default
+
+    Returns:
+        dict: rainfall (mm), soil_moisture (%), pH, and daily max_temp / min_temp arrays,
+        or None when a variable could not be fetched
+    """
+    timestamp_range = format_range(start_date, end_date or datetime.date.today())
+    data = fetch_variables(location_coords, "scenario", timestamp_range, WEATHER_VARIABLES)
+    if any(data[name] is None for name in WEATHER_VARIABLES):
+        return None
+    return {
+        "rainfall": sum(data["precipitation"]),
+        "soil_moisture": sum(data["soil_moisture"]) / len(data["soil_moisture"]),
+        "pH": data["ph"][0],
+        "max_temp": np.array(data["max_temp"], dtype=float),
+        "min_temp": np.array(data["min_temp"], dtype=float),
+    }
+
+
+def maximum_rates(rates, categories, labels):
+    """
+    Highest rate that keeps each tier or a better one, per scenario, for tiers ordered worst to best.
+
+    Args:
+        rates (np.ndarray): Sorted application rates, the last axis of `categories`
+        categories (np.ndarray): Tier index per scenario and rate, shape (..., rates)
+        labels: Tier names, worst first
+
+    Returns:
+        dict: Tier name -> array of shape (...), NaN where no rate on the grid reaches the tier
+    """
+    result = {}
+    for index, label in enumerate(labels):
+        kept = categories >= index
+        last = kept.shape[-1] - 1 - np.argmax(kept[..., ::-1], axis=-1)
+        result[label] = np.where(kept.any(axis=-1), rates[last], np.nan)
+    return result
+
+
+def minimum_rates(rates, categories, labels):
+    """
+    Lowest rate that brings each level or a better one, per scenario, for levels ordered best to worst.
+
+    Args:
+        rates (np.ndarray): Sorted application rates, the last axis of `categories`
+        categories (np.ndarray): Level index per scenario and rate, shape (..., rates)
+        labels: Level names, best first
+
+    Returns:
+        dict: Level name -> array of shape (...), NaN where no rate on the grid reaches the level
+    """
+    result = {}
+    for index, label in enumerate(labels):
+        reached = categories <= index
+        first = np.argmax(reached, axis=-1)
+        result[label] = np.where(reached.any(axis=-1), rates[first], np.nan)
+    return result
+
+
+def sweep_nitrogen(crop_name, weather, crop_yield, rates, rainfall_scales=(1.0,), soil_moisture_scales=(1.0,)):
+    """
+    NUE over nitrogen rates (kg/ha) and rainfall / soil moisture scales.
+
+    Returns:
+        dict: rates, NUE and Category surfaces of shape (rainfall scales, soil moisture scales, rates),
+        and maximum_rate per NUE tier of shape (rainfall scales, soil moisture scales)
+    """
+    rates = np.sort(np.asarray(rates, dtype=float))
+    rainfall = weather["rainfall"] * np.asarray(rainfall_scales, dtype=float)[:, None, None]
+    soil_moisture = weather["soil_moisture"] * np.asarray(soil_moisture_scales, dtype=float)[None, :, None]
+    result = NitrogenStressRisk.compute_nue_array(NUTRIENT_CROP_NAMES.get(crop_name, crop_name), crop_yield,
+                                                  rates, rainfall, soil_moisture)
+    return {
+        "rates": rates,
+        "NUE": result["NUE"],
+        "Category": result["Category"],
+        "maximum_rate": maximum_rates(rates, result["Category"], NUE_CATEGORIES),
+    }
+
+
+def sweep_phosphorus(crop_name, weather, crop_yield, rates, rainfall_scales=(1.0,), soil_moisture_scales=(1.0,)):
+    """
+    PUE over phosphorus rates (kg/ha) and rainfall / soil moisture scales, crop_yield in kg/ha.
+
+    Returns:
+        dict: rates, PUE and Category surfaces of shape (rainfall scales, soil moisture scales, rates),
+        and maximum_rate per PUE tier of shape (rainfall scales, soil moisture scales)
+    """
+    rates = np.sort(np.asarray(rates, dtype=float))
+    rainfall = weather["rainfall"] * np.asarray(rainfall_scales, dtype=float)[:, None, None]
+    soil_moisture = weather["soil_moisture"] * np.asarray(soil_moisture_scales, dtype=float)[None, :, None]
+    crop = PhosphorusStress(NUTRIENT_CROP_NAMES.get(crop_name, crop_name), crop_yield / 1000, rates,
+                            rainfall, soil_moisture, weather["pH"])
+    PUE = crop.calculate_PUE_array()
+    categories = PhosphorusStress.pue_category_array(PUE)
+    return {
+        "rates": rates,
+        "PUE": PUE,
+        "Category": categories,
+        "maximum_rate": maximum_rates(rates, categories, PUE_CATEGORIES),
+    }
+
+
+def sweep_yield(crop_name, weather, nitrogen_indices, rainfall_scales=(1.0,), temperature_offsets=(0.0,)):
+    """
+    Yield risk over nitrogen values (0-1), rainfall scales and temperature offsets (°C).
+
+    Returns:
+        dict: rates (the nitrogen values), GDD per temperature offset, risk and Category surfaces of
+        shape (rainfall scales, temperature offsets, nitrogen values), and minimum_rate per risk level
+        of shape (rainfall scales, temperature offsets)
+    """
+    rates = np.sort(np.asarray(nitrogen_indices, dtype=float))
+    offsets = np.asarray(temperature_offsets, dtype=float)[:, None]
+    GDD = compute_gdd_array(weather["max_temp"] + offsets, weather["min_temp"] + offsets)
+    rainfall = weather["rainfall"] * np.asarray(rainfall_scales, dtype=float)[:, None, None]
+    risk = compute_yield_risk_array(GDD[None, :, None], rainfall, weather["pH"], rates,
+                                    CROP_NAMES.get(crop_name, crop_name))
+    categories = yield_risk_level_array(risk)
+    return {
+        "rates": rates,
+        "GDD": GDD,
+        "risk": risk,
+        "Category": categories,
+        "minimum_rate": minimum_rates(rates, categories, YIELD_RISK_LEVELS),
+    }
+
+
+def sweep(crop_name, weather, crop_yield, nitrogen_rates, phosphorus_rates, nitrogen_indices,
+          rainfall_scales=(1.0,), soil_moisture_scales=(1.0,), temperature_offsets=(0.0,)):
+    """Runs the nitrogen, phosphorus and yield sweeps on the same fetched weather."""
+    return {
+        "nitrogen": sweep_nitrogen(crop_name, weather, crop_yield, nitrogen_rates, rainfall_scales,
+                                   soil_moisture_scales),
+        "phosphorus": sweep_phosphorus(crop_name, weather, crop_yield, phosphorus_rates, rainfall_scales,
+                                       soil_moisture_scales),
+        "yield": sweep_yield(crop_name, weather, nitrogen_indices, rainfall_scales, temperature_offsets),
+    }
+
+
+def parse_grid(text):
+    """Parses "start:stop:count" into a linspace, or a comma separated list of values."""
+    if ":" in text:
+        start, stop, count = text.split(":")
+        return np.linspace(float(start), float(stop), int(count))
+    return np.array([float(value) for value in text.split(",")])
+
+
+def print_rates(title, unit, rates_by_label, index, bound):
+    """Prints one threshold per tier, bound being "up to" for maximum rates and "from" for minimum rates."""
+    print(f"\n{title}")
+    for label, rates in rates_by_label.items():
+        rate = rates[index]
+        print(f"  {label:<10} {'not reached' if np.isnan(rate) else f'{bound} {rate:g} {unit}'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep NUE, PUE and yield risk over application rates and weather scenarios.")
+    parser.add_argument("crop")
+    parser.add_argument("lon", type=float)
+    parser.add_argument("lat", type=float)
+    parser.add_argument("altitude", type=float)
+    parser.add_argument("start_date", type=datetime.date.fromisoformat)
+    parser.add_argument("--yield", dest="crop_yield", type=float, required=True, help="Crop yield (kg/ha)")
+    parser.add_argument("--nitrogen", default="10:300:59", help="Nitrogen rates (kg/ha), start:stop:count or a list")
+    parser.add_argument("--phosphorus", default="5:150:59", help="Phosphorus rates (kg/ha)")
+    parser.add_argument("--nitrogen-index", default="0:1:101", help="Nitrogen values (0-1) for the yield risk")
+    parser.add_argument("--rainfall-scales", default="0.5,0.75,1,1.25,1.5")
+    parser.add_argument("--soil-moisture-scales", default="1")
+    parser.add_argument("--temperature-offsets", default="0")
+    args = parser.parse_args()
+
+    crop_name = CROP_NAMES.get(args.crop.capitalize(), args.crop.capitalize())
+    weather = fetch_weather([args.lon, args.lat, args.altitude], args.start_date)
+    if weather is None:
+        print("❌ Error fetching weather data. Please check your inputs and try again.")
+        return
+
+    rainfall_scales = parse_grid(args.rainfall_scales)
+    soil_moisture_scales = parse_grid(args.soil_moisture_scales)
+    temperature_offsets = parse_grid(args.temperature_offsets)
+    result = sweep(crop_name, weather, args.crop_yield, parse_grid(args.nitrogen), parse_grid(args.phosphorus),
+                   parse_grid(args.nitrogen_index), rainfall_scales, soil_moisture_scales, temperature_offsets)
+
+    print(f"Observed: rainfall {weather['rainfall']:.1f} mm, soil moisture {weather['soil_moisture']:.1f} %, "
+          f"pH {weather['pH']:.2f}")
+    for i, rainfall_scale in enumerate(rainfall_scales):
+        for j, soil_moisture_scale in enumerate(soil_moisture_scales):
+            print(f"\n=== Rainfall x{rainfall_scale:g}, soil moisture x{soil_moisture_scale:g} ===")
+            print_rates("NUE tier or better", "kg N/ha", result["nitrogen"]["maximum_rate"], (i, j), "up to")
+            print_rates("PUE tier or better", "kg P/ha", result["phosphorus"]["maximum_rate"], (i, j), "up to")
+        for j, offset in enumerate(temperature_offsets):
+            print_rates(f"Yield risk level or lower, rainfall x{rainfall_scale:g}, temperature {offset:+g} °C",
+                        "nitrogen value", result["yield"]["minimum_rate"], (i, j), "from")
+
+
+if __name__ == "__main__":
+    main()
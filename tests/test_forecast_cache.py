@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from forecast_cache import ForecastCache
+
+LABELS = ["TempAir_DailyMax (C)", "Precip_DailySum (mm)"]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ForecastCache(path=str(tmp_path / "forecast.sqlite"))
+    yield cache
+    cache.close()
+
+
+def entries_at(latitude, longitude):
+    return [{"measureLabel": label, "latitude": latitude, "longitude": longitude} for label in LABELS]
+
+
+def test_cell_is_fetched_at_its_center(cache):
+    requested = []
+
+    def fetch(latitude, longitude):
+        requested.append((latitude, longitude))
+        return entries_at(latitude, longitude)
+
+    first = cache.get(47.3712, 8.5389, LABELS, fetch)
+    second = cache.get(47.3688, 8.5412, LABELS, fetch)
+    # Both fields are in the same cell: one fetch at its center, the same forecast for both
+    assert requested == [(47.4, 8.5)]
+    assert first == second
+
+
+def test_concurrent_misses_share_one_fetch_and_release_the_key_lock(cache):
+    calls = []
+
+    def fetch(latitude, longitude):
+        calls.append((latitude, longitude))
+        time.sleep(0.05)
+        return entries_at(latitude, longitude)
+
+    coordinates = [(47.0 + i * 0.5, 8.0) for i in range(4)] * 5
+    with ThreadPoolExecutor(max_workers=len(coordinates)) as executor:
+        list(executor.map(lambda c: cache.get(*c, LABELS, fetch), coordinates))
+
+    assert sorted(calls) == [(47.0 + i * 0.5, 8.0) for i in range(4)]
+    assert cache.key_locks == {}
+
+
+def test_errors_are_not_cached(cache):
+    assert cache.get(47.0, 8.0, LABELS, lambda latitude, longitude: "Error: 503") == "Error: 503"
+    assert cache.get(47.0, 8.0, LABELS, entries_at) == entries_at(47.0, 8.0)
+    assert cache.key_locks == {}
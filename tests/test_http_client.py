@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import http_client
+from benchmarks.stand_in_server import StandInServer
+
+
+def ok_handler(method, path, query, body):
+    return 200, {"ok": True}
+
+
+@pytest.fixture(autouse=True)
+def fresh_session(monkeypatch):
+    """Every test gets its own session, built with the settings the test patched in."""
+    monkeypatch.setattr(http_client, "_session", None)
+    monkeypatch.setattr(http_client, "_replay", {"mode": "", "path": None, "latency": 0.0})
+    yield
+    if http_client._session is not None:
+        http_client._session.close()
+
+
+def test_transient_errors_are_retried():
+    with StandInServer(ok_handler, fail_first=2) as server:
+        response = http_client.post(server.url + "/dataset/query", json={})
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    assert server.requests == 3
+
+
+def test_rate_limit_is_retried():
+    with StandInServer(ok_handler, fail_first=1, fail_status=429) as server:
+        response = http_client.get(server.url + "/forecast")
+    assert response.status_code == 200
+    assert server.requests == 2
+
+
+def test_retries_stop_after_max_retries(monkeypatch):
+    monkeypatch.setattr(http_client, "MAX_RETRIES", 1)
+    with StandInServer(ok_handler, fail_first=10) as server:
+        response = http_client.post(server.url + "/dataset/query", json={})
+    # The last failure is handed back, not raised, so callers can report it
+    assert response.status_code == 503
+    assert server.requests == 2
+
+
+def test_client_errors_are_not_retried():
+    with StandInServer(lambda *args: (400, {"error": "bad query"})) as server:
+        response = http_client.post(server.url + "/dataset/query", json={})
+    assert response.status_code == 400
+    assert server.requests == 1
+
+
+def test_per_host_limit():
+    with StandInServer(ok_handler, delay=0.02) as server:
+        with ThreadPoolExecutor(max_workers=http_client.MAX_PER_HOST * 3) as executor:
+            responses = list(executor.map(lambda _: http_client.get(server.url + "/forecast"), range(60)))
+    assert all(response.status_code == 200 for response in responses)
+    assert 1 < server.max_in_flight <= http_client.MAX_PER_HOST
+    assert server.connections <= http_client.MAX_PER_HOST
+
+
+def test_connections_are_reused():
+    with StandInServer(ok_handler) as server:
+        http_client.reset_stats()
+        for _ in range(20):
+            assert http_client.post(server.url + "/dataset/query", json={}).status_code == 200
+        host_stats = http_client.stats()[server.url.split("//")[1]]
+    assert server.connections == 1
+    assert host_stats["requests"] == 20
+    assert host_stats["connections_opened"] == 1
+    assert host_stats["connection_reuse"] == pytest.approx(0.95)
+
+
+def test_each_host_gets_one_semaphore(monkeypatch):
+    monkeypatch.setattr(http_client, "_host_limits", {})
+    barrier = threading.Barrier(16)
+
+    def limit(_):
+        barrier.wait()
+        return http_client._host_limit("api.example.com")
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        limits = set(executor.map(limit, range(16)))
+    assert len(limits) == 1
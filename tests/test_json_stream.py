@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pytest
+
+from json_stream import parse_stream
+
+
+def chunked(text, size):
+    data = text.encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def assert_same(parsed, expected):
+    """Compares a parse with json.loads, where numeric arrays are float64 arrays and null is NaN."""
+    if isinstance(parsed, np.ndarray):
+        assert parsed.dtype == np.float64
+        np.testing.assert_array_equal(parsed, [np.nan if x is None else x for x in expected])
+    elif isinstance(parsed, dict):
+        assert isinstance(expected, dict) and list(parsed) == list(expected)
+        for key in parsed:
+            assert_same(parsed[key], expected[key])
+    elif isinstance(parsed, list):
+        assert isinstance(expected, list) and len(parsed) == len(expected)
+        for item, expected_item in zip(parsed, expected):
+            assert_same(item, expected_item)
+    else:
+        assert parsed == expected and type(parsed) is type(expected)
+
+
+DOCUMENT = json.dumps([{
+    "codes": [{"code": 11, "dataPerTimeInterval": [{"data": [[1.5, -2.25e3, None, 0], [4, 5.125, 6e-2, None]]}]}],
+    "meta": {"name": "ERA5T", "nested": [[{"a": True}, {"b": None}], [], {"c": False}], "count": -17},
+    "labels": ["Zürich", "tab\there", "quote \" and \\ slash", "☃ snow", "emoji \U0001F33E"],
+}])
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 4096])
+def test_matches_json_loads_at_any_chunk_size(size):
+    assert_same(parse_stream(chunked(DOCUMENT, size)), json.loads(DOCUMENT))
+
+
+def test_numeric_arrays_are_float64_with_nan_for_null():
+    [series] = parse_stream(chunked('[[null, 1, -0.5, null, 1e2]]', 4))
+    assert isinstance(series, np.ndarray) and series.dtype == np.float64
+    np.testing.assert_array_equal(series, [np.nan, 1.0, -0.5, np.nan, 100.0])
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_numbers_split_across_chunks(size):
+    values = [123456.789, -0.000125, 6.02e23, None, 42]
+    text = json.dumps({"data": values, "total": 987654321})
+    result = parse_stream(chunked(text, size))
+    np.testing.assert_array_equal(result["data"], [123456.789, -0.000125, 6.02e23, np.nan, 42.0])
+    assert result["total"] == 987654321
+
+
+@pytest.mark.parametrize("text, find", [
+    ("[]", lambda result: result),
+    ("[ ]", lambda result: result),
+    ('{"data": []}', lambda result: result["data"]),
+    ("[[], [1]]", lambda result: result[0]),
+])
+def test_empty_arrays_are_empty_float64_arrays(text, find):
+    empty = find(parse_stream(chunked(text, 1)))
+    assert isinstance(empty, np.ndarray) and empty.dtype == np.float64 and empty.shape == (0,)
+
+
+def test_mixed_array_falls_back_to_values():
+    result = parse_stream(chunked('[1, null, "two", 3.5, {"x": [2]}]', 3))
+    assert result[:4] == [1.0, None, "two", 3.5]
+    np.testing.assert_array_equal(result[4]["x"], [2.0])
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_skip_keys_drops_their_values(size):
+    text = json.dumps({"timeIntervals": [["2024-03-01", "odd ] } \" [ {"], {"nested": [1, 2]}],
+                       "data": [1, 2], "timeIntervals_kept": 3})
+    result = parse_stream(chunked(text, size), skip_keys=("timeIntervals",))
+    assert list(result) == ["data", "timeIntervals_kept"]
+    np.testing.assert_array_equal(result["data"], [1.0, 2.0])
+    assert result["timeIntervals_kept"] == 3
+
+
+def test_skip_keys_drop_scalars_too():
+    assert parse_stream([b'{"skip": "text", "keep": 1}'], skip_keys=("skip",)) == {"keep": 1}
+
+
+@pytest.mark.parametrize("text", ['{"data": [1, 2', '{"data": [1, 2]', '[{"a": "unterminated', '{"a"', '[1, 2,', ""])
+def test_truncated_input_is_rejected(text):
+    with pytest.raises(ValueError):
+        parse_stream(chunked(text, 3))
+
+
+@pytest.mark.parametrize("text", ['{"a" 1}', '{1: 2}', "[1] [2]", '{"a": 1,}x'])
+def test_malformed_input_is_rejected(text):
+    with pytest.raises(ValueError):
+        parse_stream(chunked(text, 4))
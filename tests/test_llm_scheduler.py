@@ -0,0 +1,50 @@
+import threading
+import time
+
+from llm_scheduler import BATCH, INTERACTIVE, Scheduler
+
+
+def recording_scheduler(**kwargs):
+    done = []
+    finished = threading.Semaphore(0)
+
+    def run(payload):
+        done.append([payload])
+        finished.release()
+
+    def run_batch(payloads):
+        done.append(list(payloads))
+        finished.release()
+
+    return Scheduler(run, run_batch, **kwargs), done, finished
+
+
+def test_waiting_batch_questions_share_a_request():
+    scheduler, done, finished = recording_scheduler(concurrency=1, max_batch=4, max_wait_ms=200)
+    for i in range(4):
+        scheduler.submit(i, BATCH)
+    assert finished.acquire(timeout=5)
+    assert done == [[0, 1, 2, 3]]
+
+
+def test_promoted_job_does_not_wait_for_the_batch():
+    scheduler, done, finished = recording_scheduler(concurrency=1, max_batch=8, max_wait_ms=5000)
+    job = scheduler.submit("report", BATCH)
+    time.sleep(0.05)  # The worker is now holding the batch back for company
+    start = time.perf_counter()
+    scheduler.promote(job)
+    assert finished.acquire(timeout=5)
+    assert time.perf_counter() - start < 1
+    assert done == [["report"]]
+    assert job.lane == INTERACTIVE
+
+
+def test_throttled_jobs_are_not_counted_as_running():
+    release = threading.Event()
+    scheduler = Scheduler(lambda payload: release.wait(5), concurrency=2, rate=2, burst=1)
+    scheduler.submit("a")
+    scheduler.submit("b")
+    time.sleep(0.2)
+    # One job holds the only token and runs, the other waits for the next one
+    assert scheduler.stats()["running"] == 1
+    release.set()
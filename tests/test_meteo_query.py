@@ -0,0 +1,126 @@
+import datetime
+import json
+
+import numpy as np
+import pytest
+
+import meteo_query
+import weather_cache
+from benchmarks.stand_in_server import StandInServer, dataset_handler, synthetic_series
+
+START, END = datetime.date(2024, 3, 1), datetime.date(2024, 3, 31)
+TIMESTAMP_RANGE = meteo_query.format_range(START, END)
+LOCATIONS = [([7.5 + i, 47.5 - i / 2, 300 + 100 * i], f"field {i}") for i in range(7)]
+
+
+def expected(name, coords, start=START, days=(END - START).days + 1):
+    spec = meteo_query.VARIABLES[name][2]
+    return synthetic_series(spec, coords, 1 if name == "ph" else days, start)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """The stand-in dataset API, with the weather cache out of the way."""
+    monkeypatch.setattr(weather_cache, "ENABLED", False)
+    with StandInServer(dataset_handler) as server:
+        monkeypatch.setattr(meteo_query, "BASE_URL", server.url + "/dataset/query")
+        yield server
+
+
+def test_post_query_splits_series_by_location(server):
+    intervals = [meteo_query.format_range(START, START + datetime.timedelta(days=4)),
+                 meteo_query.format_range(END - datetime.timedelta(days=2), END)]
+    results = meteo_query.post_query("ERA5T", "daily", ["max_temp", "precipitation"], LOCATIONS[:3], intervals)
+
+    assert len(results) == 3
+    for (coords, _), result in zip(LOCATIONS, results):
+        assert list(result) == ["max_temp", "precipitation"]
+        for name, series in result.items():
+            assert [list(values) for values in series] == [
+                expected(name, coords, START, 5), expected(name, coords, END - datetime.timedelta(days=2), 3)]
+
+
+def test_multipoint_matches_each_location(server):
+    names = ["precipitation", "ph", "max_temp", "min_temp"]
+    results = meteo_query.fetch_variables_multi(LOCATIONS, TIMESTAMP_RANGE, names, chunk_size=3)
+
+    # Three chunks of at most three locations, for each of the two domains
+    assert server.requests == 6
+    for (coords, _), result in zip(LOCATIONS, results):
+        for name in names:
+            np.testing.assert_array_equal(result[name], expected(name, coords))
+
+
+def test_multipoint_matches_single_location_requests(server):
+    names = ["soil_moisture", "max_temp"]
+    packed = meteo_query.fetch_variables_multi(LOCATIONS, TIMESTAMP_RANGE, names, chunk_size=4)
+    for (coords, location_name), result in zip(LOCATIONS, packed):
+        single = meteo_query.fetch_variables(coords, location_name, TIMESTAMP_RANGE, names)
+        for name in names:
+            np.testing.assert_array_equal(result[name], single[name])
+
+
+def test_response_per_location_is_rejected(monkeypatch):
+    # One item per location is not what the API sends for a MultiPoint query, it must not be split as if it were
+    def item_per_location(method, path, query, body):
+        payload = json.loads(body)
+        status, items = dataset_handler(method, path, query, body)
+        return status, items * len(payload["geometry"]["coordinates"])
+
+    monkeypatch.setattr(weather_cache, "ENABLED", False)
+    with StandInServer(item_per_location) as server:
+        monkeypatch.setattr(meteo_query, "BASE_URL", server.url + "/dataset/query")
+        assert meteo_query.post_query("ERA5T", "daily", ["max_temp"], LOCATIONS[:2], [TIMESTAMP_RANGE]) is None
+
+
+def test_failed_chunk_only_fails_its_locations(monkeypatch):
+    failing = LOCATIONS[4][0]
+
+    def handler(method, path, query, body):
+        if failing in json.loads(body)["geometry"]["coordinates"]:
+            return 400, {"error": "bad location"}
+        return dataset_handler(method, path, query, body)
+
+    monkeypatch.setattr(weather_cache, "ENABLED", False)
+    with StandInServer(handler) as server:
+        monkeypatch.setattr(meteo_query, "BASE_URL", server.url + "/dataset/query")
+        results = meteo_query.post_chunked("ERA5T", "daily", ["max_temp"], LOCATIONS, [TIMESTAMP_RANGE], chunk_size=3)
+
+    assert results[3:6] == [None] * 3
+    for (coords, _), result in zip(LOCATIONS[:3] + LOCATIONS[6:], results[:3] + results[6:]):
+        np.testing.assert_array_equal(result["max_temp"][0], expected("max_temp", coords))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = weather_cache.WeatherCache(path=str(tmp_path / "weather.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_cached_query_fills_the_range_from_cache_and_api(monkeypatch, cache):
+    with StandInServer(dataset_handler) as server:
+        monkeypatch.setattr(meteo_query, "BASE_URL", server.url + "/dataset/query")
+        middle = meteo_query.format_range(START + datetime.timedelta(days=10), END - datetime.timedelta(days=10))
+        meteo_query.fetch_cached_query(cache, "ERA5T", ["max_temp"], LOCATIONS[:1], middle)
+        [result] = meteo_query.fetch_cached_query(cache, "ERA5T", ["max_temp"], LOCATIONS[:1], TIMESTAMP_RANGE)
+    np.testing.assert_array_equal(result["max_temp"], expected("max_temp", LOCATIONS[0][0]))
+
+
+def test_cached_query_rejects_short_series(monkeypatch, cache):
+    # A response missing its last day must not give a shorter, misaligned series
+    def short_handler(method, path, query, body):
+        status, items = dataset_handler(method, path, query, body)
+        for code in items[0]["codes"]:
+            for interval in code["dataPerTimeInterval"]:
+                interval["data"] = [series[:-1] for series in interval["data"]]
+        return status, items
+
+    with StandInServer(short_handler) as server:
+        monkeypatch.setattr(meteo_query, "BASE_URL", server.url + "/dataset/query")
+        results = meteo_query.fetch_cached_query(cache, "ERA5T", ["max_temp", "min_temp"], LOCATIONS[:2],
+                                                 TIMESTAMP_RANGE)
+    assert results == [None, None]
+    # Nothing misaligned was stored either
+    assert cache.load(cache.cell(LOCATIONS[0][0], meteo_query.VARIABLES["max_temp"][2]),
+                      meteo_query.VARIABLES["max_temp"][2], START, END) == {}
@@ -0,0 +1,101 @@
+import io
+import os
+import random
+
+import pytest
+from PIL import Image
+
+from prediction_cache import PredictionCache, perceptual_hash
+
+
+def image_bytes(seed, size=64, quality=95):
+    rng = random.Random(seed)
+    img = Image.new("RGB", (8, 8))
+    img.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(64)])
+    buffer = io.BytesIO()
+    img.resize((size, size), Image.BILINEAR).save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    def make(name, content=b"weights"):
+        path = tmp_path / name
+        path.write_bytes(content)
+        return str(path)
+    return make
+
+
+def test_entries_survive_across_instances(tmp_path, model_file):
+    model = model_file("model.tflite")
+    cache = PredictionCache(model, cache_dir=str(tmp_path))
+    cache.put(image_bytes(1), "Rusty", [0.1, 0.2, 0.7])
+    assert PredictionCache(model, cache_dir=str(tmp_path)).get(image_bytes(1)) == ("Rusty", [0.1, 0.2, 0.7])
+
+
+def test_models_do_not_evict_each_other(tmp_path, model_file):
+    first = PredictionCache(model_file("a.tflite"), cache_dir=str(tmp_path))
+    first.put(image_bytes(1), "Rusty", [0.1, 0.2, 0.7])
+    second = PredictionCache(model_file("b.keras"), cache_dir=str(tmp_path))
+    second.put(image_bytes(1), "Healthy", [0.8, 0.1, 0.1])
+
+    assert PredictionCache(first.model_path, cache_dir=str(tmp_path)).get(image_bytes(1))[0] == "Rusty"
+    assert PredictionCache(second.model_path, cache_dir=str(tmp_path)).get(image_bytes(1))[0] == "Healthy"
+
+
+def test_replaced_model_drops_its_old_entries(tmp_path, model_file):
+    model = model_file("model.tflite")
+    cache = PredictionCache(model, cache_dir=str(tmp_path))
+    cache.put(image_bytes(1), "Rusty", [0.1, 0.2, 0.7])
+    old_fingerprint = cache.fingerprint
+
+    model_file("model.tflite", b"retrained weights")
+    assert cache.get(image_bytes(1)) is None
+    assert cache.db.execute("SELECT COUNT(*) FROM predictions WHERE model = ?", (old_fingerprint,)).fetchone()[0] == 0
+
+
+def test_row_cap_evicts_least_recently_used(tmp_path, model_file):
+    cache = PredictionCache(model_file("model.tflite"), cache_dir=str(tmp_path), max_entries=1, max_rows=10,
+                            near_duplicates=True)
+    for seed in range(10):
+        cache.put(image_bytes(seed), "Healthy", [1.0, 0.0, 0.0])
+    assert cache.get(image_bytes(0)) is not None  # Now the most recently used
+    for seed in range(10, 15):
+        cache.put(image_bytes(seed), "Healthy", [1.0, 0.0, 0.0])
+
+    assert cache.db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] <= 10
+    assert cache.get(image_bytes(0)) is not None
+    assert cache.get(image_bytes(1)) is None
+    # The dHash index only holds hashes of stored entries
+    stored = {key for (key,) in cache.db.execute("SELECT key FROM predictions")}
+    assert set(cache.phashes.values()) == stored
+
+
+def test_near_duplicate_is_found(tmp_path, model_file):
+    cache = PredictionCache(model_file("model.tflite"), cache_dir=str(tmp_path), near_duplicates=True)
+    cache.put(image_bytes(1, quality=95), "Powdery", [0.1, 0.8, 0.1])
+    reencoded = image_bytes(1, quality=70)
+    assert bin(perceptual_hash(reencoded) ^ perceptual_hash(image_bytes(1))).count("1") <= cache.max_distance
+    assert cache.get(reencoded) == ("Powdery", [0.1, 0.8, 0.1])
+    assert cache.stats()["near_hits"] == 1
+
+
+@pytest.mark.parametrize("max_distance", [0, 4, 9])
+def test_band_index_matches_brute_force(tmp_path, model_file, max_distance):
+    cache = PredictionCache(model_file("model.tflite"), cache_dir=str(tmp_path), near_duplicates=True,
+                            max_distance=max_distance)
+    rng = random.Random(max_distance)
+    stored = [rng.getrandbits(64) for _ in range(300)]
+    for i, phash in enumerate(stored):
+        cache._index_phash(phash, f"key{i}")
+
+    for _ in range(300):
+        query = rng.choice(stored)
+        for bit in rng.sample(range(64), rng.randint(0, max_distance + 2)):
+            query ^= 1 << bit
+        best = min((bin(query ^ other).count("1"), f"key{i}") for i, other in enumerate(stored))
+        nearest = cache._nearest(query)
+        if best[0] <= max_distance:
+            assert nearest is not None and nearest[0] == best[0]
+        else:
+            assert nearest is None or nearest[0] > max_distance
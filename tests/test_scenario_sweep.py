@@ -0,0 +1,69 @@
+import numpy as np
+
+import scenario_sweep
+from data_visualization.yield_risk import compute_yield_risk
+
+# Corn at the midpoints of its optimal ranges: every factor is 1, so NUE = yield / N and PUE = 0.75 * yield_t / P
+WEATHER = {
+    "rainfall": 650.0,
+    "soil_moisture": 60.0,
+    "pH": 6.5,
+    "max_temp": np.full(180, 32.0),
+    "min_temp": np.full(180, 20.0),
+}
+
+
+def test_nitrogen_tiers_hold_up_to_a_rate():
+    # NUE 80, 53.3, 40, 32, 26.7, 20, 16: high above 40, moderate from 20 to 40
+    result = scenario_sweep.sweep_nitrogen("Corn", WEATHER, 8000, [400, 100, 150, 200, 250, 300, 500])
+    assert result["maximum_rate"]["high"][0, 0] == 150
+    assert result["maximum_rate"]["moderate"][0, 0] == 400
+    assert result["maximum_rate"]["low"][0, 0] == 500
+
+
+def test_nitrogen_tier_out_of_reach_is_nan():
+    result = scenario_sweep.sweep_nitrogen("Corn", WEATHER, 8000, [300, 400], rainfall_scales=(1.0, 2.0))
+    # NUE 26.7 and 20 at observed rainfall, twice that with double the rain
+    assert np.isnan(result["maximum_rate"]["high"][0, 0])
+    assert result["maximum_rate"]["high"][1, 0] == 300
+    assert result["maximum_rate"]["moderate"][1, 0] == 400
+
+
+def test_phosphorus_tiers_hold_up_to_a_rate():
+    # PUE 0.3, 0.15, 0.1, 0.075, 0.05, 0.0375 for 8 t/ha: excellent from 0.15, good from 0.10, moderate from 0.05
+    result = scenario_sweep.sweep_phosphorus("Corn", WEATHER, 8000, [20, 40, 60, 80, 120, 160])
+    assert result["maximum_rate"]["excellent"][0, 0] == 40
+    assert result["maximum_rate"]["good"][0, 0] == 60
+    assert result["maximum_rate"]["moderate"][0, 0] == 120
+    assert result["maximum_rate"]["low"][0, 0] == 160
+
+
+def test_yield_levels_are_reached_from_a_rate():
+    # GDD 2745 is 155 below Corn's optimum: the risk is 0.3 * 155^2 = 7207.5 plus the small N term
+    weather = dict(WEATHER, max_temp=np.full(180, 25.25), min_temp=np.full(180, 25.25))
+    nitrogen = np.linspace(0, 1, 11)
+    result = scenario_sweep.sweep_yield("Corn", weather, nitrogen, rainfall_scales=(1.0, 1.6))
+
+    risk = np.array([compute_yield_risk(2745, 650, 6.5, n, "Corn") for n in nitrogen])
+    np.testing.assert_allclose(result["risk"][0, 0], risk)
+    assert np.isnan(result["minimum_rate"]["low"][0, 0])
+    assert result["minimum_rate"]["moderate"][0, 0] == 0
+    # 60% more rain adds 0.3 * 390^2 = 45630, only critical is left
+    assert np.isnan(result["minimum_rate"]["high"][1, 0])
+    assert result["minimum_rate"]["critical"][1, 0] == 0
+
+
+def test_threshold_helpers_read_each_direction():
+    rates = np.array([1.0, 2.0, 3.0, 4.0])
+    # Tiers worst to best, falling as the rate rises
+    falling = np.array([[2, 2, 1, 0], [0, 0, 0, 0]])
+    maximum = scenario_sweep.maximum_rates(rates, falling, ("low", "moderate", "high"))
+    np.testing.assert_array_equal(maximum["high"], [2.0, np.nan])
+    np.testing.assert_array_equal(maximum["moderate"], [3.0, np.nan])
+    np.testing.assert_array_equal(maximum["low"], [4.0, 4.0])
+    # Levels best to worst, falling and rising again around an optimum
+    levels = np.array([[3, 1, 0, 2], [3, 3, 3, 3]])
+    minimum = scenario_sweep.minimum_rates(rates, levels, ("low", "moderate", "high", "critical"))
+    np.testing.assert_array_equal(minimum["low"], [3.0, np.nan])
+    np.testing.assert_array_equal(minimum["moderate"], [2.0, np.nan])
+    np.testing.assert_array_equal(minimum["critical"], [1.0, 1.0])
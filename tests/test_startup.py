@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.startup import TENSORFLOW_FREE_PATHS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Records every attempt to import tensorflow or keras, which works whether they are installed or not
+RECORD_IMPORTS = """
+import sys
+
+class Recorder:
+    attempted = []
+
+    def find_spec(self, name, path=None, target=None):
+        if name.split(".")[0] in ("tensorflow", "keras"):
+            self.attempted.append(name)
+        return None
+
+sys.meta_path.insert(0, Recorder())
+"""
+
+
+# Only the stand-in server on the loopback interface can be reached
+OFFLINE = """
+import socket
+
+_connect = socket.socket.connect
+
+def loopback_only(self, address):
+    if self.family in (socket.AF_INET, socket.AF_INET6) and address[0] not in ("127.0.0.1", "::1"):
+        raise ConnectionRefusedError(f"network disabled in this test: {address}")
+    return _connect(self, address)
+
+socket.socket.connect = loopback_only
+"""
+
+# Menu path -> (handler of main.py, scripted answers to its prompts, module attributes pointed at the stand-in)
+DATASET, FORECAST = "/dataset/query", "/api/Forecast/ShortRangeForecastDaily"
+HANDLERS = {
+    "Ask a Question": ("ask_question", ["How do I keep the soil moist?"], {"llm.LLM_URL": ""}),
+    "Weather Prediction": ("weather_prediction", ["", ""], {"weather.FORECAST_URL": FORECAST}),
+    "Risk Analysis (Nitrogen)": ("risk_analysis", ["Nitrogen", "Corn", "8000", "150", "7.57", "47.56", "279",
+                                                   "2025-03-01"], {"meteo_query.BASE_URL": DATASET}),
+    "Risk Analysis (Phosphorus)": ("risk_analysis", ["Phosphorus", "Corn", "8", "60", "7.57", "47.56", "279",
+                                                     "2025-03-01"], {"meteo_query.BASE_URL": DATASET}),
+    "Risk Analysis (Yield)": ("risk_analysis", ["Yield", "7.57", "47.56", "279", "Corn", "2025-03-01", "0.1"],
+                              {"meteo_query.BASE_URL": DATASET}),
+    "Risk Analysis (Stress)": ("risk_analysis", ["Stress", "47.56", "7.57", "Corn"],
+                               {"data_visualization.stress_buster.FORECAST_URL": FORECAST}),
+    "User Feedback Collection": ("user_feedback", ["yes"], {}),
+}
+
+
+def run_recorded(code, env=None):
+    """Runs code in a fresh interpreter, returns its output lines, the last one the attempted imports."""
+    result = subprocess.run([sys.executable, "-c", RECORD_IMPORTS + code + "\nprint(Recorder.attempted)"],
+                            cwd=ROOT, capture_output=True, text=True, timeout=120,
+                            env=None if env is None else dict(os.environ, **env))
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()
+
+
+def attempted_imports(code):
+    return run_recorded(code)[-1]
+
+
+def test_every_tensorflow_free_path_is_run():
+    assert set(HANDLERS) == set(TENSORFLOW_FREE_PATHS)
+
+
+@pytest.mark.parametrize("path", sorted(HANDLERS))
+def test_menu_handler_does_not_import_tensorflow(path, tmp_path):
+    handler, answers, urls = HANDLERS[path]
+    patches = "".join(
+        f"import {target.rsplit('.', 1)[0]}\n{target} = server.url + {suffix!r}\n" for target, suffix in urls.items())
+    code = OFFLINE + (
+        "import builtins\n"
+        "from benchmarks.stand_in_server import StandInServer, api_handler, text_generation_handler\n"
+        "import main\n"
+        "generate = text_generation_handler(token_delay=0, tokens=5)\n"
+        "def handler(method, path, query, body):\n"
+        f"    serve = api_handler if path.endswith(({DATASET!r}, {FORECAST!r})) else generate\n"
+        "    return serve(method, path, query, body)\n"
+        f"answers = iter({answers!r})\n"
+        "builtins.input = lambda prompt='': next(answers)\n"
+        "with StandInServer(handler) as server:\n"
+        + "".join(f"    {line}\n" for line in patches.splitlines())
+        + f"    main.{handler}()\n"
+        "    print(server.requests)\n"
+        "print('tensorflow' in sys.modules)\n"
+    )
+    env = {"AGRIGO_CACHE_DIR": str(tmp_path / "cache"), "FEEDBACK_DB": str(tmp_path / "feedback.sqlite"),
+           "WEATHER_CACHE": "0", "FORECAST_CACHE": "0", "HTTP_REPLAY": "", "HTTP_MAX_RETRIES": "0",
+           "LLM_BACKEND": "hosted", "RAG_EMBEDDER": "hashing", "RAG_DOCS_DIR": str(tmp_path / "docs")}
+    *output, requests, tensorflow_loaded, attempted = run_recorded(code, env)
+    # The handler did its work against the stand-in, without tensorflow
+    assert not any("❌" in line or "Error" in line for line in output), "\n".join(output)
+    assert int(requests) > 0 or not urls
+    assert tensorflow_loaded == "False"
+    assert attempted == "[]"
+
+
+def test_menu_and_exit_do_not_import_tensorflow():
+    code = (
+        "import builtins, main\n"
+        "builtins.input = lambda prompt='': '6'\n"
+        "try:\n"
+        "    main.main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+    assert attempted_imports(code) == "[]"
+
+
+def test_recorder_sees_tensorflow_imports():
+    # The check must notice an import even when tensorflow is not installed, or the tests above prove nothing
+    assert "tensorflow" in attempted_imports("try:\n    import tensorflow\nexcept ImportError:\n    pass\n")
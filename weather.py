@@ -1,30 +1,21 @@
 import os
-import requests
+import forecast_cache
+from daily_table import DailyTable
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env
 LONG_KEY = os.getenv("LONG_KEY")
+FORECAST_URL = "https://services.cehub.syngenta-ais.com/api/Forecast/ShortRangeForecastDaily"
+MEASURE_LABELS = [
+    "ThunderstormProbability_DailyMax (pct)",
+    "Cloudcover_DailyAvg (pct)",
+    "PrecipProbability_Daily (pct)",
+    "SnowFraction_Daily (pct)",
+]
 
 
 def fetch_daily_weather(latitude, longitude):
-    url = "https://services.cehub.syngenta-ais.com/api/Forecast/ShortRangeForecastDaily"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "supplier": "Meteoblue",
-        "measureLabel": "ThunderstormProbability_DailyMax (pct); Cloudcover_DailyAvg (pct); PrecipProbability_Daily (pct); SnowFraction_Daily (pct)",
-        "top": 30,
-        "format": "json"
-    }
-    headers = {
-        "accept": "*/*",
-        "ApiKey": LONG_KEY
-    }
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return f"Error: {response.status_code}, {response.text}"
+    return forecast_cache.fetch_forecast(FORECAST_URL, latitude, longitude, MEASURE_LABELS, LONG_KEY)
 
 
 def decide_weather(weather_data):
@@ -47,23 +38,11 @@ def decide_weather(weather_data):
 
 
 def parse_weather_response(response):
-    result = {}
-
-    for entry in response:
-        date = entry['date']
-        measureLabel = entry['measureLabel']
-        dailyValue = entry['dailyValue']
-
-        # If date is not in the result dict, add it
-        if date not in result:
-            result[date] = {}
-
-        # Add the measureLabel and corresponding value for that date
-        result[date][measureLabel] = dailyValue
+    table = DailyTable.from_entries(response, MEASURE_LABELS)
 
-    for key, value in result.items():
-        weather = decide_weather(value)
-        print(key.split(" ")[0], ": ", weather)
+    for i, date in enumerate(table.dates):
+        weather = decide_weather(table.row(i))
+        print(date.split(" ")[0], ": ", weather)
     return
 
 
@@ -0,0 +1,184 @@
+"""
+Persistent local store for historical daily weather series.
+
+Rows are keyed by (grid cell, code, level, aggregation, day) in SQLite. The dataset API
+corrects temperatures for the altitude of the location, so for those codes the cell also
+carries the altitude rounded to WEATHER_CACHE_ALTITUDE_STEP. Past days never
+change once the reanalysis has settled, so meteo_query only requests the days that
+are not stored yet, and merges them with the stored ones. Recent days, which the dataset
+API still gap-fills from a forecast model, are never stored.
+
+Settings come from the environment:
+    WEATHER_CACHE                set to 0 to disable the cache
+    WEATHER_CACHE_GRID           grid cell size in degrees (default 0.25, the ERA5 resolution)
+    WEATHER_CACHE_ALTITUDE_STEP  altitude rounding in metres for altitude-corrected codes (default 50)
+    WEATHER_CACHE_LAG_DAYS       days before a value is considered settled (default 7)
+    WEATHER_CACHE_MAX_ROWS       size cap, least recently used series are evicted (default 5,000,000)
+"""
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.getenv("AGRIGO_CACHE_DIR", ".agrigo_cache")
+ENABLED = os.getenv("WEATHER_CACHE", "1") != "0"
+GRID_STEP = float(os.getenv("WEATHER_CACHE_GRID", 0.25))
+ALTITUDE_STEP = float(os.getenv("WEATHER_CACHE_ALTITUDE_STEP", 50))
+ALTITUDE_CODES = {11}  # Temperature, which the API adjusts to the altitude of the location
+LAG_DAYS = int(os.getenv("WEATHER_CACHE_LAG_DAYS", 7))
+MAX_ROWS = int(os.getenv("WEATHER_CACHE_MAX_ROWS", 5_000_000))
+
+
+def date_range(start, end):
+    """Days from start to end, both included."""
+    return [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def contiguous_ranges(days):
+    """Collapses a sorted list of days into (first, last) runs of consecutive days."""
+    ranges = []
+    for day in days:
+        if ranges and day - ranges[-1][1] == datetime.timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(r) for r in ranges]
+
+
+class WeatherCache:
+    def __init__(self, path=None, grid_step=GRID_STEP, lag_days=LAG_DAYS, max_rows=MAX_ROWS,
+                 altitude_step=ALTITUDE_STEP):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "weather.sqlite")
+        self.grid_step = grid_step
+        self.altitude_step = altitude_step
+        self.lag_days = lag_days
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.hit_days = self.missed_days = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS series_values (
+                cell TEXT, code INTEGER, level TEXT, aggregation TEXT, day TEXT, value REAL,
+                PRIMARY KEY (cell, code, level, aggregation, day)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS series_access (
+                cell TEXT, code INTEGER, level TEXT, aggregation TEXT, rows INTEGER, last_access REAL,
+                PRIMARY KEY (cell, code, level, aggregation)
+            );
+        """)
+
+    def cell(self, location_coords, code_spec=None):
+        """Snaps [lon, lat, alt] to the grid cell used as cache key, with the rounded altitude for ALTITUDE_CODES."""
+        lon, lat = location_coords[0], location_coords[1]
+        if self.grid_step <= 0:
+            cell = f"{lon:.5f},{lat:.5f}"
+        else:
+            cell = f"{round(lon / self.grid_step) * self.grid_step:.4f},{round(lat / self.grid_step) * self.grid_step:.4f}"
+        if code_spec is not None and code_spec["code"] in ALTITUDE_CODES and len(location_coords) > 2:
+            altitude = location_coords[2]
+            if self.altitude_step > 0:
+                altitude = round(altitude / self.altitude_step) * self.altitude_step
+            cell += f",{altitude:.0f}"
+        return cell
+
+    def settled_until(self):
+        return datetime.date.today() - datetime.timedelta(days=self.lag_days)
+
+    @staticmethod
+    def _key(cell, code_spec):
+        return cell, code_spec["code"], code_spec["level"], code_spec.get("aggregation", "")
+
+    def load(self, cell, code_spec, start, end):
+        """Returns {day: value} for the stored days of one series between start and end."""
+        key = self._key(cell, code_spec)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT day, value FROM series_values "
+                "WHERE cell = ? AND code = ? AND level = ? AND aggregation = ? AND day BETWEEN ? AND ?",
+                key + (start.isoformat(), end.isoformat()),
+            ).fetchall()
+            if rows:
+                with self.db:
+                    self.db.execute(
+                        "UPDATE series_access SET last_access = ? "
+                        "WHERE cell = ? AND code = ? AND level = ? AND aggregation = ?",
+                        (time.time(),) + key,
+                    )
+        return {datetime.date.fromisoformat(day): value for day, value in rows}
+
+    def store(self, cell, code_spec, values):
+        """Stores {day: value}, skipping days that are not settled yet."""
+        settled = self.settled_until()
+        # NaN marks a value the API did not have
+        rows = [(day.isoformat(), float(value)) for day, value in values.items()
+                if day <= settled and value is not None and value == value]
+        if not rows:
+            return
+        key = self._key(cell, code_spec)
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO series_values VALUES (?, ?, ?, ?, ?, ?)",
+                [key + row for row in rows],
+            )
+            count = self.db.execute(
+                "SELECT COUNT(*) FROM series_values WHERE cell = ? AND code = ? AND level = ? AND aggregation = ?",
+                key,
+            ).fetchone()[0]
+            self.db.execute(
+                "INSERT OR REPLACE INTO series_access VALUES (?, ?, ?, ?, ?, ?)",
+                key + (count, time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        """Drops least recently used series until the store is under max_rows."""
+        total = self.db.execute("SELECT COALESCE(SUM(rows), 0) FROM series_access").fetchone()[0]
+        if total <= self.max_rows:
+            return
+        for cell, code, level, aggregation, rows in self.db.execute(
+            "SELECT cell, code, level, aggregation, rows FROM series_access ORDER BY last_access"
+        ).fetchall():
+            key = (cell, code, level, aggregation)
+            self.db.execute(
+                "DELETE FROM series_values WHERE cell = ? AND code = ? AND level = ? AND aggregation = ?", key)
+            self.db.execute(
+                "DELETE FROM series_access WHERE cell = ? AND code = ? AND level = ? AND aggregation = ?", key)
+            total -= rows
+            if total <= self.max_rows:
+                break
+
+    def count(self, hit_days, missed_days):
+        with self.lock:
+            self.hit_days += hit_days
+            self.missed_days += missed_days
+
+    def stats(self):
+        requested = self.hit_days + self.missed_days
+        return {
+            "hit_days": self.hit_days,
+            "missed_days": self.missed_days,
+            "hit_rate": self.hit_days / requested if requested else 0.0,
+            "rows": self.db.execute("SELECT COALESCE(SUM(rows), 0) FROM series_access").fetchone()[0],
+        }
+
+    def close(self):
+        self.db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide cache, or None when WEATHER_CACHE=0."""
+    global _cache
+    if not ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = WeatherCache()
+        return _cache